@@ -0,0 +1,24 @@
+"""Benchmarks for the test harness itself and for end-to-end feature runs.
+
+Two layers:
+
+* ``micro``: harness hot paths measured in-process without any HTTP. These
+  are the table-to-payload step, the rubric conversion step, step
+  matching, ``execute_steps`` overhead and JSON encode/decode of a large
+  listing response.
+* ``e2e``: each revenue feature run by behave against the contract stub
+  (``API_STUB=1``). Wall time is split into the time spent waiting on
+  requests and the rest, which is the harness.
+* ``exports``: every export endpoint timed while one revision grows
+  through increasing row counts, with a fitted scaling exponent.
+* ``search``: revenue listing and revision search latency swept over
+  page depth, page size and search selectivity.
+
+Results are written as JSON. ``compare`` checks them against a saved
+baseline and exits non-zero when a benchmark got slower than the
+threshold allows::
+
+    python -m benchmarks run --save-baseline
+    python -m benchmarks run
+    python -m benchmarks compare --threshold 0.2
+"""
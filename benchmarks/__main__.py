@@ -0,0 +1,157 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+
+from benchmarks import e2e, exports, micro, search
+from benchmarks.harness import (BASELINE_PATH, DEFAULT_THRESHOLD, RESULTS_PATH, compare, load_results,
+                                print_comparison, write_results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the BDD harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write the results")
+    run_parser.add_argument("--layer", choices=("micro", "e2e", "all"), default="all")
+    run_parser.add_argument("-k", dest="selected", action="append", default=[],
+                            help="only benchmarks whose name contains this (repeatable)")
+    run_parser.add_argument("--repeat", type=int, help="timed runs per benchmark (micro 7, e2e 3)")
+    run_parser.add_argument("--output", default=RESULTS_PATH)
+    run_parser.add_argument("--save-baseline", action="store_true", help=f"also copy the results to {BASELINE_PATH}")
+
+    compare_parser = commands.add_parser("compare", help="compare results with the baseline")
+    compare_parser.add_argument("--baseline", default=BASELINE_PATH)
+    compare_parser.add_argument("--current", default=RESULTS_PATH)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="relative slowdown that counts as a regression (0.2 = 20%%)")
+
+    exports_parser = commands.add_parser("exports", help="time every export endpoint against growing data")
+    exports_parser.add_argument("--sizes", default=",".join(map(str, exports.DEFAULT_SIZES)),
+                                help="rows per revenue type and collection at each step, e.g. 100,1000,100000")
+    exports_parser.add_argument("--types", default=",".join(exports.REVENUE_TYPES + ("rates",)))
+    exports_parser.add_argument("--collections", default=",".join(exports.COLLECTIONS))
+    exports_parser.add_argument("--formats", default="excel,csv")
+    exports_parser.add_argument("--no-parameters", dest="parameters", action="store_false",
+                                help="skip the /parameters exports (their data is not grown)")
+    exports_parser.add_argument("--repeat", type=int, default=3, help="downloads per export and size")
+    exports_parser.add_argument("--threshold", type=float, default=exports.DEFAULT_THRESHOLD,
+                                help="fitted exponent above which an export counts as super-linear")
+    exports_parser.add_argument("--workers", type=int, help="concurrent requests while growing the data")
+    exports_parser.add_argument("--output", default=exports.RESULTS_PATH)
+
+    search_parser = commands.add_parser("search", help="sweep page depth, page size and search selectivity")
+    search_parser.add_argument("--rows", type=int, default=search.DEFAULT_ROWS, help="revenues seeded per type")
+    search_parser.add_argument("--types", default=",".join(search.REVENUE_TYPES))
+    search_parser.add_argument("--page-sizes", default=",".join(map(str, search.DEFAULT_PAGE_SIZES)))
+    search_parser.add_argument("--depths", default=",".join(map(str, search.DEFAULT_DEPTHS)),
+                               help="fractions of the page range to request, 1.0 being the last page")
+    search_parser.add_argument("--limits", default=",".join(map(str, search.DEFAULT_LIMITS)),
+                               help="limit values for /revisions/search")
+    search_parser.add_argument("--revisions", type=int, default=search.DEFAULT_REVISIONS,
+                               help="revisions seeded for /revisions/search (0 skips it)")
+    search_parser.add_argument("--repeat", type=int, default=3, help="calls per cell")
+    search_parser.add_argument("--max-depth-ratio", type=float, default=search.DEFAULT_MAX_DEPTH_RATIO,
+                               help="flag rows whose last page is this many times slower than the first")
+    search_parser.add_argument("--max-ms", type=float, help="flag any cell slower than this")
+    search_parser.add_argument("--workers", type=int, help="concurrent requests while seeding")
+    search_parser.add_argument("--output", default=search.RESULTS_PATH)
+
+    for live_parser in (exports_parser, search_parser):
+        live_parser.add_argument("--stub", action="store_true", default=os.getenv("API_STUB", "") in ("1", "true"),
+                                 help="run against the in-process contract stub (default with API_STUB=1)")
+    args = parser.parse_args(argv)
+
+    if args.command == "exports":
+        return run_exports(args)
+    if args.command == "search":
+        return run_search(args)
+
+    if args.command == "run":
+        benchmarks = {}
+        if args.layer in ("micro", "all"):
+            benchmarks.update(micro.run(args.selected, repeat=args.repeat or 7))
+        if args.layer in ("e2e", "all"):
+            benchmarks.update(e2e.run(args.selected, repeat=args.repeat or 3))
+        write_results(benchmarks, args.output)
+        print(f"Results written to {args.output}")
+        if args.save_baseline:
+            shutil.copyfile(args.output, BASELINE_PATH)
+            print(f"Baseline saved to {BASELINE_PATH}")
+        return 0
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows, baseline, current)
+    regressions = [row[0] for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} regressions past {args.threshold:.0%}: {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+@contextmanager
+def _live_api(stub):
+    """API client for a benchmark against the backend (or the in-process stub), cleaned up afterwards."""
+    from support.cleanup import REVISION, CleanupJournal, _client, drain
+    from support.stub_server import StubServer
+
+    server = StubServer().start() if stub else None
+    if server:
+        os.environ["API_BASE_URL"] = server.base_url
+        os.environ.setdefault("API_TOKEN", "stub-token")
+    api = _client()
+    # Revenues, rates and revisions are journaled, so they are cleaned up like a behave run's
+    journal = CleanupJournal.from_env()
+    api.add_listener(journal)
+    try:
+        yield api
+    finally:
+        drain(api, journal, run_id=journal.run_id)
+        if server:
+            journal.forget(REVISION, run_id=journal.run_id)
+        api.close()
+        if server:
+            server.stop()
+
+
+def _write_report(report, output, benchmarks):
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    # The same numbers in the run/compare format, so they can be checked against a baseline
+    write_results(benchmarks, os.path.splitext(output)[0] + ".results.json")
+
+
+def run_exports(args):
+    with _live_api(args.stub) as api:
+        report = exports.run(api, _ints(args.sizes), tuple(args.types.split(",")),
+                             tuple(filter(None, args.collections.split(","))), tuple(args.formats.split(",")),
+                             args.parameters, args.repeat, args.threshold, args.workers)
+    _write_report(report, args.output, exports.as_benchmarks(report))
+    exports.print_summary(report)
+    print(f"Results written to {args.output}")
+    return 1 if report["super_linear"] else 0
+
+
+def run_search(args):
+    with _live_api(args.stub) as api:
+        report = search.run(api, args.rows, tuple(filter(None, args.types.split(","))), _ints(args.page_sizes),
+                            tuple(float(depth) for depth in args.depths.split(",")), _ints(args.limits),
+                            args.revisions, args.repeat, args.max_depth_ratio, args.max_ms, args.workers)
+    _write_report(report, args.output, search.as_benchmarks(report))
+    with open(os.path.splitext(args.output)[0] + ".csv", "w", newline="") as f:
+        csv.writer(f).writerows(search.as_csv_rows(report))
+    search.print_heat_table(report)
+    print(f"Results written to {args.output}")
+    return 1 if report["flagged"] else 0
+
+
+def _ints(text):
+    return [int(value) for value in text.split(",") if value]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""End-to-end benchmarks: behave runs of the revenue features against the contract stub."""
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FEATURES = sorted(glob.glob(os.path.join("features", "revenue", "*.feature")))
+
+
+def _behave(feature, workdir, dry_run=False):
+    """Run behave once in a subprocess; returns ``(wall seconds, request report or None)``."""
+    env = dict(os.environ, API_STUB="1", BDD_OUTPUT_DIR=workdir,
+               CLEANUP_JOURNAL=os.path.join(workdir, "cleanup_journal.jsonl"),
+               IMPACT_MAP=os.path.join(workdir, "impact_map.json"))
+    env.pop("BDD_WORKER_ID", None)
+    command = [sys.executable, "-m", "behave", "-f", "null", "--no-summary", "--no-capture", feature]
+    if dry_run:
+        command.insert(3, "--dry-run")
+    started = time.perf_counter()
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"behave {feature} failed:\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+    report_path = os.path.join(workdir, "request_report.json")
+    if dry_run or not os.path.exists(report_path):
+        return wall, None
+    with open(report_path) as f:
+        return wall, json.load(f)
+
+
+def _request_seconds(report):
+    return sum(row["mean_ms"] * row["count"] for row in report["endpoints"].values()) / 1000
+
+
+def run(selected=None, repeat=3):
+    results = {}
+    for feature in FEATURES:
+        name = os.path.splitext(os.path.basename(feature))[0]
+        if selected and not any(pattern in f"e2e.{name}" for pattern in selected):
+            continue
+        walls, request_times, requests, startups = [], [], 0, []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+                # Interpreter start, imports and parsing, without running any step
+                startups.append(_behave(feature, workdir, dry_run=True)[0])
+                wall, report = _behave(feature, workdir)
+            walls.append(wall)
+            request_times.append(_request_seconds(report))
+            requests = report["requests"]
+        wall = statistics.median(walls)
+        request_time = statistics.median(request_times)
+        startup = statistics.median(startups)
+        results[f"e2e.{name}"] = {
+            "unit": "s",
+            "median": round(wall, 4),
+            "min": round(min(walls), 4),
+            "max": round(max(walls), 4),
+            "runs": repeat,
+            "requests": requests,
+            "request_seconds": round(request_time, 4),
+            "startup_seconds": round(startup, 4),
+            # What is left once the requests and process start-up are taken out
+            "harness_seconds": round(max(wall - request_time - startup, 0.0), 4),
+        }
+        entry = results[f"e2e.{name}"]
+        print(f"e2e.{name:<36} {entry['median']:>11.3f}s  requests {entry['request_seconds']:.3f}s "
+              f"({requests}), startup {entry['startup_seconds']:.3f}s, harness {entry['harness_seconds']:.3f}s")
+    return results
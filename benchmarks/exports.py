@@ -0,0 +1,270 @@
+"""Export endpoint scaling: latency, time to first byte and size against data volume.
+
+One revision is grown step by step (``--sizes 100,1000,10000``: rows per
+revenue type and per revision collection). After every step each export
+endpoint in the contract (``GET .../excel`` and ``.../csv``) is
+downloaded ``repeat`` times. Every call records the total time, the time
+to first byte and the number of bytes.
+
+The run starts with a measurement of the empty revision. That fixed cost is
+taken off, and ``time ~ rows ** k`` is fitted on log-log axes. ``k`` is
+close to 1 for an export that streams its rows. Sizes whose time over the
+fixed cost is within noise (the spread of its repeats, and at least a
+quarter of it) say nothing about ``k`` and are left out of the fit. An
+export whose exponent is above ``threshold`` (1.2) is flagged as
+super-linear, but only when the fit has at least three sizes.
+
+Parameter exports (``/parameters/.../excel``) cover global tables that
+this benchmark does not grow. They are timed at every step, but no curve is
+fitted for them.
+"""
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from support.api_client import XLSX_MIME
+from support.bulk import create_many, default_workers
+from support.contract import load_contract, operations
+from support.factories import REVENUE_TYPES, RateFactory, RevenueFactory, iso_day, revision_payload
+
+RESULTS_PATH = os.path.join("test_output", "benchmarks", "exports.json")
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_THRESHOLD = 1.2
+# Excess over the empty-revision time that counts as noise, as a share of that time
+NOISE_FRACTION = 0.25
+# Sizes a fit needs before it may flag an export
+MIN_FIT_SIZES = 3
+CHUNK_SIZE = 64 * 1024
+ACCEPT = {"excel": XLSX_MIME, "csv": "text/csv"}
+# Revision-scoped collections with their own export endpoints
+COLLECTIONS = ("holidays", "heat-maps", "block-restrictions")
+# Same reference entities as the revenue features
+REFERENCE_ENTITIES = {
+    "Customer": {"id": "22222222-2222-2222-2222-222222222222"},
+    "Aircraft": {"id": "33333333-3333-3333-3333-333333333333"},
+    "CheckType": {"id": "44444444-4444-4444-4444-444444444444"},
+    "Line": {"id": "55555555-5555-5555-5555-555555555555"},
+    "FleetType": {"id": "77777777-7777-7777-7777-777777777777"},
+}
+
+
+def _collection_body(collection, revision_id, index):
+    """Minimal valid body for ``POST /revisions/{collection}`` (see the Create*Request schemas)."""
+    if collection == "holidays":
+        return {"revisionId": revision_id, "customerId": REFERENCE_ENTITIES["Customer"]["id"],
+                "holidayName": f"BENCH holiday {index}", "dates": [iso_day(index % 365)], "active": True}
+    if collection == "heat-maps":
+        return {"revisionId": revision_id, "maximumCapacity": index % 50 + 1,
+                "monthYear": f"{2000 + index // 12:04d}-{index % 12 + 1:02d}-01"}
+    if collection == "block-restrictions":
+        return {"revisionId": revision_id, "lineId": REFERENCE_ENTITIES["Line"]["id"],
+                "initialDate": iso_day(index % 365), "endDate": iso_day(index % 365 + 1),
+                "description": f"BENCH block restriction {index}"}
+    raise ValueError(f"No body builder for revision collection '{collection}'")
+
+
+def export_targets(contract, types_, formats, parameters=True):
+    """``[(name, family, template, path_params, format)]`` for the contract's export endpoints."""
+    targets = []
+    for method, template, _ in operations(contract):
+        export_format = template.rsplit("/", 1)[-1]
+        if method != "GET" or export_format not in formats:
+            continue
+        base = template.rsplit("/", 1)[0]
+        if "{type}" in base:
+            for revenue_type in types_:
+                targets.append((f"{revenue_type}.{export_format}", revenue_type, template,
+                                {"type": revenue_type}, export_format))
+        elif base.startswith("/revisions/{revisionId}/"):
+            collection = base.rsplit("/", 1)[-1]
+            targets.append((f"{collection}.{export_format}", collection, template, {}, export_format))
+        elif parameters:
+            entity = base.rsplit("/", 1)[-1]
+            targets.append((f"parameters.{entity}.{export_format}", None, template, {}, export_format))
+    return targets
+
+
+class Grower:
+    """Adds rows to one revision until each family holds the requested number."""
+
+    def __init__(self, api, revision_id, workers=None):
+        self.api = api
+        self.revision_id = revision_id
+        self.workers = workers or default_workers()
+        self.counts = {}
+        self.failures = {}
+        self.revenue_factories = {}
+        self.rate_factory = RateFactory(REFERENCE_ENTITIES, revision_id)
+
+    def _payload(self, family, index):
+        if family == "rates":
+            # Unique (level, year) per rate, as in "I have created {count} rate entries"
+            return self.rate_factory.build(index % 3 + 1, 2000 + index // 3)
+        factory = self.revenue_factories.get(family)
+        if factory is None:
+            factory = self.revenue_factories[family] = RevenueFactory(REFERENCE_ENTITIES, self.revision_id, family)
+        return factory.build(registration_date=iso_day(index % 365), workOrder=f"BENCH-{family}-{index}")
+
+    def _post_collection(self, collection, indexes):
+        failed = []
+        lock = threading.Lock()
+
+        def create(index):
+            response = self.api.post("/revisions/{collection}", collection=collection,
+                                     json=_collection_body(collection, self.revision_id, index))
+            if response.status_code not in (200, 201):
+                with lock:
+                    failed.append(response.status_code)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(create, indexes))
+        return len(indexes) - len(failed), len(failed)
+
+    def grow(self, family, rows):
+        start = self.counts.get(family, 0)
+        if rows <= start:
+            return
+        indexes = range(start, rows)
+        if family in REVENUE_TYPES or family == "rates":
+            result = create_many(self.api, family, (self._payload(family, index) for index in indexes),
+                                 workers=self.workers)
+            created, failed = len(result.created_ids), len(result.failures)
+        else:
+            created, failed = self._post_collection(family, indexes)
+        self.counts[family] = start + created
+        if failed:
+            self.failures[family] = self.failures.get(family, 0) + failed
+
+
+def time_export(api, template, path_params, export_format):
+    """One streamed download: ``(status, seconds, ttfb seconds, bytes)``."""
+    started = time.perf_counter()
+    response = api.get(template, stream=True, headers={"accept": ACCEPT[export_format], "Content-Type": None},
+                       **path_params)
+    size = 0
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+        response.body_bytes = size
+    finally:
+        response.close()
+    return response.status_code, time.perf_counter() - started, response.elapsed.total_seconds(), size
+
+
+def usable_points(points, overhead, noise=0.0):
+    """``(rows, seconds)`` points whose time exceeds ``overhead`` by more than ``noise``."""
+    return [(rows, seconds) for rows, seconds in points if rows > 0 and seconds - overhead > noise]
+
+
+def fit_exponent(points, overhead, noise=0.0):
+    """Least-squares slope of log(time - overhead) over log(rows), on ``usable_points``; ``None`` with fewer than two."""
+    logs = [(math.log(rows), math.log(seconds - overhead)) for rows, seconds in usable_points(points, overhead, noise)]
+    if len(logs) < 2:
+        return None
+    mean_x = statistics.fmean(x for x, _ in logs)
+    mean_y = statistics.fmean(y for _, y in logs)
+    spread = sum((x - mean_x) ** 2 for x, _ in logs)
+    if not spread:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in logs) / spread
+
+
+def classify(exponent, threshold=DEFAULT_THRESHOLD, sizes=MIN_FIT_SIZES):
+    """Complexity label for a fitted exponent; a fit over fewer than ``MIN_FIT_SIZES`` sizes is never flagged."""
+    if exponent is None:
+        return "n/a"
+    if exponent < 0.5:
+        return "~O(1)"
+    if exponent <= threshold:
+        return "~O(n)"
+    if sizes < MIN_FIT_SIZES:
+        return f"~O(n^{exponent:.2f})? (only {sizes} sizes above noise)"
+    return f"SUPER-LINEAR ~O(n^{exponent:.2f})"
+
+
+def run(api, sizes=DEFAULT_SIZES, types_=REVENUE_TYPES + ("rates",), collections=COLLECTIONS,
+        formats=("excel", "csv"), parameters=True, repeat=3, threshold=DEFAULT_THRESHOLD, workers=None, log=print):
+    """Grow a fresh revision through ``sizes`` and time every export at each size; returns the report."""
+    response = api.post("revisions", json=revision_payload("Export scaling benchmark"))
+    assert response.status_code in (200, 201), f"Could not create a revision: {response.status_code} {response.text[:200]}"
+    revision_id = response.json()["revisionId"]
+    grower = Grower(api, revision_id, workers)
+    targets = [target for target in export_targets(load_contract(), types_, formats, parameters)
+               if target[1] is None or target[1] in types_ or target[1] in collections]
+    results = {name: {"endpoint": template, "family": family, "format": export_format, "points": []}
+               for name, family, template, _, export_format in targets}
+
+    for size in (0, *sizes):
+        started = time.perf_counter()
+        for family in (*types_, *collections):
+            grower.grow(family, size)
+        if size:
+            log(f"grew revision {revision_id} to {size} rows per family in {time.perf_counter() - started:.1f}s"
+                + (f" (failed: {grower.failures})" if grower.failures else ""))
+        for name, family, template, path_params, export_format in targets:
+            if "{revisionId}" in template:
+                path_params = dict(path_params, revisionId=revision_id)
+            samples = [time_export(api, template, path_params, export_format) for _ in range(repeat)]
+            statuses = {status for status, _, _, _ in samples}
+            point = {
+                "rows": grower.counts.get(family, 0) if family else None,
+                "size": size,
+                "status": max(statuses),
+                "seconds": round(statistics.median(seconds for _, seconds, _, _ in samples), 5),
+                "spread_seconds": round(max(seconds for _, seconds, _, _ in samples)
+                                        - min(seconds for _, seconds, _, _ in samples), 5),
+                "ttfb_seconds": round(statistics.median(ttfb for _, _, ttfb, _ in samples), 5),
+                "bytes": max(size_ for _, _, _, size_ in samples),
+            }
+            results[name]["points"].append(point)
+            log(f"  {name:<34} rows {point['rows'] if family else '-':>7}  {point['seconds'] * 1000:>9.1f} ms  "
+                f"ttfb {point['ttfb_seconds'] * 1000:>8.1f} ms  {point['bytes']:>11} B  [{point['status']}]")
+
+    flagged = []
+    for name, entry in results.items():
+        points = entry["points"]
+        exponent = None
+        fitted = []
+        if entry["family"] is not None:
+            overhead = points[0]["seconds"]
+            measured = [p for p in points[1:] if p["status"] == 200]
+            # Subtracting the empty-revision time is only as exact as that measurement
+            noise = max(overhead * NOISE_FRACTION, points[0]["spread_seconds"])
+            fitted = usable_points([(p["rows"], p["seconds"]) for p in measured], overhead, noise)
+            exponent = fit_exponent(fitted, overhead)
+            entry["noise_seconds"] = round(noise, 5)
+        entry["fit_sizes"] = len(fitted)
+        entry["exponent"] = round(exponent, 3) if exponent is not None else None
+        entry["complexity"] = classify(exponent, threshold, len(fitted))
+        largest = points[-1]
+        if largest["rows"]:
+            entry["bytes_per_row"] = round(largest["bytes"] / largest["rows"], 1)
+            entry["us_per_row"] = round(max(largest["seconds"] - points[0]["seconds"], 0.0) / largest["rows"] * 1e6, 3)
+        if exponent is not None and exponent > threshold and len(fitted) >= MIN_FIT_SIZES:
+            flagged.append(name)
+    return {"revisionId": revision_id, "sizes": list(sizes), "threshold": threshold, "grown": grower.counts,
+            "growth_failures": grower.failures, "exports": results, "super_linear": flagged}
+
+
+def as_benchmarks(report):
+    """Median seconds per export and size, in the ``write_results`` format, for ``compare``."""
+    benchmarks = {}
+    for name, entry in report["exports"].items():
+        for point in entry["points"]:
+            if point["size"]:
+                benchmarks[f"exports.{name}@{point['size']}"] = {
+                    "unit": "s", "median": point["seconds"], "ttfb": point["ttfb_seconds"], "bytes": point["bytes"]}
+    return benchmarks
+
+
+def print_summary(report):
+    print(f"{'export':<34} {'exponent':>9} {'us/row':>9} {'B/row':>8}  complexity")
+    for name, entry in sorted(report["exports"].items()):
+        exponent = f"{entry['exponent']:.2f}" if entry["exponent"] is not None else "-"
+        print(f"{name:<34} {exponent:>9} {entry.get('us_per_row', '-'):>9} {entry.get('bytes_per_row', '-'):>8}  "
+              f"{entry['complexity']}")
+    if report["super_linear"]:
+        print(f"{len(report['super_linear'])} super-linear exports: {', '.join(report['super_linear'])}")
@@ -0,0 +1,105 @@
+"""Timing, result files and baseline comparison."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+RESULTS_PATH = os.path.join("test_output", "benchmarks", "latest.json")
+BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.2
+
+
+def measure(fn, repeat=7, min_batch_seconds=0.05):
+    """Time ``fn()`` like ``timeit``: batch calls until a batch takes ``min_batch_seconds``, then repeat.
+
+    Returns per-call microseconds (median/min/max) plus the batch size used.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= min_batch_seconds or number >= 1 << 20:
+            break
+        number *= 2
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number * 1e6)
+    return {
+        "unit": "us",
+        "median": round(statistics.median(timings), 3),
+        "min": round(min(timings), 3),
+        "max": round(max(timings), 3),
+        "runs": repeat,
+        "number": number,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def write_results(benchmarks, path):
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "benchmarks": benchmarks,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return results
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Rows of ``(name, baseline median, current median, ratio, verdict)`` for benchmarks in both files."""
+    rows = []
+    for name, entry in sorted(current["benchmarks"].items()):
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            rows.append((name, None, entry["median"], None, "new"))
+            continue
+        ratio = entry["median"] / before["median"] if before["median"] else float("inf")
+        if ratio > 1 + threshold:
+            verdict = "REGRESSION"
+        elif ratio < 1 - threshold:
+            verdict = "faster"
+        else:
+            verdict = "ok"
+        rows.append((name, before["median"], entry["median"], ratio, verdict))
+    for name in sorted(set(baseline["benchmarks"]) - set(current["benchmarks"])):
+        rows.append((name, baseline["benchmarks"][name]["median"], None, None, "missing"))
+    return rows
+
+
+def print_comparison(rows, baseline, current):
+    units = {name: entry.get("unit", "") for name, entry in {**baseline["benchmarks"],
+                                                               **current["benchmarks"]}.items()}
+    print(f"baseline {baseline['meta'].get('git') or '?'} ({baseline['meta'].get('timestamp')}) vs "
+          f"current {current['meta'].get('git') or '?'} ({current['meta'].get('timestamp')})")
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'ratio':>7}  verdict")
+    for name, before, after, ratio, verdict in rows:
+        unit = units.get(name, "")
+        before_text = f"{before:.3f}{unit}" if before is not None else "-"
+        after_text = f"{after:.3f}{unit}" if after is not None else "-"
+        ratio_text = f"{ratio:.2f}" if ratio is not None else "-"
+        print(f"{name:<40} {before_text:>12} {after_text:>12} {ratio_text:>7}  {verdict}")
@@ -0,0 +1,170 @@
+"""Microbenchmarks of the harness hot paths; no HTTP involved.
+
+``step_matching_all_features`` matches every step of every feature once; the
+JSON benchmarks use a labor listing page of ``LISTING_ITEMS`` items.
+``execute_steps_one_step`` and ``step_run_one_step`` go through behave's own
+``Context``/``Runner``, as a behave run does; ``run_step_one_step`` times the
+load runners' ``support.load.run_step`` instead.
+"""
+import glob
+import json
+import logging
+import os
+import types
+import uuid
+
+import requests
+from behave.configuration import Configuration
+from behave.parser import parse_file
+from behave.runner import Context, Runner
+from behave.runner_util import load_step_modules
+from behave.step_registry import registry
+
+from benchmarks.harness import measure
+from support.factories import RevenueFactory, iso_day
+from support.load import VirtualUserContext, run_step
+
+FEATURES_DIR = "features"
+LABOR_FEATURE = os.path.join(FEATURES_DIR, "revenue", "labor_revenue.feature")
+LISTING_ITEMS = 5000
+
+_steps_loaded = False
+
+
+def _load_steps():
+    global _steps_loaded
+    if not _steps_loaded:
+        load_step_modules([os.path.join(FEATURES_DIR, "steps")])
+        _steps_loaded = True
+
+
+def _state():
+    logger = logging.getLogger("benchmarks")
+    logger.setLevel(logging.WARNING)
+    return dict(
+        logger=logger,
+        revision_id=str(uuid.uuid4()),
+        reference_entities={
+            "Customer": {"id": "22222222-2222-2222-2222-222222222222", "name": "TEST-CUSTOMER"},
+            "Aircraft": {"id": "33333333-3333-3333-3333-333333333333", "name": "TEST-REG"},
+            "CheckType": {"id": "44444444-4444-4444-4444-444444444444", "name": "TEST-CHECK"},
+            "Line": {"id": "55555555-5555-5555-5555-555555555555", "name": "TEST-LINE"},
+        },
+        labor_data={},
+    )
+
+
+def _context():
+    return VirtualUserContext(types.SimpleNamespace(**_state()))
+
+
+def _behave_context(feature):
+    """A behave ``Context`` inside ``feature``, with no hooks or formatters, as steps see it in a run."""
+    runner = Runner(Configuration(command_args=[], load_config=False))
+    runner.step_registry = registry  # what Runner.load_step_definitions() would attach
+    context = Context(runner)
+    runner.context = context
+    context.feature = feature
+    for name, value in _state().items():
+        setattr(context, name, value)
+    return runner, context
+
+
+def _find_step(feature, name):
+    for scenario in feature.walk_scenarios():
+        for step in scenario.steps:
+            if step.name == name:
+                return step
+    raise LookupError(f"No step {name!r} in {feature.filename}")
+
+
+def _listing(count):
+    """A labor listing page shaped like the API's, ``count`` items long."""
+    factory = RevenueFactory(_context().reference_entities, str(uuid.uuid4()), "labor")
+    items = []
+    for index in range(count):
+        item = factory.build(rubrics=(("AIRFRAME_LABOR", 1000.0 + index, 10.0), ("BACKSHOP_LABOR", 500.0, 5.0)),
+                             registration_date=iso_day(index % 30))
+        item.update(id=str(uuid.uuid4()), customerCode="TEST-CUSTOMER", customerName="Test Customer",
+                    aircraftTailNumber="TEST-REG", createdAt="2024-01-01T00:00:00", updatedAt="2024-01-01T00:00:00")
+        for rubric in item["rubrics"].values():
+            rubric["id"] = str(uuid.uuid4())
+        items.append(item)
+    return {"items": items, "pagination": {"currentPage": 0, "pageSize": count, "totalItems": count,
+                                           "totalPages": 1}}
+
+
+def benchmarks():
+    """``{name: zero-argument callable}`` for every microbenchmark."""
+    _load_steps()
+    feature = parse_file(LABOR_FEATURE)
+    context = _context()
+
+    details = _find_step(feature, "I have labor revenue data with the following details")
+    rubrics = _find_step(feature, "I have the following labor rubrics")
+    details_match = registry.find_match(details)
+    rubrics_match = registry.find_match(rubrics)
+
+    def table_to_payload():
+        context.table = details.table
+        details_match.run(context)
+
+    def rubric_conversion():
+        context.labor_data = {}
+        context.table = rubrics.table
+        rubrics_match.run(context)
+
+    all_steps = []
+    for path in sorted(glob.glob(os.path.join(FEATURES_DIR, "**", "*.feature"), recursive=True)):
+        parsed = parse_file(path)
+        if parsed.background:
+            all_steps.extend(parsed.background.steps)
+        for scenario in parsed.walk_scenarios():
+            all_steps.extend(scenario.steps)
+
+    def step_matching():
+        for step in all_steps:
+            registry.find_match(step)
+
+    # The same trivial step, re-parsed from text each time vs. already parsed
+    revision_step = next(step for step in feature.background.steps if step.name == "a test revision exists")
+    runner, behave_context = _behave_context(feature)
+
+    def execute_steps():
+        behave_context.execute_steps('Given a test revision exists')
+
+    def step_run():
+        revision_step.run(runner, quiet=True, capture=False)
+
+    def direct_step():
+        # The load/soak/matrix runners' dispatch, not behave's
+        run_step(context, revision_step)
+
+    listing = _listing(LISTING_ITEMS)
+    text = json.dumps(listing)
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json"
+    response._content = text.encode("utf-8")
+
+    return {
+        "micro.table_to_payload": table_to_payload,
+        "micro.rubric_conversion": rubric_conversion,
+        "micro.step_matching_all_features": step_matching,
+        "micro.execute_steps_one_step": execute_steps,
+        "micro.step_run_one_step": step_run,
+        "micro.run_step_one_step": direct_step,
+        "micro.json_encode_listing": lambda: json.dumps(listing),
+        "micro.json_decode_listing": lambda: json.loads(text),
+        "micro.response_json_listing": response.json,
+    }
+
+
+def run(selected=None, repeat=7):
+    results = {}
+    for name, fn in benchmarks().items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(fn, repeat=repeat)
+        print(f"{name:<40} {results[name]['median']:>12.3f}us (x{results[name]['number']})")
+    return results
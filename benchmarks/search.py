@@ -0,0 +1,229 @@
+"""Search and pagination latency: page depth, page size and search selectivity.
+
+A fresh revision is seeded with ``rows`` revenues per type. Each row's
+customer code is built so that one search text matches a known share of
+the rows:
+
+* ``all``: every row.
+* ``tenth``: every tenth row.
+* ``hundredth``: every hundredth row.
+* ``single``: exactly one row.
+* ``none``: no row.
+* ``unfiltered``: no ``searchText`` at all.
+
+The run token makes those texts unique to the run, so existing data on a
+shared backend does not change the counts.
+
+For every selectivity and ``pageSize``, the listing is requested at
+several depths into its page range, from the first page to the last. Each
+cell is the median latency of ``repeat`` calls. The cost of offset
+pagination then shows up as the difference between the first and last
+columns of the heat table. A row whose last page is more than
+``max_depth_ratio`` times slower than its first page is flagged.
+
+``/revisions/search`` is profiled the same way over ``revisions`` seeded
+revisions. It has no paging, so ``limit`` takes the place of ``pageSize``
+and there is a single depth.
+"""
+import math
+import os
+import statistics
+import uuid
+
+from benchmarks.exports import REFERENCE_ENTITIES
+from support.bulk import create_many, default_workers
+from support.factories import REVENUE_TYPES, RevenueFactory, revision_payload
+
+RESULTS_PATH = os.path.join("test_output", "benchmarks", "search.json")
+DEFAULT_ROWS = 1000
+DEFAULT_PAGE_SIZES = (10, 100, 1000)
+DEFAULT_LIMITS = (5, 50, 500)
+DEFAULT_DEPTHS = (0.0, 0.25, 0.5, 1.0)
+DEFAULT_MAX_DEPTH_RATIO = 3.0
+DEFAULT_REVISIONS = 20
+SELECTIVITIES = ("unfiltered", "all", "tenth", "hundredth", "single", "none")
+SHADES = " ░▒▓█"
+
+
+def customer_code(token, index):
+    """``<token>[X|XX]-<index>.``: ``<token>X`` matches every tenth row and ``<token>XX`` every hundredth."""
+    marks = "XX" if index % 100 == 0 else "X" if index % 10 == 0 else ""
+    return f"{token}{marks}-{index}."
+
+
+def search_texts(token, single_index=7):
+    """Search text per selectivity; ``None`` sends no ``searchText``."""
+    return {
+        "unfiltered": None,
+        "all": token,
+        "tenth": f"{token}X",
+        "hundredth": f"{token}XX",
+        "single": customer_code(token, single_index),
+        "none": f"{token}-NONE",
+    }
+
+
+def depth_pages(total_items, page_size, depths):
+    """``{depth: page}`` for fractions of the page range; depth 1.0 is the last page."""
+    last = max(math.ceil(total_items / page_size) - 1, 0)
+    return {depth: round(last * depth) for depth in depths}
+
+
+def _timed(api, endpoint, repeat, params, **path_params):
+    """Median wall time of ``repeat`` calls, with the last response."""
+    samples = []
+    response = None
+    for _ in range(repeat):
+        response = api.get(endpoint, params=params, **path_params)
+        samples.append(response.wall_time)
+    return statistics.median(samples), response
+
+
+def seed_revenues(api, revision_id, revenue_type, rows, token, workers):
+    factory = RevenueFactory(REFERENCE_ENTITIES, revision_id, revenue_type)
+    payloads = (factory.build(customerCode=customer_code(token, index),
+                              customerName=f"Sweep customer {index}", workOrder=f"SWEEP-{index}")
+                for index in range(rows))
+    result = create_many(api, revenue_type, payloads, workers=workers)
+    return len(result.created_ids), len(result.failures)
+
+
+def seed_revisions(api, count, token):
+    created = 0
+    for index in range(count):
+        payload = revision_payload(f"Search sweep {customer_code(token, index)}")
+        created += api.post("revisions", json=payload).status_code in (200, 201)
+    return created
+
+
+def _flag(rows, max_depth_ratio, max_ms):
+    """Append a ``flags`` list to every row and return the flagged ``(name, reason)`` pairs."""
+    flagged = []
+    for row in rows:
+        flags = []
+        first, last = row["cells"][0], row["cells"][-1]
+        if first["ms"] and last["page"] != first["page"]:
+            row["depth_ratio"] = round(last["ms"] / first["ms"], 2)
+            if row["depth_ratio"] > max_depth_ratio:
+                flags.append(f"last page {row['depth_ratio']}x the first (max {max_depth_ratio}x)")
+        slowest = max(cell["ms"] for cell in row["cells"])
+        if max_ms and slowest > max_ms:
+            flags.append(f"{slowest:.1f} ms over the {max_ms} ms budget")
+        if any(cell["status"] != 200 for cell in row["cells"]):
+            flags.append("non-200 responses")
+        row["flags"] = flags
+        flagged.extend((row["name"], reason) for reason in flags)
+    return flagged
+
+
+def profile_listing(api, revision_id, revenue_type, texts, page_sizes, depths, repeat, log=print):
+    """One heat-table row per selectivity and page size for the revenue listing."""
+    rows = []
+    for selectivity, text in texts.items():
+        params = {"searchText": text} if text is not None else {}
+        for page_size in page_sizes:
+            _, probe = _timed(api, "revenue_list", 1, dict(params, page=0, pageSize=page_size),
+                              revisionId=revision_id, type=revenue_type)
+            total = (probe.json().get("pagination") or {}).get("totalItems", 0) if probe.status_code == 200 else 0
+            measured = {}
+            cells = []
+            for depth, page in depth_pages(total, page_size, depths).items():
+                if page not in measured:
+                    measured[page] = _timed(api, "revenue_list", repeat, dict(params, page=page, pageSize=page_size),
+                                            revisionId=revision_id, type=revenue_type)
+                seconds, response = measured[page]
+                cells.append({"depth": depth, "page": page, "offset": page * page_size,
+                              "ms": round(seconds * 1000, 3), "status": response.status_code})
+            rows.append({"name": f"{revenue_type}.{selectivity}.p{page_size}", "endpoint": "revenue_list",
+                         "type": revenue_type, "selectivity": selectivity, "page_size": page_size,
+                         "matches": total, "cells": cells})
+            log(f"  {rows[-1]['name']:<32} {total:>7} matches  "
+                + "  ".join(f"{cell['ms']:>8.1f}" for cell in cells))
+    return rows
+
+
+def profile_revision_search(api, texts, limits, repeat, log=print):
+    """One row per selectivity and limit for ``/revisions/search`` (no paging, so a single depth)."""
+    rows = []
+    for selectivity, text in texts.items():
+        if text is None:
+            continue  # searchText is required here
+        for limit in limits:
+            seconds, response = _timed(api, "/revisions/search", repeat, {"searchText": text, "limit": limit})
+            matches = len(response.json()) if response.status_code == 200 else 0
+            rows.append({"name": f"revisions.{selectivity}.l{limit}", "endpoint": "/revisions/search",
+                         "selectivity": selectivity, "page_size": limit, "matches": matches,
+                         "cells": [{"depth": 0.0, "page": 0, "offset": 0, "ms": round(seconds * 1000, 3),
+                                    "status": response.status_code}]})
+            log(f"  {rows[-1]['name']:<32} {matches:>7} matches  {seconds * 1000:>8.1f}")
+    return rows
+
+
+def run(api, rows=DEFAULT_ROWS, types_=REVENUE_TYPES, page_sizes=DEFAULT_PAGE_SIZES, depths=DEFAULT_DEPTHS,
+        limits=DEFAULT_LIMITS, revisions=DEFAULT_REVISIONS, repeat=3, max_depth_ratio=DEFAULT_MAX_DEPTH_RATIO,
+        max_ms=None, workers=None, log=print):
+    """Seed a fresh revision, sweep every combination and return the report."""
+    token = f"SW{uuid.uuid4().hex[:8].upper()}"
+    texts = search_texts(token)
+    response = api.post("revisions", json=revision_payload("Search sweep benchmark"))
+    assert response.status_code in (200, 201), f"Could not create a revision: {response.status_code} {response.text[:200]}"
+    revision_id = response.json()["revisionId"]
+
+    seeded, failures = {}, {}
+    for revenue_type in types_:
+        seeded[revenue_type], failed = seed_revenues(api, revision_id, revenue_type, rows, token,
+                                                     workers or default_workers())
+        if failed:
+            failures[revenue_type] = failed
+    seeded["revisions"] = seed_revisions(api, revisions, token) if revisions else 0
+    log(f"seeded revision {revision_id} with token {token}: {seeded}"
+        + (f" (failed: {failures})" if failures else ""))
+
+    table = []
+    for revenue_type in types_:
+        table.extend(profile_listing(api, revision_id, revenue_type, texts, page_sizes, depths, repeat, log))
+    if revisions:
+        table.extend(profile_revision_search(api, texts, limits, repeat, log))
+    flagged = _flag(table, max_depth_ratio, max_ms)
+    return {"revisionId": revision_id, "token": token, "rows": rows, "seeded": seeded,
+            "seed_failures": failures, "depths": list(depths), "max_depth_ratio": max_depth_ratio,
+            "max_ms": max_ms, "table": table, "flagged": [f"{name}: {reason}" for name, reason in flagged]}
+
+
+def as_benchmarks(report):
+    """Median seconds per cell, in the ``write_results`` format, for ``compare``."""
+    return {f"search.{row['name']}@{cell['depth']:g}": {"unit": "s", "median": cell["ms"] / 1000,
+                                                          "page": cell["page"], "matches": row["matches"]}
+            for row in report["table"] for cell in row["cells"]}
+
+
+def as_csv_rows(report):
+    header = ["name", "endpoint", "selectivity", "page_size", "matches", "depth", "page", "offset", "ms", "status"]
+    yield header
+    for row in report["table"]:
+        for cell in row["cells"]:
+            yield [row["name"], row["endpoint"], row["selectivity"], row["page_size"], row["matches"],
+                   cell["depth"], cell["page"], cell["offset"], cell["ms"], cell["status"]]
+
+
+def _shade(ms, low, high):
+    if high <= low:
+        return SHADES[0]
+    return SHADES[min(int((ms - low) / (high - low) * len(SHADES)), len(SHADES) - 1)]
+
+
+def print_heat_table(report):
+    """Latency per row and depth, shaded from the fastest to the slowest cell of the table."""
+    timings = [cell["ms"] for row in report["table"] for cell in row["cells"]]
+    if not timings:
+        return
+    low, high = min(timings), max(timings)
+    print(f"{'ms by depth':<32} {'matches':>7}  " + "  ".join(f"{depth:>9.0%}" for depth in report["depths"])
+          + "  deep/first")
+    for row in report["table"]:
+        cells = "  ".join(f"{_shade(cell['ms'], low, high)}{cell['ms']:>8.1f}" for cell in row["cells"])
+        ratio = f"{row['depth_ratio']:>9.2f}x" if "depth_ratio" in row else f"{'-':>10}"
+        print(f"{row['name']:<32} {row['matches']:>7}  {cells}  {ratio}{'  !' if row['flags'] else ''}")
+    print(f"shades: '{SHADES}' from {low:.1f} ms to {high:.1f} ms")
+    for line in report["flagged"]:
+        print(f"FLAGGED {line}")
@@ -1,12 +1,24 @@
 import os
-import logging
 import uuid
 from dotenv import load_dotenv
-import requests
 import json
 from datetime import datetime, timedelta
 import pathlib
 
+from support.api_client import ApiClient
+from support.async_client import AsyncApi
+from support.concurrency import AdaptiveLimiter
+from support.factories import revision_payload
+from support.impact import ImpactMap
+from support.log_pipeline import LogPipeline, RequestLog
+from support.cleanup import REVISION, CleanupJournal, drain
+from support.metrics import RequestMetrics
+from support.reference_cache import ReferenceCache
+from support.response_cache import ResponseCache
+from support.revision_pool import RevisionPool
+from support.stub_server import StubServer
+from support.validation import ResponseValidator
+
 # Create output directory for test files
 pathlib.Path("test_output").mkdir(exist_ok=True)
 
@@ -16,12 +28,36 @@ def before_all(context):
     context.base_url = os.getenv('API_BASE_URL', 'http://localhost:8085/mroh-backend-hms/api')
     context.token = os.getenv('API_TOKEN')
     
+    # API_STUB=1 runs against the in-process contract stub instead of a backend
+    context.stub_server = None
+    if os.getenv('API_STUB', '').lower() in ('1', 'true', 'yes'):
+        context.stub_server = StubServer().start()
+        context.base_url = context.stub_server.base_url
+        context.token = context.token or 'stub-token'
+    
+    # Parallel workers (support/parallel.py) each get their own output directory
+    context.worker_id = os.getenv('BDD_WORKER_ID')
+    context.output_dir = os.getenv('BDD_OUTPUT_DIR', 'test_output')
+    pathlib.Path(context.output_dir).mkdir(parents=True, exist_ok=True)
+    
     # Set up API clients
     context.headers = {
         "accept": "application/json",
         "Authorization": f"Bearer {context.token}",
         "Content-Type": "application/json"
     }
+    context.api = ApiClient.from_env(context.base_url, headers=context.headers)
+    # API_ADAPTIVE=1: requests in flight follow an AIMD limit instead of the callers' worker counts
+    if os.getenv('API_ADAPTIVE', '').lower() in ('1', 'true', 'yes'):
+        context.api.enable_limiter(AdaptiveLimiter.from_env(int(os.getenv('API_POOL_SIZE', '10'))))
+    # Independent requests of fan-out steps go out concurrently (API_CONCURRENCY at a time)
+    context.async_api = AsyncApi(context.api)
+    
+    # API_CACHE=1: repeated GETs are answered from a write-invalidated cache (ETag-revalidated when possible)
+    context.response_cache = None
+    if os.getenv('API_CACHE', '').lower() in ('1', 'true', 'yes'):
+        context.response_cache = ResponseCache.from_env(context.api.endpoints.values())
+        context.api.enable_cache(context.response_cache)
     
     # Track test data
     context.revision_id = None
@@ -29,23 +65,55 @@ def before_all(context):
     context.reference_entities = {}
     context.rate_ids = []  # Add this line to track rate IDs
     
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("test_output/bdd_test.log"),
-            logging.StreamHandler()
-        ]
-    )
-    context.logger = logging.getLogger(__name__)
+    # Everything the API creates is journaled on disk so a killed run can still be cleaned up
+    context.cleanup_journal = CleanupJournal.from_env()
+    context.api.add_listener(context.cleanup_journal)
+    
+    # REVISION_POOL=1: fixture steps get clones of pre-seeded "golden" revisions
+    context.revision_pool = None
+    if os.getenv('REVISION_POOL', '').lower() in ('1', 'true', 'yes'):
+        context.revision_pool = RevisionPool.from_env(context.api, context.cleanup_journal)
+    
+    # Reference entity lookups are cached for the whole run (REFERENCE_CACHE_TTL in seconds)
+    ttl = os.getenv('REFERENCE_CACHE_TTL')
+    context.reference_cache = ReferenceCache(context.async_api, ttl=float(ttl) if ttl else None)
+    
+    # Set up logging: records are queued and written by a background thread (text log, JSONL, console).
+    # behave's log capture shows them on failures itself, so the console only gets them without it
+    capturing = getattr(getattr(context, 'config', None), 'log_capture', False)
+    context.log_pipeline = LogPipeline(context.output_dir, console=not capturing)
+    context.logger = context.log_pipeline.logger
+    if os.getenv('LOG_REQUESTS', '1').lower() not in ('0', 'false', 'no'):
+        context.api.add_listener(RequestLog())
+    if context.revision_pool:
+        context.revision_pool.logger = context.logger
     context.logger.info("Test run started")
+    
+    # Check every API response against contracts.json (CONTRACT_VALIDATION=off|warn|strict)
+    context.contract_validator = ResponseValidator(
+        mode=os.getenv('CONTRACT_VALIDATION', 'warn'), logger=context.logger)
+    context.api.add_listener(context.contract_validator)
+    
+    # Record latency, TTFB and payload sizes of every request for the run report
+    context.request_metrics = RequestMetrics()
+    context.api.add_listener(context.request_metrics)
+    
+    # Which contract operations each scenario calls, for python -m support.impact (IMPACT_MAP)
+    context.impact_map = ImpactMap.from_env()
+    if context.impact_map:
+        context.api.add_use_listener(context.impact_map)
 
 def before_scenario(context, scenario):
     context.logger.info(f"Starting scenario: {scenario.name}")
+    context.request_metrics.scenario = scenario.name
+    context.request_metrics.step = "before_scenario"
+    context.log_pipeline.scenario = scenario.name
+    context.log_pipeline.step = "before_scenario"
+    if context.impact_map:
+        context.impact_map.start(scenario)
     
     # Create a revision if needed and none exists
-    if 'revenue_test' in scenario.tags and not context.revision_id:
+    if {'revenue_test', 'rates_test', 'revision_test'} & set(scenario.tags) and not context.revision_id:
         create_test_revision(context, scenario.name)
     
     # Create reference entities if needed
@@ -54,64 +122,82 @@ def before_scenario(context, scenario):
         # or create them if they don't
         pass
 
+def before_step(context, step):
+    context.request_metrics.step = f"{step.keyword} {step.name}"
+    context.log_pipeline.step = context.request_metrics.step
+    if context.impact_map:
+        context.impact_map.step()
+
 def after_scenario(context, scenario):
     context.logger.info(f"Completed scenario: {scenario.name}")
+    context.request_metrics.scenario = None
+    context.request_metrics.step = None
+    context.log_pipeline.scenario = None
+    context.log_pipeline.step = None
+    if context.impact_map:
+        context.impact_map.finish(scenario)
 
 def after_all(context):
-    # Clean up created revenues
-    if context.revenue_ids:
-        url = f"{context.base_url}/revisions/revenue_options/parameters/labor/delete"
-        data = {"revenueIds": context.revenue_ids}
-        try:
-            response = requests.put(url, headers=context.headers, json=data)
-            if response.status_code == 200:
-                result = response.json()
-                context.logger.info(f"Cleaned up {len(result.get('deletedRevenues', []))} labor revenue entries")
-            else:
-                context.logger.error(f"Failed to clean up revenues: {response.text}")
-        except Exception as e:
-            context.logger.error(f"Error cleaning up revenues: {str(e)}")
-    
-    # Clean up created rates
-    if hasattr(context, 'rate_ids') and context.rate_ids:
-        url = f"{context.base_url}/revisions/revenue_options/parameters/rates/delete"
-        data = {"rateIds": context.rate_ids}
-        try:
-            response = requests.put(url, headers=context.headers, json=data)
-            if response.status_code == 200:
-                result = response.json()
-                context.logger.info(f"Cleaned up {len(result.get('deletedRates', []))} rate entries")
-            else:
-                context.logger.error(f"Failed to clean up rates: {response.text}")
-        except Exception as e:
-            context.logger.error(f"Error cleaning up rates: {str(e)}")
+    context.request_metrics.step = "after_all"
+    context.log_pipeline.step = "after_all"
+    
+    if context.revision_pool:
+        context.revision_pool.close()
+        context.logger.info(context.revision_pool.summary())
     
+    # Clean up everything this run created (chunked, in parallel per type)
+    try:
+        results = drain(context.api, context.cleanup_journal, run_id=context.cleanup_journal.run_id)
+        if context.stub_server:
+            # Stub revisions disappear with the process
+            context.cleanup_journal.forget(REVISION, run_id=context.cleanup_journal.run_id)
+        for kind, result in results.items():
+            if kind == REVISION:
+                if context.stub_server:
+                    continue
+                context.logger.info(f"{result['pending']} test revisions left in {context.cleanup_journal.path} "
+                                    f"(no delete endpoint; see python -m support.cleanup --sql)")
+                continue
+            context.logger.info(f"Cleaned up {result['deleted']} {kind} entries")
+            if result['failed']:
+                context.logger.error(f"Failed to clean up {result['failed']} {kind} entries: {result['errors'][0]}")
+        context.cleanup_journal.compact()
+    except Exception as e:
+        context.logger.error(f"Error cleaning up test data: {str(e)}")
+    
+    context.logger.info(context.reference_cache.summary())
+    if context.response_cache:
+        context.logger.info(context.response_cache.summary())
+        with open(os.path.join(context.output_dir, "response_cache.json"), "w") as f:
+            json.dump(context.response_cache.stats(), f, indent=2)
+    context.logger.info(context.contract_validator.summary())
+    extra = None
+    if context.api.limiter:
+        context.logger.info(context.api.limiter.summary())
+        extra = {"concurrency": context.api.limiter.stats()}
+    report = context.request_metrics.write_report(context.output_dir, extra)
+    context.logger.info(f"Request report written to {report}")
+    if context.impact_map:
+        recorded = context.impact_map.save()
+        context.logger.info(f"Impact map: {recorded} scenarios recorded in {context.impact_map.path}")
+    context.async_api.close()
+    context.api.close()
+    if context.stub_server:
+        context.stub_server.stop()
     context.logger.info("Test run completed")
+    context.log_pipeline.stop()
 
 def create_test_revision(context, scenario_name):
-    url = f"{context.base_url}/revisions"
-    now = datetime.now()
-    
-    data = {
-        "opCo": os.getenv('TEST_OPCO_ID', '3fa85f64-5717-4562-b3fc-2c963f66afa6'),
-        "fromRevision": os.getenv('FROM_REVISION_ID', '3fa85f64-5717-4562-b3fc-2c963f66afa6'),
-        "revisionName": f"Test {scenario_name[:20]} {now.strftime('%Y%m%d%H%M%S')}",
-        "revisionType": "TEST",
-        "year": now.year,
-        "week": int(now.strftime("%V")),
-        "comment": "Automated test revision",
-        "baseline": now.isoformat(),
-        "closure": (now + timedelta(days=7)).isoformat(),
-        "isOfficial": True
-    }
+    worker = f"W{context.worker_id} " if context.worker_id else ""
+    data = revision_payload(f"Test {worker}{scenario_name[:20]}")
     
     try:
-        response = requests.post(url, headers=context.headers, json=data)
-        if response.status_code == 200:
+        response = context.api.post("revisions", json=data)
+        if response.status_code in (200, 201):
             result = response.json()
             context.revision_id = result.get("revisionId")
             context.logger.info(f"Created test revision: {context.revision_id}")
         else:
             context.logger.error(f"Failed to create revision: Status {response.status_code}, Response: {response.text}")
     except Exception as e:
-        context.logger.error(f"Exception creating revision: {str(e)}")
\ No newline at end of file
+        context.logger.error(f"Exception creating revision: {str(e)}")
@@ -0,0 +1,37 @@
+Feature: CSV Exports
+  As an RFS user
+  I need CSV exports to contain exactly what the application lists
+  So that I can rely on exported data
+
+  Background:
+    Given the API is accessible
+    And I am authenticated with valid credentials
+
+  @csv @parameters
+  Scenario Outline: Export <entity> parameters to CSV
+    When I export the "<entity>" parameters to CSV
+    Then the CSV export should match the API listing
+
+    Examples:
+      | entity           |
+      | customers        |
+      | aircraft         |
+      | check-types      |
+      | lines            |
+      | hangars          |
+      | fleet-types      |
+      | family-fleet     |
+      | categories       |
+      | type-of-revision |
+
+  @csv @revision_test
+  Scenario Outline: Export revision <collection> to CSV
+    Given a test revision exists
+    When I export the revision "<collection>" to CSV
+    Then the CSV export should match the API listing
+
+    Examples:
+      | collection         |
+      | holidays           |
+      | heat-maps          |
+      | block-restrictions |
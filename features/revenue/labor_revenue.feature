@@ -14,7 +14,7 @@ Feature: Labor Revenue Management
       | CheckType  | 44444444-4444-4444-4444-444444444444 | TEST-CHECK    |
       | Line       | 55555555-5555-5555-5555-555555555555 | TEST-LINE     |
 
-  @revenue_test @labor @create
+  @revenue_test @labor @create @smoke @soak
   Scenario: Create a basic labor revenue entry with rubrics
     Given I have labor revenue data with the following details:
       | Field                | Value                                 |
@@ -53,4 +53,11 @@ Feature: Labor Revenue Management
     Given I have created multiple labor revenue entries
     When I export labor revenues to Excel format
     Then the exported file should be successfully generated
-    And the Excel file should contain all revenue entries
\ No newline at end of file
+    And the Excel file should contain all revenue entries
+
+  @revenue_test @labor @export @csv
+  Scenario: Export labor revenues to CSV
+    Given I have created 25 labor revenue entries
+    When I export "labor" revenue options to CSV
+    Then the CSV export should contain at least 25 rows
+    And the CSV export should match the API listing
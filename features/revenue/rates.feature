@@ -13,7 +13,7 @@ Feature: Rates Management
       | FleetType  | 77777777-7777-7777-7777-777777777777 | TEST-FLEET    |
       | CheckType  | 44444444-4444-4444-4444-444444444444 | TEST-CHECK    |
 
-  @rates_test @create @level1
+  @rates_test @create @level1 @smoke
   Scenario: Create a Level 1 Rate
     Given I have rate data with the following details:
       | Field         | Value                                 |
@@ -94,14 +94,14 @@ Feature: Rates Management
     Then the rate should be updated successfully
     And the response should contain the updated values
 
-  @rates_test @delete
+  @rates_test @delete @soak
   Scenario: Delete a single rate
     Given I have created a Level 1 rate for year 2023
     When I delete the rate
     Then the rate should be deleted successfully
     And the rate should no longer exist in the system
 
-  @rates_test @delete @multiple
+  @rates_test @delete @multiple @soak
   Scenario: Delete multiple rates
     Given I have created the following rates:
       | Level | Year | Customer      |
@@ -117,4 +117,11 @@ Feature: Rates Management
     Given I have created multiple rate entries
     When I export rates to Excel format
     Then the exported file should be successfully generated
-    And the Excel file should contain all rate entries 
\ No newline at end of file
+    And the Excel file should contain all rate entries 
+
+  @rates_test @export @csv
+  Scenario: Export rates to CSV
+    Given I have created 25 rate entries
+    When I export "rates" revenue options to CSV
+    Then the CSV export should contain at least 25 rows
+    And the CSV export should match the API listing
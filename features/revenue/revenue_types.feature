@@ -0,0 +1,71 @@
+Feature: Revenue Types
+  As an RFS user
+  I need every revenue type to behave the same way
+  So that material, engineering and miscellaneous revenues are as reliable as labor
+
+  Background:
+    Given the API is accessible
+    And I am authenticated with valid credentials
+    And a test revision exists
+    And the following reference entities exist:
+      | Entity     | ID                                   | Name/Code     |
+      | Customer   | 22222222-2222-2222-2222-222222222222 | TEST-CUSTOMER |
+      | Aircraft   | 33333333-3333-3333-3333-333333333333 | TEST-REG      |
+      | CheckType  | 44444444-4444-4444-4444-444444444444 | TEST-CHECK    |
+      | Line       | 55555555-5555-5555-5555-555555555555 | TEST-LINE     |
+
+  @revenue_test @matrix @create @soak
+  Scenario Outline: Create <type> revenue
+    When I create a "<type>" revenue entry
+    Then the "<type>" revenue should be created successfully
+
+    Examples:
+      | type          |
+      | labor         |
+      | material      |
+      | engineering   |
+      | miscellaneous |
+
+  @revenue_test @matrix @search
+  Scenario Outline: Search for <type> revenues
+    Given I have created a "<type>" revenue with customer code "MATRIX-<type>"
+    When I search for "<type>" revenues with text "MATRIX-<type>"
+    Then the search results should contain exactly 1 entry
+    And the entry should have customer code "MATRIX-<type>"
+
+    Examples:
+      | type          |
+      | labor         |
+      | material      |
+      | engineering   |
+      | miscellaneous |
+
+  @revenue_test @matrix @export @soak
+  Scenario Outline: Export <type> revenues to Excel and CSV
+    Given I have created 10 "<type>" revenue entries
+    When I export "<type>" revenues to Excel format
+    Then the exported file should be successfully generated
+    And the Excel file should contain all revenue entries
+    When I export "<type>" revenue options to CSV
+    Then the CSV export should contain at least 10 rows
+    And the CSV export should match the API listing
+
+    Examples:
+      | type          |
+      | labor         |
+      | material      |
+      | engineering   |
+      | miscellaneous |
+
+  @revenue_test @matrix @delete @soak
+  Scenario Outline: Delete <type> revenues
+    Given I have created 3 "<type>" revenue entries
+    When I delete the created "<type>" revenues
+    Then none of the deleted "<type>" revenues should exist in the system
+
+    Examples:
+      | type          |
+      | labor         |
+      | material      |
+      | engineering   |
+      | miscellaneous |
@@ -1,8 +1,16 @@
 import os
 from behave import given, when, then
-import requests, json, uuid
+import json, uuid
 from datetime import datetime, timedelta
 
+from support.api_client import XLSX_MIME
+from support.bulk import create_many
+from support.exports import download, iter_xlsx_rows, verify_rows
+from support.factories import RateFactory, created_by
+from support.log_pipeline import payload
+from support.pagination import Paginator
+from support.revision_pool import fingerprint
+
 @given('I have rate data with the following details')
 def step_impl(context):
     # Create data from table
@@ -26,18 +34,15 @@ def step_impl(context):
     
     # Store for later use
     context.rate_data = data
-    context.logger.info(f"Prepared rate data: {data}")
+    context.logger.info("Prepared rate data: %s", payload(data))
 
-@when('I create a new rate entry')
-def step_impl(context):
-    url = f"{context.base_url}/revisions/revenue_options/parameters/rates"
-    
+def _create_rate(context):
     # Add a createdBy field if not present
     if 'createdBy' not in context.rate_data:
-        context.rate_data['createdBy'] = os.getenv('TEST_USER_ID', '99999999-9999-9999-9999-999999999999')
+        context.rate_data['createdBy'] = created_by()
     
     # Send request
-    response = requests.post(url, headers=context.headers, json=context.rate_data)
+    response = context.api.post("revenue", type="rates", json=context.rate_data)
     
     # Store response status code
     context.response_status = response.status_code
@@ -52,12 +57,19 @@ def step_impl(context):
             context.logger.info(f"Created rate: {context.response['id']}")
     else:
         context.response = {"error": response.text, "status_code": response.status_code}
-        context.logger.error(f"Failed to create rate: {response.text}")
+        context.logger.error("Failed to create rate: %s", payload(response.text))
 
-@then('the rate should be created successfully')
-def step_impl(context):
+def _assert_rate_created(context):
     assert context.response_status == 201, f"Expected status 201, got {context.response_status}"
     assert "id" in context.response, "No id for rate in response"
+
+@when('I create a new rate entry')
+def step_impl(context):
+    _create_rate(context)
+
+@then('the rate should be created successfully')
+def step_impl(context):
+    _assert_rate_created(context)
     context.logger.info(f"Rate created with ID: {context.response['id']}")
 
 @then('the response should contain the correct rate values')
@@ -69,58 +81,46 @@ def step_impl(context):
     
     context.logger.info("Verified all rate values in response")
 
+def _seed_rates(context, revision_id, levels_and_years):
+    factory = RateFactory(context.reference_entities, revision_id)
+    payloads = [factory.build(level, year) for level, year in levels_and_years]
+    
+    # Created concurrently; every rate must succeed
+    result = create_many(context.api, "rates", payloads, id_sink=context.rate_ids)
+    assert result.ok, f"Bulk rate creation failed: {result.summary()}"
+    context.logger.info(f"Bulk rate creation: {result.summary()}")
+    return result.created_ids
+
+def _create_rates(context, levels_and_years):
+    if context.revision_pool:
+        # A copy of a pre-seeded revision instead of creating the rates one by one
+        version = fingerprint(levels_and_years, context.reference_entities)
+        context.revision_id, entries = context.revision_pool.checkout(
+            f"rates:{version}", version,
+            lambda revision_id: {"rates": _seed_rates(context, revision_id, levels_and_years)})
+        context.created_rate_ids = entries["rates"]
+        context.logger.info(f"Using pooled revision {context.revision_id} with {len(levels_and_years)} rates")
+    else:
+        context.created_rate_ids = _seed_rates(context, context.revision_id, levels_and_years)
+
 @given('I have created a Level {level:d} rate for year {year:d}')
 def step_impl(context, level, year):
-    # Create a basic rate entry
-    context.execute_steps(f'''
-        Given I have rate data with the following details:
-          | Field         | Value                                 |
-          | level         | {level}                               |
-          | year          | {year}                                |
-          | customerId    | {context.reference_entities['Customer']['id']} |
-          | comments      | Test Level {level} Rate               |
-    ''')
-    
-    # Add appropriate fields based on level
-    if level == 1:
-        context.rate_data.update({
-            "airframeRate": 1000.0,
-            "backshopRate": 500.0
-        })
-    elif level == 2:
-        context.rate_data.update({
-            "fleetTypeId": context.reference_entities['FleetType']['id'],
-            "airframeRate": 1200.0,
-            "engineeringRate": 800.0
-        })
-    elif level == 3:
-        context.rate_data.update({
-            "checkTypeId": context.reference_entities['CheckType']['id'],
-            "ndtRate": 600.0,
-            "componentsRate": 900.0
-        })
+    context.rate_data = RateFactory.for_context(context).build(level, year)
+    context.logger.info("Prepared rate data: %s", payload(context.rate_data))
     
-    # Create it
-    context.execute_steps('''
-        When I create a new rate entry
-        Then the rate should be created successfully
-    ''')
+    _create_rate(context)
+    _assert_rate_created(context)
 
 @when('I attempt to create another Level {level:d} rate with the same customer and year')
 def step_impl(context, level):
     # We'll use the same data as before
     # The revision_id, customer_id, level, and year would be the same
-    context.execute_steps('''
-        When I attempt to create a new rate entry
-    ''')
+    _attempt_create_rate(context)
 
-@when('I attempt to create a new rate entry')
-def step_impl(context):
+def _attempt_create_rate(context):
     # Similar to regular create but we expect it might fail
-    url = f"{context.base_url}/revisions/revenue_options/parameters/rates"
-    
     # Send request and capture response regardless of status code
-    response = requests.post(url, headers=context.headers, json=context.rate_data)
+    response = context.api.post("revenue", type="rates", json=context.rate_data)
     context.response_status = response.status_code
     
     try:
@@ -130,92 +130,59 @@ def step_impl(context):
         
     context.logger.info(f"Attempted to create rate, got status {response.status_code}")
 
+@when('I attempt to create a new rate entry')
+def step_impl(context):
+    _attempt_create_rate(context)
+
 @given('I have rate data with missing required fields')
 def step_impl(context):
-    # Create rate data missing essential fields like customer or comments
-    context.execute_steps('''
-        Given I have rate data with the following details:
-          | Field         | Value                                 |
-          | level         | 1                                     |
-          | year          | 2023                                  |
-    ''')
-    
-    # Add rates but no customer or comments
-    context.rate_data.update({
-        "airframeRate": 1000.0,
-        "backshopRate": 500.0
-    })
+    # Level 1 rates but no customer or comments
+    context.rate_data = RateFactory.for_context(context).build(1, 2023)
+    del context.rate_data['customerId']
+    del context.rate_data['comments']
+    context.logger.info("Prepared rate data: %s", payload(context.rate_data))
 
 @given('I have created a Level 1 rate with customer code "{customer_code}"')
 def step_impl(context, customer_code):
     # Create a basic rate for a specific customer
-    context.execute_steps(f'''
-        Given I have rate data with the following details:
-          | Field         | Value                                 |
-          | level         | 1                                     |
-          | year          | 2023                                  |
-          | customerId    | {context.reference_entities['Customer']['id']} |
-          | comments      | Test Rate for {customer_code}         |
-    ''')
-    
-    # Add basic rates
-    context.rate_data.update({
-        "airframeRate": 1000.0,
-        "backshopRate": 500.0,
-        "customerCode": customer_code
-    })
-    
-    # Create it
-    context.execute_steps('''
-        When I create a new rate entry
-        Then the rate should be created successfully
-    ''')
+    context.rate_data = RateFactory.for_context(context).build(
+        1, 2023,
+        comments=f"Test Rate for {customer_code}",
+        customerCode=customer_code
+    )
+    
+    _create_rate(context)
+    _assert_rate_created(context)
 
 @given('I have created multiple rate entries for different years')
 def step_impl(context):
     # Create rates for multiple years
-    years = [2022, 2023, 2024]
-    
-    for year in years:
-        context.execute_steps(f'''
-            Given I have created a Level 1 rate for year {year}
-        ''')
+    _create_rates(context, [(1, year) for year in [2022, 2023, 2024]])
 
 @when('I search for rates with customer code "{customer_code}"')
 def step_impl(context, customer_code):
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/rates"
-    params = {
-        "searchText": customer_code,
-        "page": 0,
-        "pageSize": 10
-    }
-    
-    response = requests.get(url, headers=context.headers, params=params)
-    context.response = response.json() if response.status_code == 200 else {"error": response.text}
+    context.search_results = Paginator(context.api, "revenue_list", params={"searchText": customer_code},
+                                       revisionId=context.revision_id, type="rates")
+    context.search_results.fetch_first()
     context.logger.info(f"Searched for rates with customer code: {customer_code}")
 
 @when('I search for rates with year "{year}"')
 def step_impl(context, year):
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/rates"
-    params = {
-        "searchText": year,
-        "page": 0,
-        "pageSize": 10
-    }
-    
-    response = requests.get(url, headers=context.headers, params=params)
-    context.response = response.json() if response.status_code == 200 else {"error": response.text}
+    context.search_results = Paginator(context.api, "revenue_list", params={"searchText": year},
+                                       revisionId=context.revision_id, type="rates")
+    context.search_results.fetch_first()
     context.logger.info(f"Searched for rates with year: {year}")
 
 @then('the search results should contain all entries for year {year:d}')
 def step_impl(context, year):
-    assert "items" in context.response, f"No content in response: {context.response}"
-    items = context.response["items"]
-    
-    for item in items:
+    # Streams every page; the next one is already in flight while this one is checked
+    checked = 0
+    for item in context.search_results:
         assert item["year"] == year, f"Expected year {year}, found {item['year']}"
+        checked += 1
     
-    context.logger.info(f"All {len(items)} search results have year {year}")
+    assert checked > 0, f"No search results for year {year}"
+    context.logger.info(f"All {checked} search results have year {year} ({context.search_results.summary()})")
 
 @when('I update the rate with new values')
 def step_impl(context):
@@ -225,7 +192,8 @@ def step_impl(context):
     # Start with the current data
     update_data = context.rate_data.copy()
     
-    # Update fields from the table
+    # Update fields from the table (kept for the verification step, which has no table)
+    context.updated_fields = context.table
     for row in context.table:
         field = row['Field']
         value = row['Value']
@@ -237,11 +205,10 @@ def step_impl(context):
         update_data[field] = value
     
     # Add last modified by
-    update_data['lastModifiedBy'] = os.getenv('TEST_USER_ID', '99999999-9999-9999-9999-999999999999')
+    update_data['lastModifiedBy'] = created_by()
     
     # Send update request
-    url = f"{context.base_url}/revisions/revenue_options/parameters/rates/{rate_id}"
-    response = requests.put(url, headers=context.headers, json=update_data)
+    response = context.api.put("revenue_item", type="rates", id=rate_id, json=update_data)
     
     # Store response status code
     context.response_status = response.status_code
@@ -252,7 +219,7 @@ def step_impl(context):
         context.logger.info(f"Updated rate: {rate_id}")
     else:
         context.response = {"error": response.text, "status_code": response.status_code}
-        context.logger.error(f"Failed to update rate: {response.text}")
+        context.logger.error("Failed to update rate: %s", payload(response.text))
 
 @then('the rate should be updated successfully')
 def step_impl(context):
@@ -262,7 +229,7 @@ def step_impl(context):
 @then('the response should contain the updated values')
 def step_impl(context):
     # Check each field that was updated
-    for row in context.table:
+    for row in context.updated_fields:
         field = row['Field']
         expected_value = row['Value']
         
@@ -282,10 +249,9 @@ def step_impl(context):
     rate_id = context.response["id"]
     
     # Send delete request
-    url = f"{context.base_url}/revisions/revenue_options/parameters/rates/delete"
     data = {"rateIds": [rate_id]}
     
-    response = requests.put(url, headers=context.headers, json=data)
+    response = context.api.put("revenue_delete", type="rates", json=data)
     context.response_status = response.status_code
     
     if response.status_code == 200:
@@ -293,7 +259,7 @@ def step_impl(context):
         context.logger.info(f"Deleted rate: {rate_id}")
     else:
         context.response = {"error": response.text, "status_code": response.status_code}
-        context.logger.error(f"Failed to delete rate: {response.text}")
+        context.logger.error("Failed to delete rate: %s", payload(response.text))
 
 @then('the rate should be deleted successfully')
 def step_impl(context):
@@ -307,34 +273,23 @@ def step_impl(context):
     if not rate_id:
         rate_id = context.rate_ids[-1]  # Fallback to last created rate
         
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/rates/{rate_id}"
-    
-    response = requests.get(url, headers=context.headers)
+    response = context.api.get("revenue_by_id", revisionId=context.revision_id, type="rates", id=rate_id)
     assert response.status_code == 404, f"Expected rate to be deleted (404), but got {response.status_code}"
     context.logger.info(f"Verified rate {rate_id} no longer exists")
 
 @given('I have created the following rates')
 def step_impl(context):
     # Create multiple rates based on the table
-    context.created_rate_ids = []
-    
-    for row in context.table:
-        level = int(row['Level'])
-        year = int(row['Year'])
-        context.execute_steps(f'''
-            Given I have created a Level {level} rate for year {year}
-        ''')
-        context.created_rate_ids.append(context.response["id"])
+    _create_rates(context, [(int(row['Level']), int(row['Year'])) for row in context.table])
     
     context.logger.info(f"Created {len(context.created_rate_ids)} rates for deletion test")
 
 @when('I delete multiple rates')
 def step_impl(context):
     # Delete all created rates
-    url = f"{context.base_url}/revisions/revenue_options/parameters/rates/delete"
     data = {"rateIds": context.created_rate_ids}
     
-    response = requests.put(url, headers=context.headers, json=data)
+    response = context.api.put("revenue_delete", type="rates", json=data)
     context.response_status = response.status_code
     
     if response.status_code == 200:
@@ -342,7 +297,7 @@ def step_impl(context):
         context.logger.info(f"Deleted multiple rates: {len(context.created_rate_ids)}")
     else:
         context.response = {"error": response.text, "status_code": response.status_code}
-        context.logger.error(f"Failed to delete multiple rates: {response.text}")
+        context.logger.error("Failed to delete multiple rates: %s", payload(response.text))
 
 @then('all selected rates should be deleted successfully')
 def step_impl(context):
@@ -355,11 +310,10 @@ def step_impl(context):
 
 @then('none of the deleted rates should exist in the system')
 def step_impl(context):
-    # Verify each deleted rate doesn't exist
-    for rate_id in context.created_rate_ids:
-        url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/rates/{rate_id}"
-        
-        response = requests.get(url, headers=context.headers)
+    # Verify each deleted rate doesn't exist (all lookups in flight at once)
+    responses = context.async_api.get_many("revenue_by_id", [
+        {"revisionId": context.revision_id, "type": "rates", "id": rate_id} for rate_id in context.created_rate_ids])
+    for rate_id, response in zip(context.created_rate_ids, responses):
         assert response.status_code == 404, f"Expected rate {rate_id} to be deleted (404), but got {response.status_code}"
     
     context.logger.info("Verified all deleted rates no longer exist")
@@ -369,41 +323,41 @@ def step_impl(context):
     # Create different types of rates for export testing
     levels = [1, 2, 3]
     years = [2023, 2024, 2025]
-    
-    for i, (level, year) in enumerate(zip(levels, years)):
-        context.execute_steps(f'''
-            Given I have created a Level {level} rate for year {year}
-        ''')
+    _create_rates(context, list(zip(levels, years)))
     
     context.logger.info(f"Created multiple rate entries for export testing")
 
+@given('I have created {count:d} rate entries')
+def step_impl(context, count):
+    # Cycle through the three levels, moving to the next year every three rates
+    # so no two rates collide on level, year and customer
+    _create_rates(context, [(i % 3 + 1, 2000 + i // 3) for i in range(count)])
+    
+    context.logger.info(f"Created {count} rate entries")
+
 @when('I export rates to Excel format')
 def step_impl(context):
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/rates/excel"
-    
-    response = requests.get(url, headers={
-        "Authorization": context.headers["Authorization"],
-        "accept": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    })
-    
-    if response.status_code == 200:
-        context.exported_file = response.content
-        # Save to file for inspection if needed
-        with open("test_output/rates.xlsx", "wb") as f:
-            f.write(response.content)
-        context.logger.info("Exported rates to Excel")
+    # Streamed straight to disk (hashed on the way) so large exports never sit in memory
+    context.exported_file = download(context.api, "revenue_excel",
+                                     os.path.join(context.output_dir, "rates.xlsx"),
+                                     revisionId=context.revision_id, type="rates",
+                                     headers={"accept": XLSX_MIME, "Content-Type": None})
+    
+    if context.exported_file.ok:
+        context.logger.info(f"Exported rates to Excel: {context.exported_file.size} bytes, "
+                            f"sha256 {context.exported_file.sha256}")
     else:
-        context.exported_file = None
-        context.error = response.text
-        context.logger.error(f"Failed to export to Excel: {response.text}")
+        context.error = context.exported_file.error
+        context.logger.error(f"Failed to export to Excel: {context.exported_file.error}")
 
 @then('the Excel file should contain all rate entries')
 def step_impl(context):
-    assert context.exported_file is not None, "No exported file was generated"
-    assert len(context.exported_file) > 0, "Exported file is empty"
-    
-    # In a real test, we might parse the Excel file 
-    # and verify its contents match the expected data
-    file_size = len(context.exported_file)
-    assert file_size > 1000, f"Excel file too small ({file_size} bytes), might not contain data"
-    context.logger.info(f"Verified Excel file size: {file_size} bytes") 
\ No newline at end of file
+    assert context.exported_file.ok, f"Export failed: {context.exported_file.error}"
+    assert context.exported_file.size > 0, "Exported file is empty"
+    
+    # Rows are read incrementally from the sheet XML and checked against what we created
+    expected = context.created_rate_ids
+    check = verify_rows(iter_xlsx_rows(context.exported_file.path), expected)
+    assert check.rows >= len(expected), f"Expected at least {len(expected)} rows, found {check.rows}"
+    assert not check.missing, f"{len(check.missing)} created rates missing from export: {sorted(check.missing)[:5]}"
+    context.logger.info(f"Verified Excel export: {check.summary()}")
@@ -1,28 +1,29 @@
 import os
 from behave import given, when, then
-import requests, json, uuid
+import json, uuid
 from datetime import datetime, timedelta
 
+from support.exports import iter_xlsx_rows, verify_rows
+from support.factories import RevenueFactory, iso_day, rubric, rubric_key
+from support.log_pipeline import payload
+from support.revenues import assert_created, create_revenue, create_revenues, export_excel, search
+
 @given('the following reference entities exist')
 def step_impl(context):
     # Store the entities for use in tests
     context.reference_entities = {}
     for row in context.table:
-        entity_type = row['Entity']
-        entity_id = row['ID']
-        
-        # Verify entity exists in database
-        url = f"{context.base_url}/parameters/{entity_type.lower()}s/{entity_id}"
-        response = requests.get(url, headers=context.headers)
-        
-        if response.status_code != 200:
-            context.logger.warning(f"{entity_type} with ID {entity_id} not found. Tests may fail.")
-        
-        context.reference_entities[entity_type] = {
-            'id': entity_id,
+        context.reference_entities[row['Entity']] = {
+            'id': row['ID'],
             'name': row['Name/Code']
         }
     
+    # Verify entities exist in database (cached for the whole run, misses fetched concurrently)
+    lookups = [(entity_type, entity['id']) for entity_type, entity in context.reference_entities.items()]
+    for (entity_type, entity_id), exists in context.reference_cache.lookup_many(lookups).items():
+        if not exists:
+            context.logger.warning(f"{entity_type} with ID {entity_id} not found. Tests may fail.")
+    
     context.logger.info(f"Using reference entities: {context.reference_entities}")
 
 @given('I have labor revenue data with the following details')
@@ -50,7 +51,7 @@ def step_impl(context):
     
     # Store for later use
     context.labor_data = data
-    context.logger.info(f"Prepared labor data: {data}")
+    context.logger.info("Prepared labor data: %s", payload(data))
 
 @given('I have the following labor rubrics')
 def step_impl(context):
@@ -66,43 +67,22 @@ def step_impl(context):
         
         # Convert to appropriate format for API
         # The API expects rubrics as a structure with specific fields
-        rubric_key = rubric_type.split('_')[0].lower()
-        if rubric_key == "non":
-            rubric_key = "nonDestructiveTest"
-            
-        rubrics["rubrics"][rubric_key] = {
-            "type": rubric_type,
-            "value": value,
-            "billableLaborHours": billable_hours
-        }
+        key, fields = rubric(rubric_type, value, billable_hours)
+        rubrics["rubrics"][key] = fields
     
     # Add to labor data
     context.labor_data.update(rubrics)
-    context.logger.info(f"Added rubrics to labor data: {rubrics}")
+    context.logger.info("Added rubrics to labor data: %s", payload(rubrics))
+
+def _create_labor_revenue(context):
+    create_revenue(context, "labor", context.labor_data)
+
+def _assert_labor_created(context):
+    assert_created(context, "labor")
 
 @when('I create a new labor revenue entry')
 def step_impl(context):
-    url = f"{context.base_url}/revisions/revenue_options/parameters/labor"
-    
-    # Add a createdBy field if not present
-    if 'createdBy' not in context.labor_data:
-        context.labor_data['createdBy'] = os.getenv('TEST_USER_ID', '99999999-9999-9999-9999-999999999999')
-    
-    # Send request
-    response = requests.post(url, headers=context.headers, json=context.labor_data)
-    
-    # Store response status code
-    context.response_status = response.status_code
-    
-    # Store response
-    if response.status_code == 201:
-        context.response = response.json()
-        if "id" in context.response:
-            context.revenue_ids.append(context.response["id"])
-            context.logger.info(f"Created labor revenue: {context.response['id']}")
-    else:
-        context.response = {"error": response.text, "status_code": response.status_code}
-        context.logger.error(f"Failed to create labor revenue: {response.text}")
+    _create_labor_revenue(context)
 
 @then('the response should contain both rubrics')
 def step_impl(context):
@@ -117,102 +97,59 @@ def step_impl(context):
     
     # Validate against the stored expected rubrics
     for row in context.expected_rubrics:
-        rubric_type = row['Type']
-        rubric_key = rubric_type.split('_')[0].lower()
-        if rubric_key == "non":
-            rubric_key = "nonDestructiveTest"
-            
-        assert rubric_key in rubrics, f"Rubric '{rubric_key}' not found in response"
+        key = rubric_key(row['Type'])
+        assert key in rubrics, f"Rubric '{key}' not found in response"
         
         # Verify values if needed
         if row['Value']:
             value = float(row['Value'])
-            assert abs(rubrics[rubric_key]["value"] - value) < 0.001, f"Expected value {value}, got {rubrics[rubric_key]['value']}"
+            assert abs(rubrics[key]["value"] - value) < 0.001, f"Expected value {value}, got {rubrics[key]['value']}"
             
         if row['BillableLaborHours']:
             hours = float(row['BillableLaborHours'])
-            assert abs(rubrics[rubric_key]["billableLaborHours"] - hours) < 0.001, f"Expected hours {hours}, got {rubrics[rubric_key]['billableLaborHours']}"
+            assert abs(rubrics[key]["billableLaborHours"] - hours) < 0.001, f"Expected hours {hours}, got {rubrics[key]['billableLaborHours']}"
             
     context.logger.info("Verified all rubrics in response")
 
 @given('I have created a labor revenue with customer code "{customer_code}"')
 def step_impl(context, customer_code):
-    # Create basic labor data
-    context.execute_steps(f'''
-        Given I have labor revenue data with the following details:
-          | Field                | Value                                 |
-          | type                 | LABOR                                |
-          | customerId           | {context.reference_entities['Customer']['id']} |
-          | aircraftId           | {context.reference_entities['Aircraft']['id']} |
-          | checkTypeId          | {context.reference_entities['CheckType']['id']} |
-          | lineId               | {context.reference_entities['Line']['id']} |
-          | isAssociatedToEvent  | false                                |
-          | registrationDate     | today                                |
-        And I have the following labor rubrics:
-          | Type            | Value   | BillableLaborHours |
-          | AIRFRAME_LABOR  | 1000.0  | 10.0               |
-    ''')
-    
-    # Add customer code
-    customer_info = {
-        "customerCode": customer_code,
-        "customerName": f"Test Customer {customer_code}"
-    }
-    context.labor_data.update(customer_info)
-    
-    # Create it
-    context.execute_steps('''
-        When I create a new labor revenue entry
-        Then the labor revenue should be created successfully
-    ''')
+    context.labor_data = RevenueFactory.for_context(context, "labor").build(
+        customerCode=customer_code,
+        customerName=f"Test Customer {customer_code}"
+    )
+    _create_labor_revenue(context)
+    _assert_labor_created(context)
 
 @when('I search for labor revenues with text "{search_text}"')
 def step_impl(context, search_text):
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/labor"
-    params = {
-        "searchText": search_text,
-        "page": 0,
-        "pageSize": 10
-    }
-    
-    response = requests.get(url, headers=context.headers, params=params)
-    context.response = response.json() if response.status_code == 200 else {"error": response.text}
-    context.logger.info(f"Searched for revenues with text: {search_text}")
+    search(context, "labor", search_text)
 
 @then('the search results should contain exactly {count:d} entry')
 def step_impl(context, count):
-    assert "items" in context.response, f"No content in response: {context.response}"
-    actual_count = len(context.response["items"])
+    actual_count = sum(1 for _ in context.search_results)
     assert actual_count == count, f"Expected exactly {count} entries, got {actual_count}"
+    if context.search_results.total_items is not None:
+        assert context.search_results.total_items == count, \
+            f"Expected a total of {count} entries, response says {context.search_results.total_items}"
     context.logger.info(f"Found exactly {count} entries as expected")
 
 @then('the entry should have customer code "{customer_code}"')
 def step_impl(context, customer_code):
-    assert "items" in context.response, "No content in response"
-    assert len(context.response["items"]) > 0, "No entries in response"
+    items = context.search_results.first_items
+    assert len(items) > 0, "No entries in response"
     
-    entry = context.response["items"][0]
+    entry = items[0]
     assert entry["customerCode"] == customer_code, f"Expected customer code {customer_code}, got {entry['customerCode']}"
     context.logger.info(f"Verified customer code is {customer_code}")
 
 @given('I have labor revenue data with event association')
 def step_impl(context):
-    context.execute_steps('''
-        Given I have labor revenue data with the following details:
-          | Field                | Value                                 |
-          | type                 | LABOR                                |
-          | customerId           | 22222222-2222-2222-2222-222222222222 |
-          | aircraftId           | 33333333-3333-3333-3333-333333333333 |
-          | checkTypeId          | 44444444-4444-4444-4444-444444444444 |
-          | lineId               | 55555555-5555-5555-5555-555555555555 |
-          | isAssociatedToEvent  | true                                 |
-          | registrationDate     | today                                |
-          | dateIn               | today                                |
-          | dateOut              | tomorrow                             |
-        And I have the following labor rubrics:
-          | Type            | Value   | BillableLaborHours |
-          | AIRFRAME_LABOR  | 1000.0  | 10.0               |
-    ''')
+    context.labor_data = RevenueFactory.for_context(context, "labor").build(
+        isAssociatedToEvent=True,
+        dateIn=iso_day(),
+        dateOut=iso_day(1)
+    )
+    context.logger.info("Prepared labor data: %s", payload(context.labor_data))
 
 @given('I set the date out before date in')
 def step_impl(context):
@@ -228,10 +165,8 @@ def step_impl(context):
 @when('I attempt to create a labor revenue entry')
 def step_impl(context):
     # Similar to regular create but we expect it might fail
-    url = f"{context.base_url}/revisions/revenue_options/parameters/labor"
-    
     # Send request and capture response regardless of status code
-    response = requests.post(url, headers=context.headers, json=context.labor_data)
+    response = context.api.post("revenue", type="labor", json=context.labor_data)
     context.response_status = response.status_code
     
     try:
@@ -255,104 +190,35 @@ def step_impl(context, error_text):
 
 @given('I have created multiple labor revenue entries')
 def step_impl(context):
-    # Create multiple labor entries with different customer codes
-    for i in range(3):  # Create 3 entries
-        timestamp = datetime.now().strftime('%H%M%S%f')  # Add microseconds for more uniqueness
-        
-        # Use a different registration date for each entry (today, tomorrow, day after)
-        reg_date = (datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d")
-        
-        context.execute_steps(f'''
-            Given I have labor revenue data with the following details:
-              | Field                | Value                                 |
-              | type                 | LABOR                                |
-              | customerId           | {context.reference_entities['Customer']['id']} |
-              | aircraftId           | {context.reference_entities['Aircraft']['id']} |
-              | checkTypeId          | {context.reference_entities['CheckType']['id']} |
-              | lineId               | {context.reference_entities['Line']['id']} |
-              | isAssociatedToEvent  | false                                |
-              | registrationDate     | {reg_date}                           |
-            And I have the following labor rubrics:
-              | Type            | Value   | BillableLaborHours |
-              | AIRFRAME_LABOR  | {1000.0 + i*100}  | {10.0 + i} |
-        ''')
-        
-        # Add unique customer code with timestamp and also unique names for other fields
-        unique_info = {
-            "customerCode": f"EXPORT-{i}-{timestamp}",
-            "customerName": f"Export Test Customer {i} {timestamp}",
-            "aircraftCode": f"AC-EXP-{i}-{timestamp}",  # Add unique aircraft code
-            "serialNumber": f"SN-{timestamp}-{i}",      # Add unique serial number
-            "laborHours": 10 + i                       # Different labor hours
-        }
-        context.labor_data.update(unique_info)
-        
-        # Try to create it and continue even if it fails (we need at least one for export test)
-        try:
-            context.execute_steps('''
-                When I create a new labor revenue entry
-            ''')
-            
-            if context.response_status == 201:
-                context.logger.info(f"Successfully created labor revenue #{i+1}")
-            else:
-                context.logger.warning(f"Couldn't create labor revenue #{i+1}: {context.response}")
-        except Exception as e:
-            context.logger.warning(f"Error in creating labor revenue #{i+1}: {str(e)}")
-            continue
-    
-    # If we have at least one labor revenue entry, consider it a success
-    # Check if we created at least one labor revenue entry
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/labor"
-    response = requests.get(url, headers=context.headers, params={"page": 0, "pageSize": 10})
-    
-    if response.status_code == 200:
-        result = response.json()
-        count = len(result.get("items", []))
-        context.logger.info(f"Found {count} labor revenue entries for export testing")
-        assert count > 0, "No labor revenue entries found for export testing"
-    else:
-        context.logger.error(f"Failed to verify labor revenue entries: {response.text}")
+    create_revenues(context, "labor", 3)
+
+@given('I have created {count:d} labor revenue entries')
+def step_impl(context, count):
+    create_revenues(context, "labor", count)
 
 @when('I export labor revenues to Excel format')
 def step_impl(context):
-    url = f"{context.base_url}/revisions/{context.revision_id}/revenue_options/parameters/labor/excel"
-    
-    response = requests.get(url, headers={
-        "Authorization": context.headers["Authorization"],
-        "accept": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    })
-    
-    if response.status_code == 200:
-        context.exported_file = response.content
-        # Save to file for inspection if needed
-        with open("test_output/labor_revenues.xlsx", "wb") as f:
-            f.write(response.content)
-        context.logger.info("Exported labor revenues to Excel")
-    else:
-        context.exported_file = None
-        context.error = response.text
-        context.logger.error(f"Failed to export to Excel: {response.text}")
+    export_excel(context, "labor")
 
 @then('the Excel file should contain all revenue entries')
 def step_impl(context):
-    assert context.exported_file is not None, "No exported file was generated"
-    assert len(context.exported_file) > 0, "Exported file is empty"
+    assert context.exported_file.ok, f"Export failed: {context.exported_file.error}"
+    assert context.exported_file.size > 0, "Exported file is empty"
     
-    # In a real test, you might want to parse the Excel file 
-    # and verify its contents match the expected data
-    file_size = len(context.exported_file)
-    assert file_size > 1000, f"Excel file too small ({file_size} bytes), might not contain data"
-    context.logger.info(f"Verified Excel file size: {file_size} bytes")
+    # Rows are read incrementally from the sheet XML and checked against what we created
+    expected = context.created_revenue_ids
+    check = verify_rows(iter_xlsx_rows(context.exported_file.path), expected)
+    assert check.rows >= len(expected), f"Expected at least {len(expected)} rows, found {check.rows}"
+    assert not check.missing, f"{len(check.missing)} created revenues missing from export: {sorted(check.missing)[:5]}"
+    context.logger.info(f"Verified Excel export: {check.summary()}")
 
 @then('the labor revenue should be created successfully')
 def step_impl(context):
-    assert context.response_status == 201, f"Expected status 201, got {context.response_status}"
-    assert "id" in context.response, "No id for revenue in response"
+    _assert_labor_created(context)
     context.logger.info(f"Labor revenue created with ID: {context.response['id']}")
 
 @then('the exported file should be successfully generated')
 def step_impl(context):
-    assert context.exported_file is not None, "No file was exported"
-    assert len(context.exported_file) > 0, "Exported file is empty"
+    assert context.exported_file.ok, f"No file was exported: {context.exported_file.error}"
+    assert context.exported_file.size > 0, "Exported file is empty"
     context.logger.info("Excel file was successfully generated")
\ No newline at end of file
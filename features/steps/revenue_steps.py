@@ -0,0 +1,67 @@
+from behave import given, when, then
+
+from support.factories import REVENUE_TYPES, RevenueFactory
+from support.revenues import assert_created, create_revenue, create_revenues, export_excel, search
+
+# Steps for any revenue type on the generic /revenue_options/parameters/{type} endpoints.
+# The search, Excel and CSV assertions are shared with the labor and rates steps.
+
+def _check_type(revenue_type):
+    assert revenue_type in REVENUE_TYPES, f"Unknown revenue type '{revenue_type}', expected one of {REVENUE_TYPES}"
+    return revenue_type
+
+@given('I have created a "{revenue_type}" revenue with customer code "{customer_code}"')
+def step_impl(context, revenue_type, customer_code):
+    data = RevenueFactory.for_context(context, _check_type(revenue_type)).build(
+        customerCode=customer_code,
+        customerName=f"Test Customer {customer_code}"
+    )
+    create_revenue(context, revenue_type, data)
+    assert_created(context, revenue_type)
+
+@when('I create a "{revenue_type}" revenue entry')
+def step_impl(context, revenue_type):
+    context.revenue_data = RevenueFactory.for_context(context, _check_type(revenue_type)).build()
+    create_revenue(context, revenue_type, context.revenue_data)
+
+@then('the "{revenue_type}" revenue should be created successfully')
+def step_impl(context, revenue_type):
+    assert_created(context, revenue_type)
+    expected = context.revenue_data["type"]
+    assert context.response.get("type", expected) == expected, \
+        f"Expected type {expected}, got {context.response.get('type')}"
+    assert context.response.get("rubrics"), f"No rubrics in the {revenue_type} revenue response"
+    context.logger.info(f"{revenue_type.capitalize()} revenue created with ID: {context.response['id']}")
+
+@given('I have created {count:d} "{revenue_type}" revenue entries')
+def step_impl(context, count, revenue_type):
+    create_revenues(context, _check_type(revenue_type), count)
+
+@when('I search for "{revenue_type}" revenues with text "{search_text}"')
+def step_impl(context, revenue_type, search_text):
+    search(context, _check_type(revenue_type), search_text)
+
+@when('I export "{revenue_type}" revenues to Excel format')
+def step_impl(context, revenue_type):
+    export_excel(context, _check_type(revenue_type))
+
+@when('I delete the created "{revenue_type}" revenues')
+def step_impl(context, revenue_type):
+    response = context.api.put("revenue_delete", type=_check_type(revenue_type),
+                               json={"revenueIds": context.created_revenue_ids})
+    context.response_status = response.status_code
+    context.response = response.json() if response.status_code == 200 else {"error": response.text}
+    context.logger.info(f"Deleted {len(context.created_revenue_ids)} {revenue_type} revenues: "
+                        f"status {response.status_code}")
+
+@then('none of the deleted "{revenue_type}" revenues should exist in the system')
+def step_impl(context, revenue_type):
+    assert context.response_status == 200, f"Expected status 200, got {context.response_status}"
+    # All lookups in flight at once
+    responses = context.async_api.get_many("revenue_by_id", [
+        {"revisionId": context.revision_id, "type": revenue_type, "id": revenue_id}
+        for revenue_id in context.created_revenue_ids])
+    for revenue_id, response in zip(context.created_revenue_ids, responses):
+        assert response.status_code == 404, \
+            f"Expected {revenue_type} revenue {revenue_id} to be deleted (404), but got {response.status_code}"
+    context.logger.info(f"Verified all {len(responses)} deleted {revenue_type} revenues no longer exist")
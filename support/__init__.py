@@ -0,0 +1 @@
+"""Shared helpers for the BDD suite (HTTP client, fixtures, reporting)."""
@@ -0,0 +1,208 @@
+"""Pooled HTTP client shared by environment.py and the step modules.
+
+A single ``ApiClient`` is built in ``before_all`` and stored on
+``context.api``. It owns one ``requests.Session`` so every step reuses the
+same keep-alive connections instead of opening a new TCP/TLS connection
+per call, and it knows the endpoint templates so steps never build URLs
+by hand.
+"""
+import os
+import string
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Endpoint templates, relative to API_BASE_URL (which already ends in /api)
+ENDPOINTS = {
+    "revisions": "/revisions",
+    "revision": "/revisions/{revisionId}",
+    "revenue": "/revisions/revenue_options/parameters/{type}",
+    "revenue_item": "/revisions/revenue_options/parameters/{type}/{id}",
+    "revenue_delete": "/revisions/revenue_options/parameters/{type}/delete",
+    "revenue_list": "/revisions/{revisionId}/revenue_options/parameters/{type}",
+    "revenue_by_id": "/revisions/{revisionId}/revenue_options/parameters/{type}/{id}",
+    "revenue_excel": "/revisions/{revisionId}/revenue_options/parameters/{type}/excel",
+    "revenue_csv": "/revisions/{revisionId}/revenue_options/parameters/{type}/csv",
+    "parameter_entity": "/parameters/{entity}/{id}",
+    "parameter_list": "/parameters/{entity}",
+    "parameter_csv": "/parameters/{entity}/csv",
+    "revision_collection": "/revisions/{revisionId}/{collection}",
+    "revision_collection_csv": "/revisions/{revisionId}/{collection}/csv",
+}
+
+# Methods that are safe to re-send; a retried POST could create duplicates
+IDEMPOTENT = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_formatter = string.Formatter()
+
+
+def template_fields(template):
+    """Return the names of the ``{placeholders}`` in an endpoint template."""
+    return [field for _, field, _, _ in _formatter.parse(template) if field]
+
+
+class ApiClient:
+    def __init__(self, base_url, headers=None, pool_size=10, connect_timeout=5.0,
+                 read_timeout=30.0, max_retries=3, backoff_factor=0.3, endpoints=None):
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = dict(ENDPOINTS)
+        self.endpoints.update(endpoints or {})
+        self.timeout = (connect_timeout, read_timeout)
+        self.listeners = []
+        self.use_listeners = []
+        self.cache = None
+        self.limiter = None
+
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+        self.session.headers.update(headers or {})
+        self._mount((502, 503, 504), respect_retry_after=True)
+
+    def _mount(self, status_forcelist, respect_retry_after):
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=status_forcelist,
+            allowed_methods=IDEMPOTENT,
+            respect_retry_after_header=respect_retry_after,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                              max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls, base_url, headers=None):
+        return cls(
+            base_url,
+            headers=headers,
+            pool_size=int(os.getenv("API_POOL_SIZE", "10")),
+            connect_timeout=float(os.getenv("API_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("API_READ_TIMEOUT", "30")),
+            max_retries=int(os.getenv("API_MAX_RETRIES", "3")),
+            backoff_factor=float(os.getenv("API_RETRY_BACKOFF", "0.3")),
+        )
+
+    def template(self, endpoint):
+        """Resolve an endpoint name (or a raw template) to its path template."""
+        return self.endpoints.get(endpoint, endpoint)
+
+    def url(self, endpoint, **path_params):
+        return self.base_url + self.template(endpoint).format(**path_params)
+
+    def request(self, method, endpoint, **kwargs):
+        """Send a request to ``endpoint``.
+
+        Keyword arguments named after the template's placeholders fill the
+        path; everything else is passed through to ``requests``.
+        """
+        template = self.template(endpoint)
+        path_params = {name: kwargs.pop(name) for name in template_fields(template)}
+        kwargs.setdefault("timeout", self.timeout)
+        path = template.format(**path_params)
+        self._used(method, template, path)
+
+        def send(kwargs):
+            return self._send(method, template, path, path_params, kwargs)
+
+        if self.cache is not None and not kwargs.get("stream"):
+            return self.cache.fetch(method, path, kwargs, send)
+        return send(kwargs)
+
+    def _send(self, method, template, path, path_params, kwargs):
+        started = time.perf_counter()
+        if self.limiter is not None:
+            response = self.limiter.call(template, lambda: self.session.request(method, self.base_url + path, **kwargs),
+                                         idempotent=method in IDEMPOTENT)
+        else:
+            response = self.session.request(method, self.base_url + path, **kwargs)
+        # Wall-clock time including the body; response.elapsed only covers the
+        # time until the headers arrived
+        response.wall_time = time.perf_counter() - started
+        response.streamed = bool(kwargs.get("stream"))
+        response.endpoint = template
+        response.api_path = path
+        response.path_params = path_params
+        if response.streamed:
+            self._notify_on_close(method, template, response, started)
+        else:
+            self._notify(method, template, response)
+        return response
+
+    def _notify(self, method, template, response):
+        for listener in self.listeners:
+            listener(method, template, response)
+
+    def _notify_on_close(self, method, template, response, started):
+        # The caller reads a streamed body after request() returns; listeners hear about the
+        # response once it is closed, with the time of the whole read. Callers that count the
+        # body set body_bytes; otherwise it is what urllib3 read (not counted for chunked
+        # bodies read through iter_content).
+        close = response.close
+        response.body_bytes = None
+        closed = []
+
+        def close_and_notify():
+            if closed:
+                return close()
+            closed.append(True)
+            response.wall_time = time.perf_counter() - started
+            if response.body_bytes is None and hasattr(response.raw, "tell"):
+                response.body_bytes = response.raw.tell()
+            close()
+            self._notify(method, template, response)
+
+        response.close = close_and_notify
+
+    def enable_cache(self, cache):
+        """Route non-streamed requests through ``cache`` (a ``support.response_cache.ResponseCache``)."""
+        self.cache = cache
+
+    def enable_limiter(self, limiter):
+        """Send every request through ``limiter`` (a ``support.concurrency.AdaptiveLimiter``)."""
+        self.limiter = limiter
+        # 429/503 and Retry-After are the limiter's to handle: retried and slept on inside
+        # urllib3 they would hold one slot while every other thread kept sending
+        self._mount((502, 504), respect_retry_after=False)
+
+    def concurrency(self, default):
+        """Workers for a caller's thread pool: with a limiter, enough to let it find the limit."""
+        return self.limiter.max_limit if self.limiter is not None else default
+
+    def add_listener(self, listener):
+        """Call ``listener(method, template, response)`` after every response (a streamed one once it is closed)."""
+        self.listeners.append(listener)
+
+    def add_use_listener(self, listener):
+        """Call ``listener(method, template, path)`` for every request made, sent or answered from a cache."""
+        self.use_listeners.append(listener)
+
+    def record_use(self, method, endpoint, **path_params):
+        """Report a request that a caller's own cache answered without calling ``request``."""
+        template = self.template(endpoint)
+        self._used(method, template, template.format(**path_params))
+
+    def _used(self, method, template, path):
+        for listener in self.use_listeners:
+            listener(method, template, path)
+
+    def get(self, endpoint, **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+    def put(self, endpoint, **kwargs):
+        return self.request("PUT", endpoint, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,64 @@
+"""Concurrent fan-out of independent requests, for verification steps.
+
+Steps like "none of the deleted rates should exist in the system" send one
+request per entity. Sent one after another, the step takes the sum of all
+round trips. ``AsyncApi`` runs them as asyncio tasks, at most
+``API_CONCURRENCY`` at a time (default 10, the size of the connection
+pool), so the step takes about as long as its slowest request. With the
+adaptive limiter (``API_ADAPTIVE=1``) the client's limit bounds them instead.
+
+Steps are synchronous, so they use the facade::
+
+    responses = context.async_api.get_many("revenue_by_id", [
+        {"revisionId": revision_id, "type": "rates", "id": rate_id} for rate_id in rate_ids])
+
+``requests`` has no asyncio transport, so each task sends its request
+through the shared ``ApiClient`` on a bounded executor. Listeners, retries
+and keep-alive connections work exactly as they do for blocking calls.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def default_concurrency():
+    return int(os.getenv("API_CONCURRENCY", os.getenv("API_POOL_SIZE", "10")))
+
+
+class AsyncApi:
+    def __init__(self, api, concurrency=None):
+        self.api = api
+        self.concurrency = concurrency or api.concurrency(default_concurrency())
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="async-api")
+
+    async def request(self, method, endpoint, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(self.api.request, method, endpoint, **kwargs))
+
+    async def gather(self, method, endpoint, calls):
+        """Send one request per kwargs dict in ``calls``; responses come back in the same order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(kwargs):
+            async with semaphore:
+                return await self.request(method, endpoint, **kwargs)
+
+        return await asyncio.gather(*(send(kwargs) for kwargs in calls))
+
+    def map(self, method, endpoint, calls):
+        """Blocking facade over ``gather`` for behave steps."""
+        calls = list(calls)
+        if not calls:
+            return []
+        return asyncio.run(self.gather(method, endpoint, calls))
+
+    def get_many(self, endpoint, calls):
+        return self.map("GET", endpoint, calls)
+
+    def record_use(self, method, endpoint, **path_params):
+        self.api.record_use(method, endpoint, **path_params)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,75 @@
+"""Concurrent creation of revenue/rate fixtures.
+
+``create_many`` POSTs a list of payloads through a bounded thread pool
+that shares the pooled ``ApiClient``. Each new ID is appended to the given
+cleanup list (``context.revenue_ids`` / ``context.rate_ids``) as soon as
+it exists, under a lock. Partial failures are collected instead of
+aborting the batch. With the adaptive limiter (``API_ADAPTIVE=1``) the
+pool is sized for its maximum and the limiter decides how many POSTs are in
+flight.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def default_workers():
+    return int(os.getenv("BDD_BULK_WORKERS", "8"))
+
+
+class BulkResult:
+    def __init__(self, total):
+        self.total = total
+        self.ids = [None] * total
+        self.responses = [None] * total
+        self.failures = []
+
+    @property
+    def created_ids(self):
+        return [entity_id for entity_id in self.ids if entity_id]
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def summary(self):
+        text = f"created {len(self.created_ids)}/{self.total}"
+        if self.failures:
+            index, status, detail = self.failures[0]
+            text += f", {len(self.failures)} failed (first: #{index + 1} status {status}: {detail})"
+        return text
+
+
+def create_many(api, revenue_type, payloads, id_sink=None, workers=None):
+    """Create every payload under ``revenue_type``; returns a ``BulkResult`` in input order."""
+    payloads = list(payloads)
+    result = BulkResult(len(payloads))
+    if not payloads:
+        return result
+    lock = threading.Lock()
+
+    def create(indexed):
+        index, payload = indexed
+        try:
+            response = api.post("revenue", type=revenue_type, json=payload)
+        except requests.RequestException as e:
+            with lock:
+                result.failures.append((index, None, str(e)))
+            return
+        body = response.json() if response.status_code == 201 else None
+        if body and "id" in body:
+            with lock:
+                result.ids[index] = body["id"]
+                result.responses[index] = body
+                if id_sink is not None:
+                    id_sink.append(body["id"])
+        else:
+            with lock:
+                result.failures.append((index, response.status_code, response.text[:200]))
+
+    with ThreadPoolExecutor(max_workers=min(workers or api.concurrency(default_workers()), len(payloads))) as pool:
+        list(pool.map(create, enumerate(payloads)))
+    result.failures.sort()
+    return result
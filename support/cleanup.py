@@ -0,0 +1,287 @@
+"""Crash-safe cleanup of the data test runs create.
+
+``CleanupJournal`` is an ``ApiClient`` listener. It appends every revenue,
+rate and revision the API creates to an on-disk journal
+(``test_output/cleanup_journal.jsonl``, or ``CLEANUP_JOURNAL``) as soon as
+the response arrives, and it records deletions made by the steps
+themselves. ``after_all`` drains the entries of its own run, so a killed
+run leaves its IDs on disk instead of losing them with the process.
+Leftovers from earlier runs are drained standalone::
+
+    python -m support.cleanup                 # delete everything still pending
+    python -m support.cleanup --dry-run       # only list it
+    python -m support.cleanup --sql leftover_revisions.sql
+
+Deletes go out per resource type in chunks of ``CLEANUP_CHUNK_SIZE`` IDs
+(default 200), with ``CLEANUP_WORKERS`` chunks in flight (default 4). The
+API has no operation for deleting revisions. Journaled revisions are
+therefore kept and can be written out as a targeted SQL script instead of
+wiping the database with ``delete_data.sql``. Once that script has run,
+``--forget revision`` drops them from the journal.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from support.api_client import ENDPOINTS
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still atomic, compaction is just unguarded
+    fcntl = None
+
+JOURNAL_PATH = os.path.join("test_output", "cleanup_journal.jsonl")
+REVISION = "revision"
+
+
+def default_chunk_size():
+    return int(os.getenv("CLEANUP_CHUNK_SIZE", "200"))
+
+
+def default_workers():
+    return int(os.getenv("CLEANUP_WORKERS", "4"))
+
+
+def id_key(kind):
+    return "rateIds" if kind == "rates" else "revenueIds"
+
+
+def journal_entry(method, template, response):
+    """``(op, kind, ids)`` for a response that created or deleted resources, else ``None``."""
+    if response.status_code not in (200, 201):
+        return None
+    if method == "POST" and template in (ENDPOINTS["revenue"], ENDPOINTS["revisions"]):
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if template == ENDPOINTS["revisions"]:
+            kind, entity_id = REVISION, body.get("revisionId")
+        else:
+            kind, entity_id = response.path_params["type"], body.get("id")
+        return ("create", kind, [entity_id]) if entity_id else None
+    if method == "PUT" and template == ENDPOINTS["revenue_delete"]:
+        kind = response.path_params["type"]
+        try:
+            ids = json.loads(response.request.body or b"{}").get(id_key(kind)) or []
+        except ValueError:
+            return None
+        return "delete", kind, ids
+    return None
+
+
+class CleanupJournal:
+    def __init__(self, path=JOURNAL_PATH, run_id=None):
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("CLEANUP_JOURNAL", JOURNAL_PATH))
+
+    def _append(self, entries):
+        data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries).encode("utf-8")
+        # One O_APPEND write per batch: lines from parallel workers never interleave,
+        # and the shared lock only keeps a concurrent compact() from dropping them
+        with self.lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_SH)
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def record(self, kind, entity_id):
+        self.record_many(kind, [entity_id])
+
+    def record_many(self, kind, ids):
+        at = round(time.time(), 3)
+        if ids:
+            self._append([{"op": "create", "kind": kind, "id": entity_id, "run": self.run_id, "at": at}
+                          for entity_id in ids])
+
+    def mark_deleted(self, kind, ids, op="delete"):
+        if ids:
+            self._append([{"op": op, "kind": kind, "id": entity_id, "run": self.run_id} for entity_id in ids])
+
+    def keep(self, kind, ids):
+        """Take resources that are meant to outlive the run (e.g. the revision pool's) off the cleanup list."""
+        self.mark_deleted(kind, ids, op="keep")
+
+    def __call__(self, method, template, response):
+        entry = journal_entry(method, template, response)
+        if entry is None:
+            return
+        op, kind, ids = entry
+        if op == "create":
+            self.record_many(kind, ids)
+        else:
+            self.mark_deleted(kind, ids)
+
+    def pending(self, run_id=None):
+        """Return ``{kind: {id: entry}}`` for created, not yet deleted resources (of one run if given)."""
+        pending = {}
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return pending
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line torn by a crash mid-write
+                items = pending.setdefault(entry["kind"], {})
+                if entry["op"] != "create":
+                    items.pop(entry["id"], None)
+                elif run_id is None or entry["run"] == run_id:
+                    items[entry["id"]] = entry
+        return {kind: items for kind, items in pending.items() if items}
+
+    def forget(self, kind, run_id=None):
+        """Drop pending ``kind`` entries (of one run if given) without deleting anything through the API."""
+        self.mark_deleted(kind, list(self.pending(run_id).get(kind, {})))
+
+    def compact(self):
+        """Rewrite the journal with only its pending entries; returns how many are left."""
+        with self.lock:
+            try:
+                fd = os.open(self.path, os.O_RDWR)
+            except FileNotFoundError:
+                return 0
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                entries = [entry for items in self.pending().values() for entry in items.values()]
+                data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+                os.ftruncate(fd, 0)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, data.encode("utf-8"))
+            finally:
+                os.close(fd)
+            return len(entries)
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def drain(api, journal, run_id=None, chunk_size=None, workers=None):
+    """Delete pending revenues/rates in chunks; returns ``{kind: {"deleted": n, "failed": n, "errors": [...]}}``.
+
+    ``journal`` must be one of ``api``'s listeners; that is what records the deletions.
+    """
+    chunk_size = chunk_size or default_chunk_size()
+    pending = journal.pending(run_id)
+    jobs = [(kind, chunk) for kind, items in pending.items() if kind != REVISION
+            for chunk in _chunks(list(items), chunk_size)]
+    results = {kind: {"deleted": 0, "failed": 0, "errors": []} for kind, _ in jobs}
+    lock = threading.Lock()
+
+    def delete(job):
+        kind, ids = job
+        try:
+            response = api.put("revenue_delete", type=kind, json={id_key(kind): ids})
+            failure = None if response.status_code == 200 else f"status {response.status_code}: {response.text[:200]}"
+        except requests.RequestException as e:
+            failure = str(e)
+        with lock:
+            if failure is None:
+                results[kind]["deleted"] += len(ids)
+            else:
+                results[kind]["failed"] += len(ids)
+                results[kind]["errors"].append(failure)
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=min(workers or api.concurrency(default_workers()), len(jobs))) as pool:
+            list(pool.map(delete, jobs))
+    if REVISION in pending:
+        results[REVISION] = {"deleted": 0, "failed": 0, "pending": len(pending[REVISION]), "errors": []}
+    return results
+
+
+def revisions_sql(revision_ids):
+    ids = ",\n    ".join(f"'{revision_id}'" for revision_id in revision_ids)
+    return (
+        "-- Revisions created by test runs, from the cleanup journal\n"
+        "BEGIN TRANSACTION;\n"
+        "SET NOCOUNT ON;\n\n"
+        f"DELETE FROM master.revision.revisions\nWHERE revision_id IN (\n    {ids}\n);\n"
+        f"PRINT 'Deleted {len(revision_ids)} test revisions';\n\n"
+        "COMMIT TRANSACTION;\n"
+    )
+
+
+def _client():
+    from dotenv import load_dotenv
+
+    from support.api_client import ApiClient
+
+    load_dotenv()
+    base_url = os.getenv("API_BASE_URL", "http://localhost:8085/mroh-backend-hms/api")
+    headers = {
+        "accept": "application/json",
+        "Authorization": f"Bearer {os.getenv('API_TOKEN')}",
+        "Content-Type": "application/json",
+    }
+    return ApiClient.from_env(base_url, headers=headers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete the test data recorded in the cleanup journal")
+    parser.add_argument("--journal", default=os.getenv("CLEANUP_JOURNAL", JOURNAL_PATH))
+    parser.add_argument("--chunk-size", type=int, default=default_chunk_size(), help="IDs per delete request")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="delete requests in flight")
+    parser.add_argument("--dry-run", action="store_true", help="list pending entries without deleting")
+    parser.add_argument("--sql", help="write a DELETE script for the pending revisions to this path")
+    parser.add_argument("--forget", action="append", default=[], metavar="KIND",
+                        help="drop pending entries of KIND (e.g. revision, after running the --sql script)")
+    args = parser.parse_args(argv)
+
+    journal = CleanupJournal(args.journal)
+    for kind in args.forget:
+        journal.forget(kind)
+    pending = journal.pending()
+    for kind, items in sorted(pending.items()):
+        print(f"{kind}: {len(items)} pending")
+    if not pending:
+        print(f"Nothing to clean up in {args.journal}")
+
+    if args.sql and pending.get(REVISION):
+        with open(args.sql, "w") as f:
+            f.write(revisions_sql(list(pending[REVISION])))
+        print(f"Wrote DELETE script for {len(pending[REVISION])} revisions to {args.sql}")
+    if args.dry_run or not pending:
+        return 0
+
+    api = _client()
+    api.add_listener(journal)
+    try:
+        results = drain(api, journal, chunk_size=args.chunk_size, workers=args.workers)
+    finally:
+        api.close()
+    failed = 0
+    for kind, result in sorted(results.items()):
+        if kind == REVISION:
+            continue
+        print(f"{kind}: deleted {result['deleted']}, failed {result['failed']}")
+        for message in result["errors"][:3]:
+            print(f"  {message}")
+        failed += result["failed"]
+    print(f"{journal.compact()} entries left in {args.journal}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
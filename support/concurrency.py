@@ -0,0 +1,213 @@
+"""Adaptive (AIMD) limit on the number of requests in flight (``API_ADAPTIVE=1``).
+
+Bulk fixtures, fan-out verification steps and load runs all share one
+``ApiClient``. With ``AdaptiveLimiter`` enabled on it, every request first
+takes a slot, and the number of slots follows what the backend sustains:
+
+* additive increase: each response that came back within the latency target
+  while all slots were in use adds ``1 / limit``, i.e. one slot per full
+  window of requests;
+* multiplicative decrease: a 429/503, a connection error or an inflated
+  latency multiplies the limit by ``API_LIMIT_BACKOFF`` (default 0.5). Only
+  requests sent after the previous decrease can trigger another one, so a
+  burst of slow responses backs off once, not once per response;
+* ``Retry-After`` on a 429/503 holds every new request until it expires.
+  The client re-sends a 429 (the request was not processed, so this is safe
+  for POSTs too), and a 503 to an idempotent method, up to
+  ``API_THROTTLE_RETRIES`` times. With a limiter, urllib3 no longer retries
+  or sleeps on 429/503 itself, so every attempt and pause goes through here.
+
+Latency is inflated when it exceeds ``API_LATENCY_TARGET`` seconds, or,
+without a target, ``API_LATENCY_TOLERANCE`` (default 2) times the fastest
+response seen for the same endpoint template. Responses faster than
+``API_LATENCY_FLOOR`` (default 0.05 s) never count as inflated.
+
+Every change of the limit is kept in ``history``. ``stats()`` goes into
+``request_report.json`` and the load report under ``concurrency``.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+THROTTLED = (429, 503)
+MAX_PAUSE = 60.0
+
+
+def retry_after_seconds(response):
+    """Seconds to wait from a ``Retry-After`` header (delta or HTTP date); ``None`` without one."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_PAUSE)
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=4, min_limit=1, max_limit=32, backoff=0.5, target=None, tolerance=2.0,
+                 floor=0.05, throttle_retries=3):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.initial = min(max(initial, min_limit), self.max_limit)
+        self.limit = float(self.initial)
+        self.backoff = backoff
+        self.target = target
+        self.tolerance = tolerance
+        self.floor = floor
+        self.throttle_retries = throttle_retries
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self.baselines = {}
+        self.started = time.monotonic()
+        self.history = [(0.0, self.initial, 0, "initial")]
+        self.decreases = {"throttled": 0, "latency": 0, "error": 0}
+        self.requests = 0
+        self.waited = 0.0
+        self.paused = 0.0
+        self.retried = 0
+
+    @classmethod
+    def from_env(cls, pool_size=None):
+        target = os.getenv("API_LATENCY_TARGET")
+        return cls(
+            initial=int(os.getenv("API_LIMIT_INITIAL", "4")),
+            min_limit=int(os.getenv("API_LIMIT_MIN", "1")),
+            # More requests in flight than pooled connections would only churn connections
+            max_limit=int(os.getenv("API_LIMIT_MAX", str(pool_size or 32))),
+            backoff=float(os.getenv("API_LIMIT_BACKOFF", "0.5")),
+            target=float(target) if target else None,
+            tolerance=float(os.getenv("API_LATENCY_TOLERANCE", "2")),
+            floor=float(os.getenv("API_LATENCY_FLOOR", "0.05")),
+            throttle_retries=int(os.getenv("API_THROTTLE_RETRIES", "3")),
+        )
+
+    def _record(self, reason):
+        self.history.append((round(time.monotonic() - self.started, 3), int(self.limit), self.in_flight, reason))
+
+    def acquire(self):
+        """Wait for a free slot (and for any ``Retry-After`` pause); returns ``(send time, saturated)``."""
+        requested = time.monotonic()
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self.condition.wait(self.paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+            self.requests += 1
+            # Every slot taken: the limit, not the callers, is what bounds concurrency
+            saturated = self.in_flight >= int(self.limit)
+            self.waited += now - requested
+        return now, saturated
+
+    def release(self, sent, saturated, template, latency=None, status=None, retry_after=None):
+        """Free the slot and adjust the limit from the outcome (``latency`` ``None`` = connection error)."""
+        with self.condition:
+            self.in_flight -= 1
+            if latency is None:
+                self._decrease(sent, "error")
+            elif status in THROTTLED:
+                if retry_after:
+                    until = time.monotonic() + retry_after
+                    if until > self.paused_until:
+                        self.paused += until - max(self.paused_until, time.monotonic())
+                        self.paused_until = until
+                        self._record(f"retry-after {retry_after:g}s")
+                self._decrease(sent, "throttled")
+            elif status < 500:
+                if self._inflated(template, latency):
+                    self._decrease(sent, "latency")
+                elif saturated and self.limit < self.max_limit:
+                    before = int(self.limit)
+                    self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+                    if int(self.limit) != before:
+                        self._record("increase")
+            self.condition.notify_all()
+
+    def _inflated(self, template, latency):
+        baseline = self.baselines.get(template)
+        if baseline is None or latency < baseline:
+            self.baselines[template] = latency
+        if latency < self.floor:
+            return False
+        if self.target is not None:
+            return latency > self.target
+        return baseline is not None and latency > baseline * self.tolerance
+
+    def _decrease(self, sent, reason):
+        # Requests sent before the last decrease saw the old limit; one back-off per window
+        if sent < self.decreased_at:
+            return
+        self.decreased_at = time.monotonic()
+        self.decreases[reason] += 1
+        self.limit = max(self.limit * self.backoff, float(self.min_limit))
+        self._record(reason)
+
+    @contextmanager
+    def slot(self, template):
+        """Hold a slot around one request; ``observe(response)`` reports its outcome."""
+        sent, saturated = self.acquire()
+        outcome = {}
+
+        def observe(response):
+            outcome.update(latency=time.monotonic() - sent, status=response.status_code,
+                           retry_after=retry_after_seconds(response) if response.status_code in THROTTLED else None)
+
+        try:
+            yield observe
+        finally:
+            self.release(sent, saturated, template, **outcome)
+
+    def call(self, template, send, idempotent=False):
+        """Run ``send()`` in a slot; a 429 (or a 503 when ``idempotent``) is re-sent, after any
+        ``Retry-After``, up to ``throttle_retries`` times."""
+        resend = THROTTLED if idempotent else (429,)
+        for attempt in range(self.throttle_retries + 1):
+            with self.slot(template) as observe:
+                response = send()
+                observe(response)
+            if response.status_code not in resend or attempt == self.throttle_retries:
+                return response
+            response.close()
+            with self.condition:
+                self.retried += 1
+
+    def stats(self):
+        with self.condition:
+            limits = [limit for _, limit, _, _ in self.history]
+            return {
+                "initial": self.initial,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "final": int(self.limit),
+                "peak": max(limits),
+                "lowest": min(limits),
+                "requests": self.requests,
+                "decreases": dict(self.decreases),
+                "throttle_retries": self.retried,
+                "waited_seconds": round(self.waited, 3),
+                "retry_after_seconds": round(self.paused, 3),
+                "baseline_ms": {template: round(seconds * 1000, 3) for template, seconds in sorted(self.baselines.items())},
+                "history": [{"t": t, "limit": limit, "in_flight": in_flight, "reason": reason}
+                            for t, limit, in_flight, reason in self.history],
+            }
+
+    def summary(self):
+        stats = self.stats()
+        backoffs = ", ".join(f"{count} {reason}" for reason, count in stats["decreases"].items() if count)
+        return (f"Adaptive concurrency: limit {stats['initial']} -> {stats['final']} "
+                f"(range {stats['lowest']}-{stats['peak']} of {stats['min_limit']}-{stats['max_limit']}) over "
+                f"{stats['requests']} requests, back-offs: {backoffs or 'none'}, "
+                f"{stats['throttle_retries']} throttled re-sends, {stats['retry_after_seconds']}s Retry-After pause")
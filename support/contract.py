@@ -0,0 +1,78 @@
+"""Access to the OpenAPI contract in ``features/steps/contracts.json``.
+
+Contract paths carry the ``/api`` prefix that ``API_BASE_URL`` already
+ends in, so everything here works with prefix-less templates such as
+``/revisions/{revisionId}/revenue_options/parameters/{type}`` - the same
+templates ``support.api_client.ENDPOINTS`` uses.
+"""
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+CONTRACT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                             "features", "steps", "contracts.json")
+API_PREFIX = "/api"
+HTTP_METHODS = ("get", "put", "post", "delete", "patch", "head", "options")
+
+
+def load_contract(path=CONTRACT_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def strip_prefix(contract_path):
+    if contract_path.startswith(API_PREFIX + "/"):
+        return contract_path[len(API_PREFIX):]
+    return contract_path
+
+
+def server_base_path(contract):
+    """Path the API is served under, e.g. ``/mroh-backend-hms/api``."""
+    servers = contract.get("servers") or [{}]
+    return urlsplit(servers[0].get("url", "")).path.rstrip("/") + API_PREFIX
+
+
+def operations(contract):
+    """Yield ``(method, template, operation)`` for every operation in the contract."""
+    for contract_path, item in contract.get("paths", {}).items():
+        for method, operation in item.items():
+            if method in HTTP_METHODS:
+                yield method.upper(), strip_prefix(contract_path), operation
+
+
+def template_regex(template):
+    pattern = ""
+    for literal, name in re.findall(r"([^{]*)(?:\{([^}]+)\})?", template):
+        pattern += re.escape(literal)
+        if name:
+            pattern += f"(?P<{name}>[^/]+)"
+    return re.compile(f"^{pattern}$")
+
+
+class PathMatcher:
+    """Map a concrete request path back to the template it was built from.
+
+    Templates with fewer placeholders are tried first, so ``/revisions/search``
+    wins over ``/revisions/{revisionId}`` and ``/{type}/delete`` wins over
+    ``/{type}/{id}``.
+    """
+
+    def __init__(self, templates):
+        ordered = sorted(set(templates), key=lambda t: (t.count("{"), -len(t), t))
+        self._patterns = [(template, template_regex(template)) for template in ordered]
+        self._cache = {}
+
+    def match(self, path):
+        """Return ``(template, path_params)``, or ``(None, {})`` when nothing matches."""
+        if path in self._cache:
+            return self._cache[path]
+        result = (None, {})
+        for template, regex in self._patterns:
+            found = regex.match(path)
+            if found:
+                result = (template, found.groupdict())
+                break
+        if len(self._cache) < 10000:
+            self._cache[path] = result
+        return result
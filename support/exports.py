@@ -0,0 +1,348 @@
+"""Streaming download and verification of export endpoints.
+
+Exports of a large revision can run to hundreds of MB, so nothing here
+holds a whole file in memory. ``download`` streams the response to disk
+in chunks and hashes it on the way. ``iter_xlsx_rows`` parses the sheet
+XML incrementally out of the zip, and ``verify_rows`` checks the rows
+against the IDs a scenario created as they go past. ``compare_csv_export``
+streams a CSV export and compares it, row by row and column by column,
+with the paginated listing of the same resource.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from support.pagination import iter_items
+
+CHUNK_SIZE = 1 << 20
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_COLUMN = re.compile(r"[A-Z]+")
+ID_HEADERS = {"id", "revenueid", "rateid"}
+
+
+class ExportFile:
+    def __init__(self, path, status, content_type=""):
+        self.path = path
+        self.status = status
+        self.content_type = content_type
+        self.size = 0
+        self.sha256 = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.status == 200 and self.error is None
+
+
+def download(api, endpoint, path, chunk_size=CHUNK_SIZE, **kwargs):
+    """Stream ``endpoint`` into ``path``; returns an ``ExportFile`` with its size and SHA-256."""
+    response = api.get(endpoint, stream=True, **kwargs)
+    export = ExportFile(path, response.status_code, response.headers.get("Content-Type", ""))
+    try:
+        if response.status_code != 200:
+            export.error = response.text
+            return export
+        digest = hashlib.sha256()
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+                export.size += len(chunk)
+        export.sha256 = digest.hexdigest()
+        response.body_bytes = export.size
+    finally:
+        response.close()
+    return export
+
+
+def _column_index(reference):
+    letters = _COLUMN.match(reference).group(0)
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _shared_strings(workbook):
+    # Shared strings are the only part kept in memory: one entry per distinct text
+    try:
+        stream = workbook.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with stream:
+        for _, element in iterparse(stream):
+            if element.tag == f"{_NS}si":
+                strings.append("".join(text.text or "" for text in element.iter(f"{_NS}t")))
+                element.clear()
+    return strings
+
+
+def _first_sheet(workbook):
+    sheets = sorted(name for name in workbook.namelist()
+                    if name.startswith("xl/worksheets/sheet") and name.endswith(".xml"))
+    if not sheets:
+        raise ValueError(f"{workbook.filename} has no worksheets")
+    return sheets[0]
+
+
+def iter_xlsx_rows(path, sheet=None):
+    """Yield each row of an xlsx sheet as a list of strings, parsing the sheet XML incrementally."""
+    with zipfile.ZipFile(path) as workbook:
+        strings = _shared_strings(workbook)
+        with workbook.open(sheet or _first_sheet(workbook)) as stream:
+            sheet_data = None
+            for event, element in iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    if element.tag == f"{_NS}sheetData":
+                        sheet_data = element
+                    continue
+                if element.tag != f"{_NS}row":
+                    continue
+                row = []
+                for cell in element.iter(f"{_NS}c"):
+                    reference = cell.get("r")
+                    if reference:
+                        row.extend([""] * (_column_index(reference) - len(row)))
+                    kind = cell.get("t")
+                    if kind == "inlineStr":
+                        value = "".join(text.text or "" for text in cell.iter(f"{_NS}t"))
+                    else:
+                        value = cell.findtext(f"{_NS}v") or ""
+                        if kind == "s" and value:
+                            value = strings[int(value)]
+                    row.append(value)
+                # Drop finished rows from the tree so memory stays flat
+                if sheet_data is not None:
+                    sheet_data.clear()
+                yield row
+
+
+def normalise(name):
+    return re.sub(r"[\s_-]", "", name).lower()
+
+
+def id_column(header):
+    for index, name in enumerate(header):
+        if normalise(name) in ID_HEADERS:
+            return index
+    return None
+
+
+class RowCheck:
+    def __init__(self, expected_ids):
+        self.expected = set(expected_ids)
+        self.rows = 0
+        self.id_column = None
+        self.found = set()
+
+    @property
+    def missing(self):
+        if self.id_column is None:
+            return set()
+        return self.expected - self.found
+
+    def summary(self):
+        text = f"{self.rows} rows"
+        if self.id_column is None:
+            return text + " (no id column; compared row count only)"
+        return text + f", {len(self.found)}/{len(self.expected)} created ids present"
+
+
+def verify_rows(rows, expected_ids):
+    """Count data rows and note which ``expected_ids`` appear in the id column, if there is one."""
+    check = RowCheck(expected_ids)
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return check
+    check.id_column = id_column(header)
+    for row in rows:
+        check.rows += 1
+        if check.id_column is not None and check.id_column < len(row) and row[check.id_column] in check.expected:
+            check.found.add(row[check.id_column])
+    return check
+
+
+def cell_matches(cell, value):
+    """Compare a CSV cell with the JSON value the API listing returned for it."""
+    if value is None:
+        return cell in ("", "null", "None")
+    if isinstance(value, bool):
+        return cell.lower() == str(value).lower()
+    if isinstance(value, (int, float)):
+        try:
+            return abs(float(cell) - value) < 1e-6
+        except ValueError:
+            return False
+    if isinstance(value, (dict, list)):
+        try:
+            return json.loads(cell) == value
+        except ValueError:
+            return False
+    return cell == str(value)
+
+
+def listing_key(item):
+    """The listing's id field: ``id`` or else the first ``...Id`` field (``aircraftId``, ...)."""
+    if "id" in item:
+        return "id"
+    return next((key for key in item if key.endswith("Id")), None)
+
+
+class CsvComparison:
+    """Rows of a CSV export compared with a paginated listing, keyed by id.
+
+    The listing is spilled into an on-disk SQLite table first, then the CSV is
+    streamed past it row by row, so neither side is ever held in memory.
+    """
+
+    SAMPLES = 3
+
+    def __init__(self, workdir):
+        handle, self.db_path = tempfile.mkstemp(suffix=".sqlite", prefix="csv-compare-", dir=workdir)
+        os.close(handle)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("CREATE TABLE listing (id TEXT PRIMARY KEY, data TEXT, seen INTEGER DEFAULT 0)")
+        self.key = None
+        self.listed = 0
+        self.rows = 0
+        self.columns = []
+        self.unmatched_columns = []
+        self.mismatches = {}
+        self.samples = {}
+        self.extra_rows = []
+        self.extra_count = 0
+        self.missing_rows = []
+        self.missing_count = 0
+
+    def load_listing(self, items, batch=500):
+        pending = []
+        for item in items:
+            if self.key is None:
+                self.key = listing_key(item)
+                assert self.key, f"No id field in listing item: {sorted(item)}"
+            pending.append((str(item.get(self.key)), json.dumps(item)))
+            if len(pending) >= batch:
+                self._insert(pending)
+                pending = []
+        self._insert(pending)
+
+    def _insert(self, rows):
+        if rows:
+            self.db.executemany("INSERT OR REPLACE INTO listing (id, data) VALUES (?, ?)", rows)
+            self.listed += len(rows)
+
+    def compare_rows(self, rows, batch=500):
+        rows = iter(rows)
+        header = next(rows, None)
+        if not header:
+            return
+        header[0] = header[0].lstrip("\ufeff")
+        if self.key is None:
+            # Empty listing: any data row is an extra row, keyed by the CSV's own id column
+            self.key = listing_key({name: None for name in header})
+            if self.key is None:
+                self.rows = sum(1 for _ in rows)
+                self.extra_count = self.rows
+                return
+        names = [normalise(name) for name in header]
+        key_index = names.index(normalise(self.key)) if self.key and normalise(self.key) in names else None
+        assert key_index is not None, f"CSV header has no {self.key!r} column: {header}"
+        self.columns = header
+
+        seen = []
+        for row in rows:
+            if not row:
+                # A blank line (e.g. a trailing one) is not a row
+                continue
+            self.rows += 1
+            row_id = row[key_index] if key_index < len(row) else ""
+            found = self.db.execute("SELECT data FROM listing WHERE id = ?", (row_id,)).fetchone()
+            if found is None:
+                self.extra_count += 1
+                if len(self.extra_rows) < self.SAMPLES:
+                    self.extra_rows.append(row_id)
+                continue
+            seen.append((row_id,))
+            item = {normalise(field): value for field, value in json.loads(found[0]).items()}
+            for index, name in enumerate(names):
+                if name not in item:
+                    continue
+                cell = row[index] if index < len(row) else ""
+                if not cell_matches(cell, item[name]):
+                    column = header[index]
+                    self.mismatches[column] = self.mismatches.get(column, 0) + 1
+                    samples = self.samples.setdefault(column, [])
+                    if len(samples) < self.SAMPLES:
+                        samples.append((row_id, cell, item[name]))
+            if len(seen) >= batch:
+                self.db.executemany("UPDATE listing SET seen = 1 WHERE id = ?", seen)
+                seen = []
+        self.db.executemany("UPDATE listing SET seen = 1 WHERE id = ?", seen)
+
+        if self.listed:
+            probe = json.loads(self.db.execute("SELECT data FROM listing LIMIT 1").fetchone()[0])
+            fields = {normalise(field) for field in probe}
+            self.unmatched_columns = [column for column, name in zip(header, names) if name not in fields]
+        self.missing_count = self.db.execute("SELECT COUNT(*) FROM listing WHERE seen = 0").fetchone()[0]
+        self.missing_rows = [row[0] for row in
+                             self.db.execute("SELECT id FROM listing WHERE seen = 0 LIMIT ?", (self.SAMPLES,))]
+
+    @property
+    def ok(self):
+        return not (self.mismatches or self.extra_count or self.missing_count)
+
+    def report(self):
+        lines = [f"{self.rows} CSV rows vs {self.listed} listed items, keyed by {self.key}"]
+        for column, count in sorted(self.mismatches.items()):
+            examples = "; ".join(f"{row_id}: csv={cell!r} api={value!r}" for row_id, cell, value in self.samples[column])
+            lines.append(f"  {column}: {count} mismatches (e.g. {examples})")
+        if self.extra_count:
+            lines.append(f"  {self.extra_count} CSV rows not in the listing (e.g. {self.extra_rows})")
+        if self.missing_count:
+            lines.append(f"  {self.missing_count} listed items missing from the CSV (e.g. {self.missing_rows})")
+        if self.unmatched_columns:
+            lines.append(f"  not compared (no matching field): {', '.join(self.unmatched_columns)}")
+        return "\n".join(lines)
+
+    def close(self):
+        self.db.close()
+        os.remove(self.db_path)
+
+
+def iter_csv_rows(response):
+    """Parse a streamed CSV response row by row as the bytes arrive."""
+    encoding = response.encoding if "charset" in response.headers.get("Content-Type", "") else "utf-8"
+    # Undo any Content-Encoding, then hand csv the text with its line endings untouched
+    # (newline=""), so CRLF inside quoted cells survives and only real row ends split rows.
+    # urllib3 would close the stream at EOF under TextIOWrapper's buffer; the caller closes it.
+    response.raw.decode_content = True
+    response.raw.auto_close = False
+    return csv.reader(io.TextIOWrapper(response.raw, encoding=encoding, newline=""))
+
+
+def compare_csv_export(api, csv_endpoint, list_endpoint, workdir, page_size=500, params=None, **path_params):
+    """Stream ``csv_endpoint`` and compare it with every page of ``list_endpoint``; returns a ``CsvComparison``."""
+    comparison = CsvComparison(workdir)
+    try:
+        comparison.load_listing(iter_items(api, list_endpoint, page_size, params, **path_params))
+        response = api.get(csv_endpoint, stream=True, params=params,
+                           headers={"accept": "text/csv", "Content-Type": None}, **path_params)
+        try:
+            assert response.status_code == 200, \
+                f"CSV export {response.api_path} failed: {response.status_code} {response.text[:200]}"
+            comparison.compare_rows(iter_csv_rows(response))
+        finally:
+            response.close()
+    finally:
+        comparison.close()
+    return comparison
@@ -0,0 +1,171 @@
+"""Payload factories for revenue and rate fixtures.
+
+Steps used to build fixtures by formatting Gherkin tables into strings and
+running them through ``context.execute_steps``, which re-parses and
+re-matches the steps on every call. The factories hold precomputed payload
+templates instead. Building an entity is one dict copy plus the
+per-entity overrides, so the cost stays flat however many entities a
+scenario creates.
+
+Use ``RevenueFactory.for_context(context, "material")`` (any of
+``REVENUE_TYPES``) and ``RateFactory.for_context(context)``. A factory is
+rebuilt only when the scenario's revision or reference entities change.
+"""
+import os
+from datetime import datetime, timedelta
+
+DEFAULT_USER_ID = "99999999-9999-9999-9999-999999999999"
+
+# Revenue types served by the generic /revenue_options/parameters/{type} endpoints (rates have their own payload)
+REVENUE_TYPES = ("labor", "material", "engineering", "miscellaneous")
+
+# Rubric types per revenue type. Only the labor ones are named in the contract;
+# the others follow the same TYPE_KIND pattern
+RUBRIC_TYPES = {
+    "labor": ("AIRFRAME_LABOR", "BACKSHOP_LABOR", "NON_DESTRUCTIVE_TEST_LABOR",
+              "INTERIORS_LABOR", "COMPONENTS_LABOR", "PAINT_LABOR"),
+    "material": ("AIRFRAME_MATERIAL", "COMPONENTS_MATERIAL", "INTERIORS_MATERIAL", "PAINT_MATERIAL"),
+    "engineering": ("ENGINEERING_LABOR",),
+    "miscellaneous": ("MISCELLANEOUS_LABOR",),
+}
+
+# Rubric of a fixture that does not ask for specific ones: (type, value, hours)
+DEFAULT_RUBRICS = {
+    "labor": (("AIRFRAME_LABOR", 1000.0, 10.0),),
+    "material": (("AIRFRAME_MATERIAL", 1500.0, 0.0),),
+    "engineering": (("ENGINEERING_LABOR", 800.0, 8.0),),
+    "miscellaneous": (("MISCELLANEOUS_LABOR", 300.0, 3.0),),
+}
+
+# Rubric type -> key under "rubrics" in the API payload (see RubricsRequest in contracts.json)
+RUBRIC_KEYS = {
+    "AIRFRAME_LABOR": "airframe",
+    "BACKSHOP_LABOR": "backshop",
+    "ENGINEERING_LABOR": "engineering",
+    "NON_DESTRUCTIVE_TEST_LABOR": "nonDestructiveTest",
+    "NON_DESTRUCTIVE_TEST": "nonDestructiveTest",
+    "INTERIORS_LABOR": "interiors",
+    "COMPONENTS_LABOR": "components",
+    "PAINT_LABOR": "paint",
+    "MISCELLANEOUS_LABOR": "miscellaneous",
+}
+
+
+def rubric_key(rubric_type):
+    """Map a rubric type such as ``AIRFRAME_LABOR`` to its payload key."""
+    key = RUBRIC_KEYS.get(rubric_type)
+    if key is None:
+        # Unknown types follow the same rule: first word, NON_... is the NDT rubric
+        key = rubric_type.split("_")[0].lower()
+        if key == "non":
+            key = "nonDestructiveTest"
+        RUBRIC_KEYS[rubric_type] = key
+    return key
+
+
+def rubric(rubric_type, value, billable_hours):
+    return rubric_key(rubric_type), {"type": rubric_type, "value": value, "billableLaborHours": billable_hours}
+
+
+def iso_day(offset=0):
+    return (datetime.now() + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+def created_by():
+    return os.getenv("TEST_USER_ID", DEFAULT_USER_ID)
+
+
+def revision_payload(name, from_revision=None):
+    """Body for POST /revisions; ``from_revision`` makes the backend clone that revision's data."""
+    now = datetime.now()
+    return {
+        "opCo": os.getenv("TEST_OPCO_ID", "3fa85f64-5717-4562-b3fc-2c963f66afa6"),
+        "fromRevision": from_revision or os.getenv("FROM_REVISION_ID", "3fa85f64-5717-4562-b3fc-2c963f66afa6"),
+        "revisionName": f"{name} {now.strftime('%Y%m%d%H%M%S')}",
+        "revisionType": "TEST",
+        "year": now.year,
+        "week": int(now.strftime("%V")),
+        "comment": "Automated test revision",
+        "baseline": now.isoformat(),
+        "closure": (now + timedelta(days=7)).isoformat(),
+        "isOfficial": True,
+    }
+
+
+class _Factory:
+    # Attribute the factory is kept under on the context, formatted with the extra arguments
+    context_attr = None
+
+    def __init__(self, reference_entities, revision_id):
+        self.reference_entities = reference_entities
+        self.revision_id = revision_id
+
+    @classmethod
+    def for_context(cls, context, *args):
+        attr = cls.context_attr.format(*args)
+        factory = getattr(context, attr, None)
+        if (factory is None or factory.revision_id != context.revision_id
+                or factory.reference_entities is not context.reference_entities):
+            factory = cls(context.reference_entities, context.revision_id, *args)
+            setattr(context, attr, factory)
+        return factory
+
+    def _ref(self, entity):
+        return self.reference_entities[entity]["id"]
+
+
+class RevenueFactory(_Factory):
+    context_attr = "{}_factory"
+
+    def __init__(self, reference_entities, revision_id, revenue_type="labor"):
+        super().__init__(reference_entities, revision_id)
+        self.revenue_type = revenue_type
+        self.template = {
+            "type": revenue_type.upper(),
+            "revisionId": revision_id,
+            "customerId": self._ref("Customer"),
+            "aircraftId": self._ref("Aircraft"),
+            "checkTypeId": self._ref("CheckType"),
+            "lineId": self._ref("Line"),
+            "isAssociatedToEvent": False,
+            "createdBy": created_by(),
+        }
+
+    def build(self, rubrics=None, registration_date=None, **overrides):
+        """Revenue payload with ``(type, value, hours)`` rubrics; ``overrides`` win over the template."""
+        data = dict(self.template)
+        data["registrationDate"] = registration_date or iso_day()
+        data["rubrics"] = dict(rubric(*spec) for spec in rubrics or DEFAULT_RUBRICS[self.revenue_type])
+        data.update(overrides)
+        return data
+
+
+class RateFactory(_Factory):
+    context_attr = "rate_factory"
+
+    # Rate fields (and the reference entity each level is scoped to) per level
+    LEVEL_FIELDS = {
+        1: ({"airframeRate": 1000.0, "backshopRate": 500.0}, None),
+        2: ({"airframeRate": 1200.0, "engineeringRate": 800.0}, ("fleetTypeId", "FleetType")),
+        3: ({"ndtRate": 600.0, "componentsRate": 900.0}, ("checkTypeId", "CheckType")),
+    }
+
+    def __init__(self, reference_entities, revision_id):
+        super().__init__(reference_entities, revision_id)
+        base = {
+            "customerId": self._ref("Customer"),
+            "revisionId": revision_id,
+            "createdBy": created_by(),
+        }
+        self.templates = {}
+        for level, (fields, scope) in self.LEVEL_FIELDS.items():
+            template = dict(base, level=level, comments=f"Test Level {level} Rate", **fields)
+            if scope and scope[1] in reference_entities:
+                template[scope[0]] = self._ref(scope[1])
+            self.templates[level] = template
+
+    def build(self, level, year, **overrides):
+        data = dict(self.templates[level])
+        data["year"] = year
+        data.update(overrides)
+        return data
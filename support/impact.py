@@ -0,0 +1,327 @@
+"""Run only the scenarios a contract change can affect.
+
+Every behave run records which contract operations each scenario calls.
+``ImpactMap`` is an ``ApiClient`` use listener that maps a request back to its
+contract template (``GET /revisions/{revisionId}/revenue_options/parameters/{type}``).
+Use listeners also hear about requests a cache answered (``ResponseCache``
+and ``ReferenceCache`` hits), so a scenario whose lookups were all served
+from the cache still depends on the endpoint behind them.
+``after_all`` merges the result into ``test_output/impact_map.json``
+(``IMPACT_MAP``), together with a fingerprint of every operation in
+``contracts.json``. A fingerprint covers the operation with all of its
+``$ref``s inlined, so a change to a shared schema changes every operation
+that uses it.
+
+``python -m support.impact`` works out the changed operations:
+
+* by default, from the fingerprints stored at the last recorded run;
+* ``--since REF``: against ``contracts.json`` at a git revision;
+* ``--baseline PATH``: against another copy of the contract;
+* ``--endpoints``: from a list such as ``"PUT /revisions/revenue_options/parameters/{type}/delete"``.
+
+It then selects:
+
+* the scenarios that called a changed operation;
+* scenarios that are not in the map yet;
+* the smoke set (``@smoke``, ``IMPACT_SMOKE_TAG``).
+
+Operations called outside any step (revision set-up, cleanup) are shared
+by the whole suite, so a change to one of them selects everything.
+
+Only behave runs record: the load, soak and matrix runners set
+``IMPACT_MAP=off``, since they never run steps the way behave does.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from behave.parser import parse_file
+
+from support.contract import CONTRACT_PATH, PathMatcher, operations
+from support.parallel import OUTPUT_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers sharing a map file are not serialised
+    fcntl = None
+
+MAP_PATH = os.path.join(OUTPUT_DIR, "impact_map.json")
+FEATURES_DIR = "features"
+SMOKE_TAG = "smoke"
+# Scenario outcomes whose requests are worth recording (skipped ones are not;
+# load-mode runners do not record at all, see IMPACT_MAP=off)
+RECORDED = ("passed", "failed")
+OFF = ("off", "0", "false", "no")
+
+
+def _resolve(node, contract, seen=()):
+    """Inline every local ``$ref`` (schemas, parameters, request bodies, ...); cycles become ``{}``."""
+    if isinstance(node, list):
+        return [_resolve(item, contract, seen) for item in node]
+    if not isinstance(node, dict):
+        return node
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#/"):
+        if ref in seen:
+            return {}
+        target = contract
+        for part in ref[2:].split("/"):
+            target = target.get(part, {}) if isinstance(target, dict) else {}
+        return _resolve(target, contract, seen + (ref,))
+    return {key: _resolve(value, contract, seen) for key, value in node.items()}
+
+
+def operation_key(method, template):
+    return f"{method} {template}"
+
+
+def contract_fingerprints(contract):
+    """``{"METHOD template": hash}`` for every operation, with references resolved."""
+    fingerprints = {}
+    for method, template, operation in operations(contract):
+        resolved = json.dumps(_resolve(operation, contract), sort_keys=True)
+        fingerprints[operation_key(method, template)] = hashlib.sha1(resolved.encode("utf-8")).hexdigest()[:16]
+    return fingerprints
+
+
+def changed_operations(old, new):
+    """Operations added, removed or changed between two fingerprint maps."""
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+def _read_contract(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def contract_at(ref, path=CONTRACT_PATH):
+    """The contract as of git revision ``ref``."""
+    repo_path = os.path.relpath(os.path.abspath(path), _git_root())
+    shown = subprocess.run(["git", "show", f"{ref}:{repo_path}"], capture_output=True, text=True)
+    if shown.returncode != 0:
+        raise SystemExit(f"Cannot read {repo_path} at {ref}: {shown.stderr.strip()}")
+    return json.loads(shown.stdout)
+
+
+def _git_root():
+    found = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True)
+    if found.returncode != 0:
+        raise SystemExit("--since needs a git checkout")
+    return found.stdout.strip()
+
+
+def scenario_key(scenario):
+    return f"{scenario.filename}::{scenario.name}"
+
+
+class ImpactMap:
+    def __init__(self, path=MAP_PATH, contract_path=CONTRACT_PATH):
+        self.path = path
+        self.contract_path = contract_path
+        self.matcher = PathMatcher(template for _, template, _ in operations(_read_contract(contract_path)))
+        self.lock = threading.Lock()
+        self.scenario = None
+        self.in_step = False
+        self.current = set()
+        self.scenarios = {}
+        self.setup = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """The map at ``IMPACT_MAP``; ``None`` when it is ``off``."""
+        path = os.getenv("IMPACT_MAP", MAP_PATH)
+        if path.lower() in OFF:
+            return None
+        return cls(path)
+
+    def __call__(self, method, template, path):
+        contract_template, _ = self.matcher.match(path)
+        key = operation_key(method, contract_template or template)
+        with self.lock:
+            if self.scenario is not None:
+                self.current.add(key)
+            if not self.in_step:
+                self.setup.add(key)
+
+    def start(self, scenario):
+        with self.lock:
+            self.scenario = scenario
+            self.in_step = False
+            self.current = set()
+
+    def step(self):
+        self.in_step = True
+
+    def finish(self, scenario):
+        with self.lock:
+            status = getattr(scenario.status, "name", str(scenario.status))
+            if self.scenario is scenario and status in RECORDED:
+                self.scenarios[scenario_key(scenario)] = {
+                    "location": f"{scenario.filename}:{scenario.line}",
+                    "endpoints": sorted(self.current),
+                }
+            self.scenario = None
+            self.in_step = False
+            self.current = set()
+
+    @contextlib.contextmanager
+    def _state(self):
+        with open(self.path, "a+", encoding="utf-8") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            state.setdefault("contract", {})
+            state.setdefault("setup", [])
+            state.setdefault("scenarios", {})
+            yield state
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f, indent=2, sort_keys=True)
+
+    def save(self):
+        """Merge this run into the map file; returns the number of scenarios recorded."""
+        contract = _read_contract(self.contract_path)
+        with self.lock, self._state() as state:
+            state["contract"] = contract_fingerprints(contract)
+            state["setup"] = sorted(set(state["setup"]) | self.setup)
+            state["scenarios"].update(self.scenarios)
+            return len(self.scenarios)
+
+
+def load_map(path=MAP_PATH):
+    if not os.path.exists(path):
+        return {"contract": {}, "setup": [], "scenarios": {}}
+    with open(path) as f:
+        state = json.load(f)
+    for name, empty in (("contract", {}), ("setup", []), ("scenarios", {})):
+        state.setdefault(name, empty)
+    return state
+
+
+def current_scenarios(paths):
+    """``[(key, location, tags)]`` for every scenario in the feature files under ``paths``."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".feature"))
+        else:
+            files.append(path)
+    found = []
+    for filename in files:
+        feature = parse_file(filename)
+        if feature is None:
+            continue
+        for scenario in feature.walk_scenarios():
+            found.append((scenario_key(scenario), f"{filename}:{scenario.line}", set(scenario.effective_tags)))
+    return found
+
+
+def parse_endpoints(entries, known):
+    """Turn ``"METHOD /template"``, ``"/template"`` or concrete paths into operation keys."""
+    templates = {key.split(" ", 1)[1] for key in known}
+    matcher = PathMatcher(templates)
+    selected = set()
+    for entry in entries:
+        method, _, path = entry.strip().rpartition(" ")
+        method = method.upper()
+        template = path if path in templates else matcher.match(path)[0] or path
+        matched = set()
+        for key in known:
+            key_method, key_template = key.split(" ", 1)
+            if key_template == template and method in ("", key_method):
+                matched.add(key)
+        # Endpoints the contract does not know are kept, so they show up as uncovered
+        selected |= matched or {operation_key(method or "*", template)}
+    return selected
+
+
+def select(state, changed, paths, smoke_tag=SMOKE_TAG):
+    """Return ``(locations, reasons, uncovered)`` for the scenarios to run."""
+    scenarios = current_scenarios(paths)
+    if changed & set(state["setup"]):
+        shared = sorted(changed & set(state["setup"]))
+        return ([location for _, location, _ in scenarios],
+                {location: f"shared set-up endpoint changed: {shared[0]}" for _, location, _ in scenarios}, set())
+
+    reasons = {}
+    covered = set()
+    for key, location, tags in scenarios:
+        recorded = state["scenarios"].get(key)
+        if recorded is None:
+            reasons[location] = "not in the impact map yet"
+            continue
+        hit = changed & set(recorded["endpoints"])
+        covered |= hit
+        if hit:
+            reasons[location] = f"calls {sorted(hit)[0]}" + (f" (+{len(hit) - 1} more)" if len(hit) > 1 else "")
+        elif smoke_tag in tags:
+            reasons[location] = "smoke"
+    locations = [location for _, location, _ in scenarios if location in reasons]
+    return locations, reasons, changed - covered
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, behave_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description="Select the scenarios affected by a contract change")
+    parser.add_argument("paths", nargs="*", default=[FEATURES_DIR], help="feature files or directories")
+    parser.add_argument("--map", default=os.getenv("IMPACT_MAP", MAP_PATH))
+    parser.add_argument("--contract", default=CONTRACT_PATH)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--since", metavar="REF", help="diff against contracts.json at this git revision")
+    source.add_argument("--baseline", metavar="PATH", help="diff against this copy of the contract")
+    source.add_argument("--endpoints", nargs="+", metavar="ENDPOINT",
+                        help='changed endpoints, e.g. "GET /revisions/{revisionId}" or "/parameters/lines"')
+    parser.add_argument("--smoke-tag", default=os.getenv("IMPACT_SMOKE_TAG", SMOKE_TAG))
+    parser.add_argument("--list", action="store_true", help="only print the selected file:line locations")
+    parser.add_argument("--run", action="store_true", help="run the selection with behave")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="run through support.parallel with N workers")
+    args = parser.parse_args(argv)
+
+    state = load_map(args.map)
+    current = contract_fingerprints(_read_contract(args.contract))
+    if args.endpoints:
+        changed = parse_endpoints(args.endpoints, current)
+    elif args.since:
+        changed = changed_operations(contract_fingerprints(contract_at(args.since, args.contract)), current)
+    elif args.baseline:
+        changed = changed_operations(contract_fingerprints(_read_contract(args.baseline)), current)
+    else:
+        changed = changed_operations(state["contract"], current) if state["contract"] else set()
+
+    locations, reasons, uncovered = select(state, changed, args.paths, args.smoke_tag)
+    if args.list:
+        print("\n".join(locations))
+    else:
+        print(f"{len(changed)} changed operations, {len(state['scenarios'])} scenarios in {args.map}")
+        for key in sorted(changed):
+            print(f"  {key}{'  (no scenario calls it)' if key in uncovered else ''}")
+        print(f"Selected {len(locations)} scenarios:")
+        for location in locations:
+            print(f"  {location}  [{reasons[location]}]")
+    if not args.run or not locations:
+        return 0
+
+    if args.workers > 1:
+        from support.parallel import run
+        return run([], args.workers, behave_args, locations=locations)
+    return subprocess.call([sys.executable, "-m", "behave", *behave_args, *locations])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
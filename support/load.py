@@ -0,0 +1,303 @@
+"""Replay a feature scenario as a load-test workload.
+
+The scenario's Background and steps are executed through the normal step
+definitions by many concurrent virtual users, so the same Gherkin
+vocabulary covers functional and load testing::
+
+    python -m support.load features/revenue/labor_revenue.feature \\
+        --scenario "Create a basic labor revenue entry with rubrics" --users 20 --duration 60
+
+    API_STUB=1 python -m support.load features/revenue/rates.feature \\
+        --scenario "Search for rates by year" --users 5 --iterations 200
+
+``environment.py`` runs once (``before_all``/``after_all``) and each
+iteration goes through ``before_scenario`` like a behave run would. Every
+HTTP call is recorded by endpoint template; the report gives throughput,
+error rate and p50/p95/p99 latency per endpoint and is written to
+``test_output/load_report.json``.
+Revisions cannot be deleted, so each virtual user creates one revision up
+front and runs all of its iterations in it. The revenues and rates an
+iteration created are deleted after it (outside the report), so the next
+iteration starts from the same data. Exports are downloaded into a
+directory per virtual user (``test_output/load/user-N``).
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import types
+
+from behave.parser import parse_file, parse_steps
+from behave.runner_util import exec_file, load_step_modules
+from behave.step_registry import registry
+
+from support.cleanup import REVISION, id_key, journal_entry
+from support.stats import latency_summary
+
+FEATURES_DIR = "features"
+REPORT_PATH = os.path.join("test_output", "load_report.json")
+
+
+class StepFailed(Exception):
+    pass
+
+
+class VirtualUserContext:
+    """Per-iteration context layered over the run-wide one, like behave's scenario layer."""
+
+    def __init__(self, root):
+        self.__dict__["_root"] = root
+        self.table = None
+        self.text = None
+
+    def __getattr__(self, name):
+        return getattr(self._root, name)
+
+    def use_with_user_mode(self):
+        # behave's Match.run() wraps step functions in this
+        return contextlib.nullcontext()
+
+    def execute_steps(self, steps_text):
+        saved = (self.table, self.text)
+        try:
+            for step in parse_steps(steps_text):
+                run_step(self, step)
+        finally:
+            self.table, self.text = saved
+        return True
+
+
+def run_step(context, step):
+    match = registry.find_match(step)
+    if match is None:
+        raise StepFailed(f"Undefined step: {step.keyword} {step.name}")
+    context.table = step.table
+    context.text = step.text
+    match.run(context)
+
+
+class LoadRecorder:
+    """ApiClient listener collecting latency and status per endpoint template."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Leave this thread's requests out of the report (e.g. resetting between iterations)."""
+        self.local.paused = True
+        try:
+            yield
+        finally:
+            self.local.paused = False
+
+    def __call__(self, method, template, response):
+        if getattr(self.local, "paused", False):
+            return
+        key = f"{method} {template}"
+        with self.lock:
+            entry = self.samples.setdefault(key, {"latencies": [], "errors": 0})
+            entry["latencies"].append(getattr(response, "wall_time", response.elapsed.total_seconds()))
+            if response.status_code >= 400:
+                entry["errors"] += 1
+
+    def report(self, seconds):
+        endpoints = {}
+        for key, entry in sorted(self.samples.items()):
+            summary = latency_summary(entry["latencies"])
+            summary["throughput_rps"] = round(summary["count"] / seconds, 2) if seconds else 0.0
+            summary["error_rate"] = round(entry["errors"] / summary["count"], 4) if summary["count"] else 0.0
+            endpoints[key] = summary
+        return endpoints
+
+
+class IterationRows:
+    """ApiClient listener keeping the revenues/rates created, and not yet deleted, per revision.
+
+    Bulk fixtures create rows from worker threads, so rows are told apart by
+    the ``revisionId`` of the request, not by the thread that sent it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}
+
+    def __call__(self, method, template, response):
+        entry = journal_entry(method, template, response)
+        if entry is None or entry[1] == REVISION:
+            return
+        op, kind, ids = entry
+        with self.lock:
+            if op == "create":
+                try:
+                    revision_id = json.loads(response.request.body or b"{}").get("revisionId")
+                except ValueError:
+                    return
+                self.rows.setdefault(revision_id, {}).setdefault(kind, set()).update(ids)
+            else:
+                for kinds in self.rows.values():
+                    kinds.get(kind, set()).difference_update(ids)
+
+    def take(self, revision_id):
+        """``{kind: ids}`` created in ``revision_id`` since the last ``take``."""
+        with self.lock:
+            kinds = self.rows.pop(revision_id, {})
+        return {kind: sorted(ids) for kind, ids in kinds.items() if ids}
+
+
+class LoadRun:
+    def __init__(self, feature_path, scenario_name, users, duration=None, iterations=None):
+        self.feature = parse_file(feature_path)
+        self.scenario = next((s for s in self.feature.walk_scenarios() if s.name == scenario_name), None)
+        if self.scenario is None:
+            raise SystemExit(f"Scenario {scenario_name!r} not found in {feature_path}")
+        background = self.feature.background.steps if self.feature.background else []
+        self.steps = list(background) + list(self.scenario.steps)
+        self.users = users
+        self.duration = duration
+        self.iterations = iterations
+        self.lock = threading.Lock()
+        self.started = 0
+        self.passed = 0
+        self.failures = {}
+        self.recorder = LoadRecorder()
+        self.rows = IterationRows()
+        self.limiter = None
+
+    def _claim_iteration(self, deadline):
+        with self.lock:
+            if self.iterations is not None and self.started >= self.iterations:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self.started += 1
+            return True
+
+    def _virtual_user(self, root, hooks, deadline, index):
+        # The user's own revision; its iterations find it there and before_scenario creates no other
+        user = VirtualUserContext(root)
+        hooks["create_test_revision"](user, f"Load user {index}")
+        # Export steps write fixed file names; users must not overwrite each other's downloads
+        user.output_dir = os.path.join(root.output_dir, "load", f"user-{index}")
+        os.makedirs(user.output_dir, exist_ok=True)
+        while self._claim_iteration(deadline):
+            context = VirtualUserContext(user)
+            try:
+                if "before_scenario" in hooks:
+                    hooks["before_scenario"](context, self.scenario)
+                for step in self.steps:
+                    run_step(context, step)
+            except Exception as e:
+                reason = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                with self.lock:
+                    self.failures[reason] = self.failures.get(reason, 0) + 1
+                continue
+            finally:
+                if "after_scenario" in hooks:
+                    hooks["after_scenario"](context, self.scenario)
+                self._reset(user)
+            with self.lock:
+                self.passed += 1
+
+    def _reset(self, user):
+        # The next iteration runs in the same revision; rows it creates again must not be duplicates
+        with self.recorder.paused():
+            for kind, ids in self.rows.take(user.revision_id).items():
+                user.api.put("revenue_delete", type=kind, json={id_key(kind): ids})
+
+    def run(self, verbose=False):
+        # The pool must be at least as large as the number of concurrent users, and
+        # contract checks are a functional concern that would only skew the numbers
+        os.environ.setdefault("API_POOL_SIZE", str(max(self.users, 10)))
+        os.environ.setdefault("CONTRACT_VALIDATION", "off")
+        # No before_step here, so every request would count as shared set-up in the impact map
+        os.environ["IMPACT_MAP"] = "off"
+        hooks = {}
+        exec_file(os.path.join(FEATURES_DIR, "environment.py"), hooks)
+        load_step_modules([os.path.join(FEATURES_DIR, "steps")])
+
+        root = types.SimpleNamespace()
+        hooks["before_all"](root)
+        if not verbose:
+            root.logger.setLevel(logging.WARNING)
+        root.api.add_listener(self.recorder)
+        root.api.add_listener(self.rows)
+        self.limiter = root.api.limiter
+
+        deadline = time.monotonic() + self.duration if self.duration else None
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._virtual_user, args=(root, hooks, deadline, index),
+                                    name=f"vu-{index}") for index in range(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # Cleanup traffic is not part of the workload
+        root.api.listeners.remove(self.recorder)
+        root.api.listeners.remove(self.rows)
+        hooks["after_all"](root)
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        completed = self.passed + sum(self.failures.values())
+        return {
+            "feature": self.feature.filename,
+            "scenario": self.scenario.name,
+            "users": self.users,
+            "seconds": round(elapsed, 3),
+            "iterations": completed,
+            "iterations_passed": self.passed,
+            "iteration_failures": self.failures,
+            "scenario_throughput": round(completed / elapsed, 2) if elapsed else 0.0,
+            "endpoints": self.recorder.report(elapsed),
+            "concurrency": self.limiter.stats() if self.limiter else None,
+        }
+
+
+def print_report(report):
+    print(f"{report['scenario']}: {report['iterations']} iterations by {report['users']} users "
+          f"in {report['seconds']}s ({report['scenario_throughput']} it/s, "
+          f"{report['iterations_passed']} passed)")
+    for reason, count in report["iteration_failures"].items():
+        print(f"  {count} x {reason}")
+    print(f"{'endpoint':<80} {'count':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for key, row in report["endpoints"].items():
+        print(f"{key:<80} {row['count']:>7} {row['throughput_rps']:>8} {row['error_rate'] * 100:>6.1f} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+    if report["concurrency"]:
+        limits = " ".join(f"{entry['limit']}@{entry['t']}s" for entry in report["concurrency"]["history"][-12:])
+        print(f"concurrency limit {report['concurrency']['final']} (peak {report['concurrency']['peak']}), "
+              f"back-offs {report['concurrency']['decreases']}; last changes: {limits}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a feature scenario as a load test")
+    parser.add_argument("feature", help="path to the .feature file")
+    parser.add_argument("--scenario", required=True, help="scenario name as written in the feature")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, help="run for this many seconds")
+    parser.add_argument("--iterations", type=int, help="total scenario iterations across all users")
+    parser.add_argument("--output", default=REPORT_PATH, help="where to write the JSON report")
+    parser.add_argument("--verbose", action="store_true", help="keep INFO logging from the steps")
+    args = parser.parse_args(argv)
+    if args.duration is None and args.iterations is None:
+        parser.error("give --duration and/or --iterations")
+
+    report = LoadRun(args.feature, args.scenario, args.users, args.duration, args.iterations).run(args.verbose)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    return 0 if not report["iteration_failures"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Queue-based, structured logging for the harness.
+
+``context.logger`` only puts records on a queue, unformatted. A
+``QueueListener`` thread does the formatting (``payload()`` rendering
+included) and the I/O, so both stay off the steps' critical path in
+parallel and load runs. The listener writes:
+
+* ``bdd_test.log``: the familiar text lines;
+* ``bdd_test.jsonl``: one JSON object per record, carrying the worker,
+  scenario and step. Request records (``RequestLog``) add the method,
+  endpoint, status and latency; they go to the JSONL file only;
+* the console, unless behave is capturing log output itself.
+
+Large dicts and response bodies are logged as ``%s`` arguments wrapped in
+``payload()``. They are only rendered when a record is actually emitted,
+and then only up to ``LOG_PAYLOAD_LIMIT`` characters (default 500).
+``LOG_PAYLOAD_SAMPLE`` (0 to 1, default 1) renders that share of payloads
+and summarises the rest as ``<dict: 12 keys>``. ``LOG_REQUESTS=0`` turns
+request records off.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_NAME = "bdd_test.log"
+JSONL_NAME = "bdd_test.jsonl"
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+REQUEST_LOGGER = "bdd.requests"
+# LogRecord attributes that are not ours to put in the JSONL
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class Payload:
+    """Log argument that renders ``value`` as bounded JSON, and only when the record is emitted."""
+
+    _counter = 0
+    _lock = threading.Lock()
+
+    def __init__(self, value, limit=None, sample=None):
+        self.value = value
+        self.limit = limit if limit is not None else int(os.getenv("LOG_PAYLOAD_LIMIT", "500"))
+        self.sample = sample if sample is not None else float(os.getenv("LOG_PAYLOAD_SAMPLE", "1"))
+        self.text = None
+
+    def _sampled(self):
+        if self.sample >= 1:
+            return True
+        with Payload._lock:
+            index = Payload._counter
+            Payload._counter += 1
+        # Evenly spread: exactly ``sample`` of all payloads get rendered
+        return int((index + 1) * self.sample) > int(index * self.sample)
+
+    def _summary(self):
+        value = self.value
+        if isinstance(value, dict):
+            return f"<dict: {len(value)} keys>"
+        if isinstance(value, (list, tuple)):
+            return f"<list: {len(value)} items>"
+        return f"<{type(value).__name__}: {len(str(value))} chars>"
+
+    def __str__(self):
+        # Every listener handler formats the record; render (and sample) it only once
+        if self.text is None:
+            self.text = self._render()
+        return self.text
+
+    def _render(self):
+        if not self._sampled():
+            return self._summary()
+        value = self.value
+        if isinstance(value, bytes):
+            value = value[:self.limit * 4].decode("utf-8", "replace")
+        if isinstance(value, str):
+            text = value
+        else:
+            # The pure-Python encoder yields chunks, so a huge payload is never encoded in full
+            chunks, size = [], 0
+            for chunk in json.JSONEncoder(default=str).iterencode(value):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > self.limit:
+                    break
+            text = "".join(chunks)
+        if len(text) > self.limit:
+            return f"{text[:self.limit]}... (truncated)"
+        return text
+
+
+def payload(value, limit=None):
+    return Payload(value, limit)
+
+
+class JsonlFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _STANDARD and value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _NotRequests(logging.Filter):
+    def filter(self, record):
+        return not record.name.startswith(REQUEST_LOGGER)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """``QueueHandler`` that enqueues the record untouched.
+
+    The stock ``prepare()`` formats the message on the logging thread, which
+    would render every ``payload()`` there; the listener's handlers format it.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class LogPipeline:
+    """Queue handler on the ``bdd`` logger, drained by a background listener."""
+
+    def __init__(self, output_dir, console=True, level=logging.INFO, name="bdd"):
+        text = logging.FileHandler(os.path.join(output_dir, LOG_NAME))
+        text.setFormatter(logging.Formatter(TEXT_FORMAT))
+        text.addFilter(_NotRequests())
+        structured = logging.FileHandler(os.path.join(output_dir, JSONL_NAME))
+        structured.setFormatter(JsonlFormatter())
+        self.handlers = [text, structured]
+        if console:
+            stream = logging.StreamHandler()
+            stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+            stream.addFilter(_NotRequests())
+            self.handlers.append(stream)
+
+        self.scenario = None
+        self.step = None
+        self.worker = os.getenv("BDD_WORKER_ID")
+        self.queue = queue.SimpleQueue()
+        self.handler = _RecordQueueHandler(self.queue)
+        self.handler.addFilter(self._stamp)
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+        self.logger.addHandler(self.handler)
+
+    def _stamp(self, record):
+        # Runs in the logging thread, so the scenario and step are the ones current at log time
+        record.worker = self.worker
+        record.scenario = self.scenario
+        record.step = self.step
+        return True
+
+    def stop(self):
+        """Flush everything still queued and close the files."""
+        self.logger.removeHandler(self.handler)
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+
+
+class RequestLog:
+    """ApiClient listener: one structured record per request on the ``bdd.requests`` logger."""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(REQUEST_LOGGER)
+
+    def __call__(self, method, template, response):
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        latency_ms = round(getattr(response, "wall_time", response.elapsed.total_seconds()) * 1000, 3)
+        self.logger.info("%s %s -> %s in %.1f ms", method, getattr(response, "api_path", template),
+                         response.status_code, latency_ms,
+                         extra={"method": method, "endpoint": template, "status": response.status_code,
+                                "latency_ms": latency_ms, "cached": getattr(response, "from_cache", False)})
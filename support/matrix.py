@@ -0,0 +1,170 @@
+"""Run revenue-type scenario outlines as a concurrent matrix.
+
+Usage (from the repository root)::
+
+    API_STUB=1 python -m support.matrix
+    python -m support.matrix --types labor,material --tag export
+    python -m support.matrix --serial          # same cells, one at a time, for comparison
+
+Each Examples row of an outline in ``features/revenue/revenue_types.feature``
+is one cell of the matrix. All cells of an outline run at the same time,
+one thread per cell. As in ``support.load``, every cell gets its own
+scenario-level context layered over one shared run context, so the cells
+share:
+
+* the ``ApiClient`` and its connection pool;
+* one test revision, created before the first outline;
+* the cached reference entities.
+
+Outlines run one after another. ``environment.py`` hooks run as in a
+behave run. The report gives each cell's status and time, and each
+outline's wall time against the serial sum of its cells. It is written to
+``test_output/matrix_report.json``.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from behave.parser import parse_file
+from behave.runner_util import exec_file, load_step_modules
+
+from support.bulk import default_workers
+from support.load import FEATURES_DIR, VirtualUserContext, run_step
+
+MATRIX_FEATURE = os.path.join(FEATURES_DIR, "revenue", "revenue_types.feature")
+REPORT_PATH = os.path.join("test_output", "matrix_report.json")
+MATRIX_TAG = "matrix"
+
+
+def _cell_type(scenario):
+    row = getattr(scenario, "_row", None)
+    return row.get("type") if row is not None else None
+
+
+class MatrixRun:
+    def __init__(self, feature_path=MATRIX_FEATURE, types_=None, tags=(MATRIX_TAG,), serial=False):
+        self.feature = parse_file(feature_path)
+        self.background = list(self.feature.background.steps) if self.feature.background else []
+        self.outlines = []
+        for outline in self.feature.scenarios:
+            cells = [scenario for scenario in getattr(outline, "scenarios", [])
+                     if not types_ or _cell_type(scenario) in types_]
+            if cells and set(tags) <= set(outline.tags):
+                self.outlines.append((outline, cells))
+        self.serial = serial
+        self.lock = threading.Lock()
+
+    def _run_cell(self, root, hooks, scenario):
+        context = VirtualUserContext(root)
+        started = time.perf_counter()
+        error = None
+        try:
+            if "before_scenario" in hooks:
+                hooks["before_scenario"](context, scenario)
+            for step in self.background + list(scenario.steps):
+                run_step(context, step)
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+        finally:
+            if "after_scenario" in hooks:
+                hooks["after_scenario"](context, scenario)
+        return {
+            "scenario": scenario.name,
+            "type": _cell_type(scenario),
+            "status": "failed" if error else "passed",
+            "seconds": round(time.perf_counter() - started, 4),
+            "error": error,
+        }
+
+    def run(self, verbose=False):
+        widest = max((len(cells) for _, cells in self.outlines), default=1)
+        # Every cell may have a bulk fixture in flight at the same time
+        os.environ.setdefault("API_POOL_SIZE", str(max(10, widest * default_workers())))
+        # No before_step here, so every request would count as shared set-up in the impact map
+        os.environ["IMPACT_MAP"] = "off"
+        hooks = {}
+        exec_file(os.path.join(FEATURES_DIR, "environment.py"), hooks)
+        load_step_modules([os.path.join(FEATURES_DIR, "steps")])
+
+        root = types.SimpleNamespace()
+        hooks["before_all"](root)
+        if not verbose:
+            root.logger.setLevel(logging.WARNING)
+        # One revision for every cell, instead of one per thread from before_scenario
+        if not root.revision_id:
+            hooks["create_test_revision"](root, f"Matrix {self.feature.name}")
+
+        outlines = []
+        started = time.perf_counter()
+        try:
+            for outline, cells in self.outlines:
+                outline_started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=1 if self.serial else len(cells),
+                                        thread_name_prefix="matrix") as pool:
+                    results = list(pool.map(lambda scenario: self._run_cell(root, hooks, scenario), cells))
+                outlines.append({
+                    "outline": outline.name,
+                    "seconds": round(time.perf_counter() - outline_started, 4),
+                    "serial_seconds": round(sum(cell["seconds"] for cell in results), 4),
+                    "cells": results,
+                })
+        finally:
+            elapsed = time.perf_counter() - started
+            hooks["after_all"](root)
+        return self.report(outlines, elapsed)
+
+    def report(self, outlines, elapsed):
+        serial = sum(outline["serial_seconds"] for outline in outlines)
+        cells = [cell for outline in outlines for cell in outline["cells"]]
+        return {
+            "feature": self.feature.filename,
+            "mode": "serial" if self.serial else "concurrent",
+            "seconds": round(elapsed, 4),
+            "serial_seconds": round(serial, 4),
+            "speedup": round(serial / elapsed, 2) if elapsed else 0.0,
+            "cells": len(cells),
+            "failed": sum(1 for cell in cells if cell["status"] == "failed"),
+            "outlines": outlines,
+        }
+
+
+def print_report(report):
+    print(f"{report['feature']}: {report['cells']} cells ({report['mode']}) in {report['seconds']}s, "
+          f"{report['serial_seconds']}s of cell time ({report['speedup']}x), {report['failed']} failed")
+    for outline in report["outlines"]:
+        print(f"  {outline['outline']}: {outline['seconds']}s (cells {outline['serial_seconds']}s)")
+        for cell in outline["cells"]:
+            line = f"    {cell['type'] or cell['scenario']:<16} {cell['status']:<7} {cell['seconds']:>8.3f}s"
+            print(f"{line}  {cell['error']}" if cell["error"] else line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run revenue-type outlines as a concurrent matrix")
+    parser.add_argument("feature", nargs="?", default=MATRIX_FEATURE, help="feature file with the outlines")
+    parser.add_argument("--types", help="comma-separated revenue types (default: every Examples row)")
+    parser.add_argument("--tag", action="append", default=[], help="only outlines with this tag (repeatable)")
+    parser.add_argument("--serial", action="store_true", help="run the cells one at a time")
+    parser.add_argument("--output", default=REPORT_PATH, help="where to write the JSON report")
+    parser.add_argument("--verbose", action="store_true", help="keep INFO logging from the steps")
+    args = parser.parse_args(argv)
+
+    types_ = set(args.types.split(",")) if args.types else None
+    run = MatrixRun(args.feature, types_, [MATRIX_TAG, *args.tag], args.serial)
+    if not run.outlines:
+        parser.error("no outline matches the given types and tags")
+    report = run.run(args.verbose)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Per-request instrumentation for the HTTP client.
+
+``RequestMetrics`` is an ``ApiClient`` listener. It records every call
+with its endpoint template, status, wall-clock latency, time to first
+byte, request/response sizes and the scenario and step that made it. At
+the end of the run ``write_report`` aggregates per endpoint and writes:
+
+* ``request_report.json`` - per-endpoint percentiles plus the slowest requests
+* ``request_report.csv``  - the per-endpoint table
+* ``requests.csv``        - one row per request
+"""
+import csv
+import json
+import os
+import threading
+import time
+
+from support.stats import latency_summary
+
+FIELDS = ("timestamp", "scenario", "step", "method", "endpoint", "path", "status",
+          "latency_ms", "ttfb_ms", "request_bytes", "response_bytes")
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    if isinstance(body, bytes):
+        return len(body)
+    return 0
+
+
+def response_size(response):
+    # Streamed bodies are counted by ApiClient as the caller reads them
+    if getattr(response, "streamed", False):
+        if getattr(response, "body_bytes", None) is not None:
+            return response.body_bytes
+        return int(response.headers.get("Content-Length") or 0)
+    return len(response.content)
+
+
+class RequestMetrics:
+    def __init__(self, slowest=20):
+        self.lock = threading.Lock()
+        self.records = []
+        self.slowest = slowest
+        self.scenario = None
+        self.step = None
+
+    def __call__(self, method, template, response):
+        latency = getattr(response, "wall_time", response.elapsed.total_seconds())
+        record = {
+            "timestamp": time.time(),
+            "scenario": self.scenario,
+            "step": self.step,
+            "method": method,
+            "endpoint": template,
+            "path": getattr(response, "api_path", ""),
+            "status": response.status_code,
+            "latency_ms": round(latency * 1000, 3),
+            "ttfb_ms": round(response.elapsed.total_seconds() * 1000, 3),
+            "request_bytes": _body_size(response.request.body),
+            "response_bytes": response_size(response),
+        }
+        with self.lock:
+            self.records.append(record)
+
+    def summary(self):
+        groups = {}
+        for record in self.records:
+            groups.setdefault(f"{record['method']} {record['endpoint']}", []).append(record)
+
+        endpoints = {}
+        for key, records in sorted(groups.items()):
+            latency = latency_summary([r["latency_ms"] / 1000 for r in records])
+            ttfb = latency_summary([r["ttfb_ms"] / 1000 for r in records])
+            endpoints[key] = {
+                **latency,
+                "ttfb_p50_ms": ttfb["p50_ms"],
+                "ttfb_p95_ms": ttfb["p95_ms"],
+                "errors": sum(1 for r in records if r["status"] >= 400),
+                "request_bytes": sum(r["request_bytes"] for r in records),
+                "response_bytes": sum(r["response_bytes"] for r in records),
+                "avg_response_bytes": round(sum(r["response_bytes"] for r in records) / len(records)),
+            }
+        slowest = sorted(self.records, key=lambda r: r["latency_ms"], reverse=True)[:self.slowest]
+        return {"requests": len(self.records), "endpoints": endpoints, "slowest": slowest}
+
+    def write_report(self, output_dir, extra=None):
+        """Write the JSON/CSV reports into ``output_dir``; ``extra`` sections go into the JSON. Returns its path."""
+        with self.lock:
+            summary = self.summary()
+            records = list(self.records)
+        summary.update(extra or {})
+
+        json_path = os.path.join(output_dir, "request_report.json")
+        with open(json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+        with open(os.path.join(output_dir, "request_report.csv"), "w", newline="") as f:
+            columns = ["endpoint", "count", "errors", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms",
+                       "ttfb_p50_ms", "ttfb_p95_ms", "request_bytes", "response_bytes", "avg_response_bytes"]
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for key, row in summary["endpoints"].items():
+                writer.writerow({"endpoint": key, **row})
+
+        with open(os.path.join(output_dir, "requests.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        return json_path
@@ -0,0 +1,138 @@
+"""Walk paginated listing endpoints page by page.
+
+The API uses two envelopes: ``{"items": [...], "pagination": {...}}`` and,
+for some revision collections, ``{"items": [...], "totalPages": n, ...}``.
+``Paginator`` handles both. While the caller works through page k, the
+request for page k+1 is already in flight on a background thread. The page
+size doubles while pages come back fast and halves when they get slow. It
+only changes where the new size still lines up with the item offset, so no
+item is skipped or seen twice.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAGE_SIZE = 100
+MIN_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+TARGET_SECONDS = 0.5
+
+
+def page_items(body):
+    return body.get("items") or []
+
+
+def page_info(body):
+    return body.get("pagination") or body
+
+
+class Paginator:
+    def __init__(self, api, endpoint, page_size=DEFAULT_PAGE_SIZE, params=None, prefetch=True,
+                 adaptive=True, min_page_size=MIN_PAGE_SIZE, max_page_size=MAX_PAGE_SIZE,
+                 target_seconds=TARGET_SECONDS, **path_params):
+        self.api = api
+        self.endpoint = endpoint
+        self.page_size = page_size
+        self.params = dict(params or {})
+        self.prefetch = prefetch
+        self.adaptive = adaptive
+        self.min_page_size = min(min_page_size, page_size)
+        self.max_page_size = max(max_page_size, page_size)
+        self.target_seconds = target_seconds
+        self.path_params = path_params
+        self.total_items = None
+        self.total_pages = None
+        self.requests = 0
+        self.first_page = None
+        self.first_seconds = 0.0
+
+    def _fetch(self, offset, size):
+        """Fetch ``size`` items starting at ``offset``: ``(body, seconds, expected item count)``."""
+        page, skip = divmod(offset, size)
+        response = self.api.get(self.endpoint, params=dict(self.params, page=page, pageSize=size),
+                                **self.path_params)
+        assert response.status_code == 200, \
+            f"Listing {response.api_path} page {page} failed: {response.status_code} {response.text[:200]}"
+        body = response.json()
+        if skip:
+            # Only after the server capped the page size: drop the items already seen
+            body["items"] = page_items(body)[skip:]
+        return body, response.wall_time, size - skip
+
+    def _next_size(self, offset, size, seconds):
+        if not self.adaptive:
+            return size
+        if seconds < self.target_seconds / 2 and size * 2 <= self.max_page_size and offset % (size * 2) == 0:
+            return size * 2
+        if seconds > self.target_seconds * 2 and size // 2 >= self.min_page_size and size % 2 == 0:
+            return size // 2
+        return size
+
+    def fetch_first(self):
+        """Fetch the first page now (so request errors surface here) and return its body."""
+        if self.first_page is None:
+            self.first_page, self.first_seconds, _ = self._fetch(0, self.page_size)
+            self.requests += 1
+            info = page_info(self.first_page)
+            self.total_items = info.get("totalItems")
+            self.total_pages = info.get("totalPages")
+        return self.first_page
+
+    @property
+    def first_items(self):
+        return page_items(self.fetch_first())
+
+    def pages(self):
+        """Yield every page body, prefetching the next page while the caller handles this one."""
+        body, seconds, expected = self.fetch_first(), self.first_seconds, self.page_size
+        size, offset = self.page_size, 0
+        pool = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        try:
+            while True:
+                returned = len(page_items(body))
+                if (self.total_items is not None and 0 < returned < expected
+                        and offset + returned < self.total_items):
+                    # The server caps pageSize below what we asked for, so the page number
+                    # pointed somewhere else; stay below the cap and fetch this offset again
+                    self.max_page_size = size = returned
+                    if offset:
+                        body, seconds, expected = self._fetch(offset, size)
+                        self.requests += 1
+                        continue
+                offset += returned
+                if self.total_items is not None:
+                    done = returned == 0 or offset >= self.total_items
+                else:
+                    done = returned < expected
+                if done:
+                    yield body
+                    return
+                size = self._next_size(offset, size, seconds)
+                pending = pool.submit(self._fetch, offset, size) if pool else None
+                self.requests += 1
+                yield body
+                body, seconds, expected = pending.result() if pending else self._fetch(offset, size)
+        finally:
+            if pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def __iter__(self):
+        for body in self.pages():
+            yield from page_items(body)
+
+    def count(self):
+        """Total number of items: from the envelope when it says, else by walking every page."""
+        self.fetch_first()
+        if self.total_items is not None:
+            return self.total_items
+        return sum(1 for _ in self)
+
+    def summary(self):
+        total = self.total_items if self.total_items is not None else "?"
+        return f"{total} items in {self.requests} page requests"
+
+
+def iter_pages(api, endpoint, page_size=DEFAULT_PAGE_SIZE, params=None, **path_params):
+    return Paginator(api, endpoint, page_size, params, **path_params).pages()
+
+
+def iter_items(api, endpoint, page_size=DEFAULT_PAGE_SIZE, params=None, **path_params):
+    return iter(Paginator(api, endpoint, page_size, params, **path_params))
@@ -0,0 +1,215 @@
+"""Run the feature files across several behave worker processes.
+
+Usage (from the repository root)::
+
+    python -m support.parallel -j 4
+    python -m support.parallel -j 4 features/revenue -- --tags=@revenue_test
+
+Scenarios are dealt round-robin to N workers. Each worker is a separate
+``behave`` process with ``BDD_WORKER_ID`` and ``BDD_OUTPUT_DIR`` set, so
+``before_all`` creates its own revision and keeps its own cleanup lists.
+When every worker has finished, the per-worker logs, JUnit XML and JSON
+results are merged into ``test_output/``.
+"""
+import argparse
+import glob
+import heapq
+import json
+import os
+import shutil
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+from behave.parser import parse_file
+
+DEFAULT_PATHS = ["features/revenue"]
+OUTPUT_DIR = "test_output"
+LOG_NAME = "bdd_test.log"
+JSONL_NAME = "bdd_test.jsonl"
+JSON_NAME = "results.json"
+
+
+def collect_scenarios(paths):
+    """Return the ``file:line`` location of every scenario under ``paths``."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.feature"), recursive=True)))
+        else:
+            files.append(path)
+
+    locations = []
+    for filename in files:
+        feature = parse_file(filename)
+        if feature is None:
+            continue
+        for scenario in feature.walk_scenarios():
+            locations.append(f"{filename}:{scenario.line}")
+    return locations
+
+
+def partition(items, workers):
+    buckets = [[] for _ in range(workers)]
+    for index, item in enumerate(items):
+        buckets[index % workers].append(item)
+    return [bucket for bucket in buckets if bucket]
+
+
+def worker_dir(output_dir, worker_id):
+    return os.path.join(output_dir, f"worker-{worker_id}")
+
+
+def start_worker(worker_id, locations, output_dir, behave_args):
+    out = worker_dir(output_dir, worker_id)
+    shutil.rmtree(out, ignore_errors=True)
+    os.makedirs(out)
+
+    env = dict(os.environ, BDD_WORKER_ID=str(worker_id), BDD_OUTPUT_DIR=out)
+    command = [
+        sys.executable, "-m", "behave",
+        "--junit", "--junit-directory", os.path.join(out, "junit"),
+        "-f", "json", "-o", os.path.join(out, JSON_NAME),
+        "-f", "progress", "-o", os.path.join(out, "behave.out"),
+        *behave_args, *locations,
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+def merge_logs(output_dir, worker_ids):
+    with open(os.path.join(output_dir, LOG_NAME), "a") as merged:
+        for worker_id in worker_ids:
+            path = os.path.join(worker_dir(output_dir, worker_id), LOG_NAME)
+            if not os.path.exists(path):
+                continue
+            with open(path) as log:
+                for line in log:
+                    merged.write(f"[worker {worker_id}] {line}")
+
+    # Structured records already carry their worker; interleave them by timestamp
+    logs = [open(path) for path in (os.path.join(worker_dir(output_dir, worker_id), JSONL_NAME)
+                                    for worker_id in worker_ids) if os.path.exists(path)]
+    try:
+        with open(os.path.join(output_dir, JSONL_NAME), "a") as merged:
+            merged.writelines(heapq.merge(*logs, key=lambda line: json.loads(line)["ts"]))
+    finally:
+        for log in logs:
+            log.close()
+
+
+def _prefer_executed(current, candidate, status_of):
+    """Pick the copy of a scenario that actually ran.
+
+    A worker given ``file:line`` selections still reports the rest of the
+    feature as skipped, so each scenario shows up once per worker.
+    """
+    if current is None or status_of(current) == "skipped":
+        return candidate
+    return current
+
+
+def _junit_status(testcase):
+    return testcase.get("status", "")
+
+
+def merge_junit(output_dir, worker_ids):
+    """Fold the per-worker ``TESTS-*.xml`` files into one suite per feature."""
+    suites = {}
+    testcases = {}
+    for worker_id in worker_ids:
+        pattern = os.path.join(worker_dir(output_dir, worker_id), "junit", "*.xml")
+        for path in sorted(glob.glob(pattern)):
+            suite = ET.parse(path).getroot()
+            name = os.path.basename(path)
+            suites.setdefault(name, suite)
+            cases = testcases.setdefault(name, {})
+            for testcase in suite.findall("testcase"):
+                key = testcase.get("name")
+                cases[key] = _prefer_executed(cases.get(key), testcase, _junit_status)
+
+    junit_dir = os.path.join(output_dir, "junit")
+    os.makedirs(junit_dir, exist_ok=True)
+    for name, suite in suites.items():
+        merged = ET.Element("testsuite", dict(suite.attrib))
+        cases = list(testcases[name].values())
+        statuses = [_junit_status(testcase) for testcase in cases]
+        merged.set("tests", str(len(cases)))
+        merged.set("failures", str(statuses.count("failed")))
+        merged.set("errors", str(sum(len(testcase.findall("error")) for testcase in cases)))
+        merged.set("skipped", str(statuses.count("skipped")))
+        merged.set("time", str(sum(float(testcase.get("time", 0)) for testcase in cases)))
+        merged.extend(cases)
+        ET.ElementTree(merged).write(os.path.join(junit_dir, name), encoding="utf-8", xml_declaration=True)
+
+
+def _json_status(element):
+    return element.get("status", "")
+
+
+def merge_json(output_dir, worker_ids):
+    """Concatenate the behave JSON reports, one entry per feature and scenario."""
+    features = {}
+    elements = {}
+    for worker_id in worker_ids:
+        path = os.path.join(worker_dir(output_dir, worker_id), JSON_NAME)
+        if not os.path.exists(path) or not os.path.getsize(path):
+            continue
+        with open(path) as f:
+            for feature in json.load(f):
+                key = feature.get("location", "").split(":")[0]
+                features.setdefault(key, feature)
+                merged = elements.setdefault(key, {})
+                for element in feature.get("elements", []):
+                    location = element.get("location")
+                    merged[location] = _prefer_executed(merged.get(location), element, _json_status)
+
+    for key, feature in features.items():
+        feature["elements"] = sorted(elements[key].values(),
+                                     key=lambda element: int(element.get("location", ":0").split(":")[-1]))
+        statuses = {_json_status(element) for element in feature["elements"]}
+        feature["status"] = "failed" if "failed" in statuses else "passed" if "passed" in statuses else "skipped"
+
+    with open(os.path.join(output_dir, JSON_NAME), "w") as f:
+        json.dump(list(features.values()), f, indent=2)
+
+
+def run(paths, workers, behave_args, output_dir=OUTPUT_DIR, locations=None):
+    """Run ``locations`` (``file:line``), or every scenario under ``paths``, on ``workers`` processes."""
+    if locations is None:
+        locations = collect_scenarios(paths)
+    buckets = partition(locations, workers)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Running {len(locations)} scenarios on {len(buckets)} workers")
+
+    processes = [start_worker(worker_id, bucket, output_dir, behave_args)
+                 for worker_id, bucket in enumerate(buckets)]
+    exit_codes = [process.wait() for process in processes]
+
+    worker_ids = list(range(len(buckets)))
+    merge_logs(output_dir, worker_ids)
+    merge_junit(output_dir, worker_ids)
+    merge_json(output_dir, worker_ids)
+
+    for worker_id, code in enumerate(exit_codes):
+        print(f"worker {worker_id}: {'passed' if code == 0 else 'failed'} (exit {code})")
+    return 0 if all(code == 0 for code in exit_codes) else 1
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, behave_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS,
+                        help="feature files or directories (default: features/revenue)")
+    parser.add_argument("-j", "--workers", type=int, default=int(os.getenv("BDD_WORKERS", "4")),
+                        help="number of worker processes")
+    args = parser.parse_args(argv)
+    return run(args.paths, max(1, args.workers), behave_args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Run-wide cache for the "the following reference entities exist" lookups.
+
+The Background of every revenue/rates scenario checks the same handful
+of reference entities. ``ReferenceCache`` remembers each answer for the
+whole run (or for ``ttl`` seconds) and fetches the misses of a table
+concurrently, so the Background costs one round trip per entity per run
+instead of one per row per scenario. ``api`` is an ``AsyncApi``; hits
+are reported through its ``record_use`` so use listeners (the impact map)
+still see every scenario that depends on the lookup.
+"""
+import threading
+import time
+
+
+class ReferenceCache:
+    def __init__(self, api, ttl=None):
+        self.api = api
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(entity_type, entity_id):
+        return entity_type.lower(), entity_id
+
+    def _fresh(self, entry):
+        return self.ttl is None or time.monotonic() - entry[1] < self.ttl
+
+    def lookup_many(self, entities):
+        """Return ``{(entity_type, id): exists}`` for ``(entity_type, id)`` pairs."""
+        keys = [self.key(entity_type, entity_id) for entity_type, entity_id in entities]
+        results = {}
+        missing = []
+        hits = []
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and self._fresh(entry):
+                    results[key] = entry[0]
+                    hits.append(key)
+                elif key not in missing:
+                    missing.append(key)
+            self.hits += len(hits)
+            self.misses += len(missing)
+
+        # A hit still depends on the endpoint (e.g. for the impact map), it just isn't sent
+        for entity_type, entity_id in hits:
+            self.api.record_use("GET", "parameter_entity", entity=f"{entity_type}s", id=entity_id)
+
+        if missing:
+            responses = self.api.get_many("parameter_entity", [
+                {"entity": f"{entity_type}s", "id": entity_id} for entity_type, entity_id in missing])
+            fetched = {key: response.status_code == 200 for key, response in zip(missing, responses)}
+            now = time.monotonic()
+            with self.lock:
+                for key, exists in fetched.items():
+                    self.entries[key] = (exists, now)
+            results.update(fetched)
+
+        return {(entity_type, entity_id): results[self.key(entity_type, entity_id)]
+                for entity_type, entity_id in entities}
+
+    def invalidate(self, entity_type=None, entity_id=None):
+        """Forget one entity, every entity of a type, or (no arguments) everything."""
+        with self.lock:
+            if entity_type is None:
+                self.entries.clear()
+                return
+            entity_type = entity_type.lower()
+            for key in list(self.entries):
+                if key[0] == entity_type and entity_id in (None, key[1]):
+                    del self.entries[key]
+
+    def summary(self):
+        return f"Reference cache: {self.hits} hits, {self.misses} misses, {len(self.entries)} entries"
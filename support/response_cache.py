@@ -0,0 +1,147 @@
+"""Opt-in cache of GET responses, invalidated by writes (``API_CACHE=1``).
+
+Steps re-read resources that have not changed since the last read:
+revision lookups, parameter entities and listing pages used for
+verification. ``ResponseCache`` sits inside ``ApiClient.request``:
+
+* keys are the contract path template (``support.contract.PathMatcher``),
+  the path parameters, the query parameters and the ``Accept`` header;
+* a cached response with an ``ETag`` is revalidated with
+  ``If-None-Match``, and a ``304`` hands back the cached body;
+* a cached response without an ``ETag`` is served as is for
+  ``API_CACHE_TTL`` seconds (default 30);
+* any other method invalidates every cached GET of the same resource
+  family. ``POST .../parameters/labor``, ``PUT .../labor/delete`` and
+  ``PUT .../labor/{id}`` all drop the cached ``GET
+  /revisions/{revisionId}/revenue_options/parameters/labor`` pages.
+
+Streamed requests (exports) bypass the cache. Hits served without a round
+trip are not reported to the listeners, because no request happened.
+"""
+import copy
+import os
+import threading
+import time
+
+from support.contract import PathMatcher, load_contract, operations
+
+# Trailing path segments that name an action on a resource, not a resource
+ACTIONS = {"delete", "csv", "excel", "find", "search"}
+
+
+def resource_family(template, path_params):
+    """``/revisions/{revisionId}/revenue_options/parameters/{type}/excel`` + type=labor ->
+    ``revisions/revenue_options/parameters/labor``: IDs and actions dropped, names kept."""
+    parts = []
+    for segment in template.strip("/").split("/"):
+        if segment.startswith("{"):
+            name = segment[1:-1]
+            if name.lower().endswith("id"):
+                continue
+            segment = path_params.get(name, segment)
+        parts.append(segment)
+    while len(parts) > 1 and parts[-1] in ACTIONS:
+        parts.pop()
+    return "/".join(parts)
+
+
+class ResponseCache:
+    def __init__(self, templates=(), ttl=30.0):
+        contract_templates = [template for _, template, _ in operations(load_contract())]
+        self.matcher = PathMatcher(contract_templates + list(templates))
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.families = {}
+        # Bumped on every invalidation, so a GET that raced a write is not stored
+        self.generations = {}
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.seconds_saved = 0.0
+
+    @classmethod
+    def from_env(cls, templates=()):
+        return cls(templates, ttl=float(os.getenv("API_CACHE_TTL", "30")))
+
+    def _key(self, path, kwargs):
+        template, path_params = self.matcher.match(path)
+        if template is None:
+            template, path_params = path, {}
+        params = kwargs.get("params") or {}
+        accept = (kwargs.get("headers") or {}).get("accept", "")
+        key = (template, tuple(sorted(path_params.items())),
+               tuple(sorted((str(name), str(value)) for name, value in dict(params).items())), accept)
+        return key, resource_family(template, path_params)
+
+    def fetch(self, method, path, kwargs, send):
+        """Answer ``method path`` from the cache where possible; ``send(kwargs)`` does the real request."""
+        if method != "GET":
+            try:
+                return send(kwargs)
+            finally:
+                self.invalidate(self._key(path, kwargs)[1])
+
+        key, family = self._key(path, kwargs)
+        with self.lock:
+            generation = self.generations.get(family, 0)
+            entry = self.entries.get(key)
+            if entry and not entry["etag"] and time.monotonic() - entry["stored"] < self.ttl:
+                self.hits += 1
+                self.seconds_saved += entry["response"].wall_time
+                return self._copy(entry["response"], 0.0)
+
+        if entry and entry["etag"]:
+            kwargs = dict(kwargs, headers=dict(kwargs.get("headers") or {}, **{"If-None-Match": entry["etag"]}))
+        response = send(kwargs)
+        with self.lock:
+            if entry and entry["etag"] and response.status_code == 304:
+                self.revalidated += 1
+                self.seconds_saved += max(entry["response"].wall_time - response.wall_time, 0.0)
+                return self._copy(entry["response"], response.wall_time)
+            self.misses += 1
+            if response.status_code == 200 and self.generations.get(family, 0) == generation:
+                self.entries[key] = {"response": response, "etag": response.headers.get("ETag"),
+                                     "stored": time.monotonic()}
+                self.families.setdefault(family, set()).add(key)
+        return response
+
+    @staticmethod
+    def _copy(response, wall_time):
+        cached = copy.copy(response)
+        cached.wall_time = wall_time
+        cached.from_cache = True
+        return cached
+
+    def invalidate(self, family=None):
+        """Drop the cached GETs of one resource family, or (no argument) everything."""
+        with self.lock:
+            if family is None:
+                self.invalidated += len(self.entries)
+                self.entries.clear()
+                self.families.clear()
+                self.generations = {name: count + 1 for name, count in self.generations.items()}
+                return
+            self.generations[family] = self.generations.get(family, 0) + 1
+            for key in self.families.pop(family, ()):
+                if self.entries.pop(key, None) is not None:
+                    self.invalidated += 1
+
+    def stats(self):
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+            "invalidated": self.invalidated,
+            "entries": len(self.entries),
+            "seconds_saved": round(self.seconds_saved, 4),
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Response cache: {stats['hits']} hits, {stats['revalidated']} revalidated (304), "
+                f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), {stats['invalidated']} invalidated, "
+                f"~{stats['seconds_saved'] * 1000:.0f} ms saved")
@@ -0,0 +1,111 @@
+"""Step helpers shared by every revenue type.
+
+Labor, material, engineering and miscellaneous revenues go through the
+same ``/revenue_options/parameters/{type}`` endpoints. The labor steps
+and the generic ``"<type>"`` steps in ``features/steps/revenue_steps.py``
+both use these helpers. A helper keeps its results on the context
+(``context.response``, ``context.created_revenue_ids``,
+``context.exported_file``), as the steps did before.
+"""
+import os
+from datetime import datetime
+
+from support.api_client import XLSX_MIME
+from support.bulk import create_many
+from support.exports import download
+from support.factories import DEFAULT_RUBRICS, RevenueFactory, created_by, iso_day
+from support.log_pipeline import payload
+from support.pagination import Paginator
+from support.revision_pool import fingerprint
+
+
+def create_revenue(context, revenue_type, data):
+    """POST one revenue; the result goes to ``context.response`` / ``context.response_status``."""
+    # Add a createdBy field if not present
+    data.setdefault('createdBy', created_by())
+    response = context.api.post("revenue", type=revenue_type, json=data)
+    context.response_status = response.status_code
+    if response.status_code == 201:
+        context.response = response.json()
+        if "id" in context.response:
+            context.revenue_ids.append(context.response["id"])
+            context.logger.info(f"Created {revenue_type} revenue: {context.response['id']}")
+    else:
+        context.response = {"error": response.text, "status_code": response.status_code}
+        context.logger.error("Failed to create %s revenue: %s", revenue_type, payload(response.text))
+    return response
+
+
+def assert_created(context, revenue_type):
+    assert context.response_status == 201, f"Expected status 201, got {context.response_status}"
+    assert "id" in context.response, f"No id for {revenue_type} revenue in response"
+
+
+def bulk_payload(factory, i, timestamp):
+    # Use a different registration date for each entry (today, tomorrow, day after, ...)
+    rubric_type, value, hours = DEFAULT_RUBRICS[factory.revenue_type][0]
+    return factory.build(
+        rubrics=((rubric_type, value + i * 100, hours + i),),
+        registration_date=iso_day(i),
+        # Unique customer code and names so each entry is distinguishable
+        customerCode=f"EXPORT-{i}-{timestamp}",
+        customerName=f"Export Test Customer {i} {timestamp}",
+        aircraftCode=f"AC-EXP-{i}-{timestamp}",
+        serialNumber=f"SN-{timestamp}-{i}",
+        laborHours=10 + i,
+    )
+
+
+def seed_revenues(context, revenue_type, revision_id, count):
+    timestamp = datetime.now().strftime('%H%M%S%f')
+    factory = RevenueFactory(context.reference_entities, revision_id, revenue_type)
+    payloads = [bulk_payload(factory, i, timestamp) for i in range(count)]
+
+    # Created concurrently; keep going on partial failures (we need at least one for export test)
+    result = create_many(context.api, revenue_type, payloads, id_sink=context.revenue_ids)
+    if result.ok:
+        context.logger.info(f"Bulk {revenue_type} revenue creation: {result.summary()}")
+    else:
+        context.logger.warning(f"Bulk {revenue_type} revenue creation: {result.summary()}")
+    return result.created_ids
+
+
+def create_revenues(context, revenue_type, count):
+    """Create ``count`` entries (or check out a pooled revision holding them) into ``context.created_revenue_ids``."""
+    if context.revision_pool:
+        # A copy of a pre-seeded revision instead of creating the entries one by one
+        context.revision_id, entries = context.revision_pool.checkout(
+            f"{revenue_type}:{count}", fingerprint(count, context.reference_entities),
+            lambda revision_id: {revenue_type: seed_revenues(context, revenue_type, revision_id, count)})
+        context.created_revenue_ids = entries[revenue_type]
+        context.logger.info(f"Using pooled revision {context.revision_id} with {count} {revenue_type} revenues")
+    else:
+        context.created_revenue_ids = seed_revenues(context, revenue_type, context.revision_id, count)
+
+    # Check the revision lists every entry we created (all pages, not just the first)
+    found = Paginator(context.api, "revenue_list", revisionId=context.revision_id, type=revenue_type).count()
+    context.logger.info(f"Found {found} {revenue_type} revenue entries")
+    assert found >= len(context.created_revenue_ids) > 0, \
+        f"Expected at least {len(context.created_revenue_ids)} {revenue_type} revenue entries, found {found}"
+
+
+def search(context, revenue_type, search_text):
+    # Every page is walked by the assertions; the next page is prefetched while one is checked
+    context.search_results = Paginator(context.api, "revenue_list", params={"searchText": search_text},
+                                       revisionId=context.revision_id, type=revenue_type)
+    context.search_results.fetch_first()
+    context.logger.info(f"Searched for {revenue_type} revenues with text: {search_text}")
+
+
+def export_excel(context, revenue_type):
+    # Streamed straight to disk (hashed on the way) so large exports never sit in memory
+    context.exported_file = download(context.api, "revenue_excel",
+                                     os.path.join(context.output_dir, f"{revenue_type}_revenues.xlsx"),
+                                     revisionId=context.revision_id, type=revenue_type,
+                                     headers={"accept": XLSX_MIME, "Content-Type": None})
+    if context.exported_file.ok:
+        context.logger.info(f"Exported {revenue_type} revenues to Excel: {context.exported_file.size} bytes, "
+                            f"sha256 {context.exported_file.sha256}")
+    else:
+        context.error = context.exported_file.error
+        context.logger.error(f"Failed to export to Excel: {context.exported_file.error}")
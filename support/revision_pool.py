@@ -0,0 +1,196 @@
+"""Pool of pre-seeded revisions handed out as clones.
+
+Seeding fixtures through the API dominates suite setup. With
+``REVISION_POOL=1`` the multi-entity fixture steps ask the pool for a
+revision that already contains their fixtures instead of creating them
+one by one:
+
+* one "golden" revision per fixture set is seeded once, then remembered
+  across runs in ``test_output/revision_pool.json`` (``REVISION_POOL_FILE``);
+* scenarios get a copy made with ``POST /revisions`` and
+  ``fromRevision=<golden>``, which the backend clones;
+* a copy that has been handed out is dirty and never handed out again;
+* ``REVISION_POOL_SPARES`` clean copies per golden are refilled on a
+  background thread and carried over to the next run (and to the other
+  parallel workers, which share the pool file).
+
+Goldens and spares are kept out of the cleanup journal. The entries of a
+handed-out copy are journaled, so ``after_all`` deletes them as usual.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from support.cleanup import REVISION
+from support.factories import revision_payload
+from support.pagination import Paginator
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers sharing a pool file are not serialised
+    fcntl = None
+
+POOL_PATH = os.path.join("test_output", "revision_pool.json")
+
+
+def fingerprint(*parts):
+    """Short hash of whatever determines a golden's contents; a change re-seeds it."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class RevisionPool:
+    def __init__(self, api, journal, path=POOL_PATH, spares=2, logger=None):
+        self.api = api
+        self.journal = journal
+        self.path = path
+        self.spares = spares
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.handed_out = []
+        self.seeded = 0
+        self.cloned = 0
+        self.spares_used = 0
+        self.refill = ThreadPoolExecutor(max_workers=1, thread_name_prefix="revision-pool")
+        self.refilling = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @classmethod
+    def from_env(cls, api, journal, logger=None):
+        return cls(api, journal, os.getenv("REVISION_POOL_FILE", POOL_PATH),
+                   int(os.getenv("REVISION_POOL_SPARES", "2")), logger)
+
+    @contextlib.contextmanager
+    def _state(self):
+        """The pool file, read and written back under an exclusive lock shared with other workers."""
+        with self.lock, open(self.path, "a+", encoding="utf-8") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            state.setdefault("goldens", {})
+            yield state
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f, indent=2)
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _exists(self, revision_id):
+        return self.api.get("revision", revisionId=revision_id).status_code == 200
+
+    def _create(self, name, from_revision=None):
+        response = self.api.post("revisions", json=revision_payload(name, from_revision))
+        assert response.status_code in (200, 201), \
+            f"Revision pool could not create {name!r}: {response.status_code} {response.text[:200]}"
+        return response.json()["revisionId"]
+
+    def _golden(self, key, version, seed):
+        with self._state() as state:
+            entry = state["goldens"].get(key)
+        if entry and entry["fingerprint"] == version and self._exists(entry["revisionId"]):
+            return entry
+
+        # Missing, stale or gone: seed a new golden; copies of the old one go to cleanup
+        revision_id = self._create(f"Golden {key}")
+        created = seed(revision_id)
+        self.journal.keep(REVISION, [revision_id])
+        for kind, ids in created.items():
+            self.journal.keep(kind, ids)
+        entry = {"revisionId": revision_id, "fingerprint": version, "kinds": sorted(created), "spares": []}
+        with self._state() as state:
+            old = state["goldens"].get(key)
+            state["goldens"][key] = entry
+        if old:
+            # The replaced golden (possibly seeded concurrently by another worker) and its spares
+            self.journal.record_many(REVISION, [old["revisionId"]] + old.get("spares", []))
+        self.seeded += 1
+        if self.logger:
+            self.logger.info(f"Revision pool: seeded golden {key} as {revision_id}")
+        return entry
+
+    def _clone(self, key, golden):
+        revision_id = self._create(f"Pool {key}", from_revision=golden["revisionId"])
+        with self.lock:
+            self.cloned += 1
+        return revision_id
+
+    def _take_spare(self, key, golden):
+        while True:
+            with self._state() as state:
+                entry = state["goldens"].get(key)
+                if not entry or entry["revisionId"] != golden["revisionId"] or not entry["spares"]:
+                    return None
+                revision_id = entry["spares"].pop(0)
+            if self._exists(revision_id):
+                return revision_id
+
+    def _refill(self, key, golden):
+        try:
+            while True:
+                with self._state() as state:
+                    entry = state["goldens"].get(key)
+                    if not entry or entry["revisionId"] != golden["revisionId"] or len(entry["spares"]) >= self.spares:
+                        return
+                revision_id = self._clone(key, golden)
+                self.journal.keep(REVISION, [revision_id])
+                with self._state() as state:
+                    entry = state["goldens"].get(key)
+                    if entry and entry["revisionId"] == golden["revisionId"]:
+                        entry["spares"].append(revision_id)
+                        continue
+                self.journal.record(REVISION, revision_id)
+                return
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"Revision pool: refilling {key} failed: {e}")
+        finally:
+            with self.lock:
+                self.refilling.discard(key)
+
+    def checkout(self, key, version, seed):
+        """Return ``(revision_id, {kind: [ids]})`` for a fresh copy of the ``key`` golden.
+
+        ``seed(revision_id)`` creates the fixtures in a new golden and returns
+        ``{kind: [ids]}``; it only runs when the golden is missing or its
+        ``version`` fingerprint changed.
+        """
+        with self._key_lock(key):
+            golden = self._golden(key, version, seed)
+            revision_id = self._take_spare(key, golden)
+            if revision_id:
+                self.spares_used += 1
+            else:
+                revision_id = self._clone(key, golden)
+        self.handed_out.append(revision_id)
+        self.journal.record(REVISION, revision_id)
+
+        with self.lock:
+            start_refill = self.spares > 0 and key not in self.refilling
+            if start_refill:
+                self.refilling.add(key)
+        if start_refill:
+            self.refill.submit(self._refill, key, golden)
+
+        # What the clone contains (new IDs); journaled so the copy's entries are cleaned up
+        entries = {}
+        for kind in golden["kinds"]:
+            entries[kind] = [item["id"] for item in
+                             Paginator(self.api, "revenue_list", revisionId=revision_id, type=kind)]
+            self.journal.record_many(kind, entries[kind])
+        return revision_id, entries
+
+    def close(self):
+        self.refill.shutdown(wait=True)
+
+    def summary(self):
+        return (f"Revision pool: {len(self.handed_out)} copies handed out "
+                f"({self.spares_used} from spares), {self.cloned} clones made, {self.seeded} goldens seeded")
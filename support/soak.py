@@ -0,0 +1,495 @@
+"""Soak test: loop a mix of scenarios for hours and track drift.
+
+Usage (from the repository root)::
+
+    python -m support.soak --duration 4h --users 4
+    python -m support.soak --duration 2h --tag soak --tag rates_test --weight search=3
+    API_STUB=1 python -m support.soak --duration 60s --sample-interval 2 --drain-interval 10
+
+The mix is every scenario under the given paths (default ``features/``)
+that carries all the ``--tag`` tags. The default tag is ``@soak``.
+``--weight TAG=N`` makes scenarios with that tag N times as likely to be
+picked. As in ``support.load``, virtual users run each iteration through
+the step definitions, with ``environment.py``'s hooks around it. Revisions
+cannot be deleted, so each user creates one revision at the start and
+runs all its iterations in it. Scenarios tagged ``@soak`` are the ones
+that still pass when earlier iterations' data is in the revision.
+
+Every ``--drain-interval`` seconds the users are held between iterations.
+The cleanup journal is drained, which deletes the revenues and rates
+created so far, and the ``revenue_ids``/``rate_ids`` lists are emptied. The
+rows still listed in the users' revisions are then counted, so the dataset
+stays bounded and deletes that do not delete show up.
+
+Every ``--sample-interval`` seconds a sample records:
+
+* client: RSS, open file descriptors and sockets (from ``/proc``), threads;
+* per endpoint: request count, errors and p50/p95 latency in the window;
+* server: each ``--server-metric NAME=URL`` value (e.g. a Spring actuator
+  metric) fetched with the run's credentials.
+
+Samples are appended to ``test_output/soak_timeseries.csv`` (``t, metric,
+value``) as they are taken, so a killed run still leaves its history.
+``test_output/soak_report.json`` is rewritten after every drain and at the
+end. It holds the samples, the drains and the drift checks. Each check
+compares the first and last quarter of a series after ``--warmup``.
+Latency growing by more than ``--latency-drift``, a resource by more than
+``--resource-growth``, or residual rows growing at all is flagged, and the
+command exits non-zero.
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+from behave.parser import parse_file
+from behave.runner_util import exec_file, load_step_modules
+
+from support.cleanup import drain
+from support.factories import REVENUE_TYPES
+from support.load import FEATURES_DIR, VirtualUserContext, run_step
+from support.pagination import page_info
+from support.stats import latency_summary
+
+REPORT_PATH = os.path.join("test_output", "soak_report.json")
+TIMESERIES_PATH = os.path.join("test_output", "soak_timeseries.csv")
+SOAK_TAG = "soak"
+# Families drained by the journal and counted afterwards
+RESIDUAL_TYPES = REVENUE_TYPES + ("rates",)
+# Smallest growth worth flagging per client resource, on top of the relative threshold
+MIN_GROWTH = {"rss_mb": 10.0, "fds": 5, "sockets": 5, "threads": 2}
+MIN_LATENCY_GROWTH_MS = 5.0
+
+
+def parse_duration(text):
+    """``90``, ``90s``, ``30m``, ``4h`` -> seconds."""
+    found = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*", text)
+    if not found:
+        raise argparse.ArgumentTypeError(f"not a duration: {text!r} (e.g. 90s, 30m, 4h)")
+    return float(found.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[found.group(2)]
+
+
+def client_resources():
+    """RSS in MB, open file descriptors and sockets, and threads of this process (``None`` where unknown)."""
+    sample = {"rss_mb": None, "fds": None, "sockets": None, "threads": threading.active_count()}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    sample["rss_mb"] = round(int(line.split()[1]) / 1024, 2)
+                    break
+        names = os.listdir("/proc/self/fd")
+    except OSError:  # no /proc (macOS, Windows)
+        return sample
+    sockets = 0
+    for name in names:
+        try:
+            sockets += os.readlink(f"/proc/self/fd/{name}").startswith("socket:")
+        except OSError:  # closed since listdir
+            continue
+    sample["fds"] = len(names)
+    sample["sockets"] = sockets
+    return sample
+
+
+def metric_value(body):
+    """A number from a metrics endpoint: a bare number, ``{"value": n}`` or actuator ``measurements``."""
+    if isinstance(body, (int, float)):
+        return body
+    if isinstance(body, dict):
+        if isinstance(body.get("value"), (int, float)):
+            return body["value"]
+        measurements = body.get("measurements") or []
+        if measurements and isinstance(measurements[0].get("value"), (int, float)):
+            return measurements[0]["value"]
+    return None
+
+
+def growth(values, relative, absolute=0.0):
+    """Compare the first and last quarter of ``values``; ``None`` with fewer than 8 values."""
+    values = [value for value in values if value is not None]
+    if len(values) < 8:
+        return None
+    quarter = len(values) // 4
+    first, last = statistics.fmean(values[:quarter]), statistics.fmean(values[-quarter:])
+    change = last - first
+    ratio = change / first if first else (float("inf") if change > 0 else 0.0)
+    return {"first": round(first, 3), "last": round(last, 3), "change": round(change, 3),
+            "ratio": round(ratio, 3) if ratio != float("inf") else None,
+            "flagged": change > absolute and ratio > relative}
+
+
+class WindowRecorder:
+    """ApiClient listener keeping latencies per endpoint template until the next ``take()``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def __call__(self, method, template, response):
+        key = f"{method} {template}"
+        with self.lock:
+            entry = self.samples.setdefault(key, {"latencies": [], "errors": 0})
+            entry["latencies"].append(getattr(response, "wall_time", response.elapsed.total_seconds()))
+            if response.status_code >= 400:
+                entry["errors"] += 1
+
+    def take(self):
+        with self.lock:
+            samples, self.samples = self.samples, {}
+        window = {}
+        for key, entry in sorted(samples.items()):
+            summary = latency_summary(entry["latencies"])
+            window[key] = {"count": summary["count"], "errors": entry["errors"],
+                           "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"]}
+        return window
+
+
+class Gate:
+    """Iterations run side by side; ``exclusive()`` waits for them to finish and holds new ones back."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+        self.closed = False
+
+    @contextmanager
+    def iteration(self):
+        with self.condition:
+            while self.closed:
+                self.condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self.condition:
+            self.closed = True
+            while self.active:
+                self.condition.wait()
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.closed = False
+                self.condition.notify_all()
+
+
+def collect_mix(paths, tags, weights):
+    """``[(scenario, background steps, weight)]`` for every scenario carrying all ``tags``."""
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "**", "*.feature"), recursive=True))
+                     if os.path.isdir(path) else [path])
+    mix = []
+    for filename in files:
+        feature = parse_file(filename)
+        background = list(feature.background.steps) if feature.background else []
+        for scenario in feature.walk_scenarios():
+            scenario_tags = set(feature.tags) | set(scenario.tags)
+            if set(tags) <= scenario_tags:
+                weight = 1
+                for tag, factor in weights.items():
+                    if tag in scenario_tags:
+                        weight *= factor
+                mix.append((scenario, background, weight))
+    return mix
+
+
+class SoakRun:
+    def __init__(self, mix, users, duration, sample_interval=30.0, drain_interval=300.0, warmup=0.1,
+                 latency_drift=0.25, resource_growth=0.2, server_metrics=None, output=REPORT_PATH,
+                 timeseries=TIMESERIES_PATH):
+        self.mix = mix
+        self.users = users
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.drain_interval = drain_interval
+        self.warmup = warmup
+        self.latency_drift = latency_drift
+        self.resource_growth = resource_growth
+        self.server_metrics = server_metrics or {}
+        self.output = output
+        self.timeseries = timeseries
+        self.lock = threading.Lock()
+        self.gate = Gate()
+        self.recorder = WindowRecorder()
+        self.counts = {"iterations": 0, "passed": 0, "failed": 0}
+        self.failures = {}
+        self.samples = []
+        self.drains = []
+        self.lanes = []
+        self.started = None
+        self.stopping = threading.Event()
+
+    def _elapsed(self):
+        return round(time.monotonic() - self.started, 3)
+
+    def _virtual_user(self, root, hooks, seed):
+        rng = random.Random(seed)
+        # The user's own revision; its iterations find it there and before_scenario creates no other
+        lane = VirtualUserContext(root)
+        hooks["create_test_revision"](lane, f"Soak user {seed}")
+        # Export steps write fixed file names; users must not overwrite each other's downloads
+        lane.output_dir = os.path.join(root.output_dir, "soak", f"user-{seed}")
+        os.makedirs(lane.output_dir, exist_ok=True)
+        with self.lock:
+            self.lanes.append(lane)
+        scenarios = [entry[:2] for entry in self.mix]
+        weights = [entry[2] for entry in self.mix]
+        while not self.stopping.is_set():
+            scenario, background = rng.choices(scenarios, weights)[0]
+            with self.gate.iteration():
+                if self.stopping.is_set():
+                    return
+                context = VirtualUserContext(lane)
+                error = None
+                try:
+                    if "before_scenario" in hooks:
+                        hooks["before_scenario"](context, scenario)
+                    for step in background + list(scenario.steps):
+                        run_step(context, step)
+                except Exception as e:
+                    error = f"{scenario.name}: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                finally:
+                    if "after_scenario" in hooks:
+                        hooks["after_scenario"](context, scenario)
+            with self.lock:
+                self.counts["iterations"] += 1
+                self.counts["failed" if error else "passed"] += 1
+                if error:
+                    self.failures[error] = self.failures.get(error, 0) + 1
+
+    def _residual(self, root):
+        """Rows still listed in the users' revisions, per family."""
+        residual = {family: 0 for family in RESIDUAL_TYPES}
+        for lane in list(self.lanes):
+            for family in RESIDUAL_TYPES:
+                response = root.api.get("revenue_list", params={"page": 0, "pageSize": 1},
+                                        revisionId=lane.revision_id, type=family)
+                if response.status_code == 200 and residual[family] is not None:
+                    residual[family] += page_info(response.json()).get("totalItems", 0)
+                else:
+                    residual[family] = None
+        return residual
+
+    def _drain(self, root):
+        with self.gate.exclusive():
+            started = time.perf_counter()
+            results = drain(root.api, root.cleanup_journal, run_id=root.cleanup_journal.run_id)
+            root.cleanup_journal.compact()
+            # Everything created so far is gone; the run-wide lists would otherwise grow for hours
+            del root.revenue_ids[:]
+            del root.rate_ids[:]
+            entry = {
+                "t": self._elapsed(),
+                "seconds": round(time.perf_counter() - started, 3),
+                "deleted": {kind: result["deleted"] for kind, result in results.items() if "deleted" in result},
+                "failed": {kind: result["failed"] for kind, result in results.items() if result.get("failed")},
+                "residual": self._residual(root),
+            }
+        self.drains.append(entry)
+        return entry
+
+    def _server(self, root):
+        values = {}
+        for name, url in self.server_metrics.items():
+            try:
+                response = root.api.session.get(url, timeout=root.api.timeout)
+                values[name] = metric_value(response.json()) if response.status_code == 200 else None
+            except (ValueError, OSError):
+                values[name] = None
+        return values
+
+    def _sample(self, root, writer):
+        with self.lock:
+            counts = dict(self.counts)
+        sample = {"t": self._elapsed(), **counts, "client": client_resources(), "server": self._server(root),
+                  "endpoints": self.recorder.take()}
+        self.samples.append(sample)
+        rows = [(name, counts[name]) for name in ("iterations", "failed")]
+        rows += [(f"client.{name}", value) for name, value in sample["client"].items()]
+        rows += [(f"server.{name}", value) for name, value in sample["server"].items()]
+        for key, window in sample["endpoints"].items():
+            rows += [(f"{stat} {key}", window[stat]) for stat in ("count", "errors", "p50_ms", "p95_ms")]
+        writer.writerows((sample["t"], metric, value) for metric, value in rows if value is not None)
+        return sample
+
+    def checks(self):
+        """Drift and growth checks over the samples after the warm-up."""
+        samples = [s for s in self.samples if s["t"] >= self.duration * self.warmup]
+        results = []
+
+        def check(series, values, relative, absolute=0.0):
+            result = growth(values, relative, absolute)
+            if result is not None:
+                results.append({"series": series, **result})
+
+        for name, minimum in MIN_GROWTH.items():
+            check(f"client.{name}", [s["client"][name] for s in samples], self.resource_growth, minimum)
+        for name in self.server_metrics:
+            check(f"server.{name}", [s["server"].get(name) for s in samples], self.resource_growth)
+        for key in sorted({key for s in samples for key in s["endpoints"]}):
+            for stat in ("p50_ms", "p95_ms"):
+                check(f"{stat} {key}", [s["endpoints"][key][stat] if key in s["endpoints"] else None
+                                        for s in samples], self.latency_drift, MIN_LATENCY_GROWTH_MS)
+        drains = [d for d in self.drains if d["t"] >= self.duration * self.warmup]
+        for family in RESIDUAL_TYPES:
+            check(f"residual.{family}", [d["residual"].get(family) for d in drains], 0.0)
+        return results
+
+    def report(self, elapsed=None):
+        checks = self.checks()
+        return {
+            "mix": [{"scenario": scenario.name, "feature": scenario.filename, "weight": weight}
+                    for scenario, _, weight in self.mix],
+            "users": self.users,
+            "duration": self.duration,
+            "seconds": round(elapsed if elapsed is not None else self._elapsed(), 3),
+            **self.counts,
+            "failures": self.failures,
+            "drains": self.drains,
+            "checks": checks,
+            "flagged": [check["series"] for check in checks if check["flagged"]],
+            "samples": self.samples,
+        }
+
+    def _checkpoint(self):
+        os.makedirs(os.path.dirname(self.output) or ".", exist_ok=True)
+        with open(self.output, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def run(self, verbose=False):
+        # Nothing may accumulate per request over hours: no per-request log records or contract checks
+        os.environ.setdefault("API_POOL_SIZE", str(max(self.users, 10)))
+        os.environ.setdefault("CONTRACT_VALIDATION", "off")
+        os.environ.setdefault("LOG_REQUESTS", "0")
+        # No before_step here, so every request would count as shared set-up in the impact map
+        os.environ["IMPACT_MAP"] = "off"
+        hooks = {}
+        exec_file(os.path.join(FEATURES_DIR, "environment.py"), hooks)
+        load_step_modules([os.path.join(FEATURES_DIR, "steps")])
+
+        root = types.SimpleNamespace()
+        hooks["before_all"](root)
+        if not verbose:
+            root.logger.setLevel(logging.WARNING)
+        # RequestMetrics keeps every request in memory; the windowed recorder replaces it
+        root.api.listeners.remove(root.request_metrics)
+        root.api.add_listener(self.recorder)
+
+        os.makedirs(os.path.dirname(self.timeseries) or ".", exist_ok=True)
+        self.started = time.monotonic()
+        deadline = self.started + self.duration
+        next_sample = self.started + self.sample_interval
+        next_drain = self.started + self.drain_interval
+        threads = [threading.Thread(target=self._virtual_user, args=(root, hooks, index), name=f"soak-{index}")
+                   for index in range(self.users)]
+        try:
+            with open(self.timeseries, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(("t", "metric", "value"))
+                self._sample(root, writer)
+                for thread in threads:
+                    thread.start()
+                while True:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        break
+                    time.sleep(max(min(next_sample, next_drain, deadline) - now, 0))
+                    now = time.monotonic()
+                    if now >= next_drain:
+                        drained = self._drain(root)
+                        root.logger.warning(f"Soak drain at {drained['t']}s: deleted {drained['deleted']}, "
+                                            f"residual {drained['residual']}")
+                        next_drain += self.drain_interval
+                        self._checkpoint()
+                    if now >= next_sample:
+                        self._sample(root, writer)
+                        f.flush()
+                        next_sample += self.sample_interval
+                self.stopping.set()
+                for thread in threads:
+                    thread.join()
+                self._drain(root)
+                self._sample(root, writer)
+        finally:
+            self.stopping.set()
+            elapsed = self._elapsed()
+            root.api.listeners.remove(self.recorder)
+            hooks["after_all"](root)
+        report = self.report(elapsed)
+        self._checkpoint()
+        return report
+
+
+def print_report(report):
+    print(f"Soak: {report['iterations']} iterations ({report['failed']} failed) by {report['users']} users "
+          f"in {report['seconds']}s, {len(report['samples'])} samples, {len(report['drains'])} drains")
+    for reason, count in sorted(report["failures"].items(), key=lambda item: -item[1])[:10]:
+        print(f"  {count} x {reason}")
+    print(f"{'series':<90} {'first':>10} {'last':>10} {'change':>8}")
+    for check in report["checks"]:
+        ratio = f"{check['ratio']:+.0%}" if check["ratio"] is not None else "new"
+        print(f"{check['series']:<90} {check['first']:>10} {check['last']:>10} {ratio:>8}"
+              f"{'  DRIFT' if check['flagged'] else ''}")
+    if report["flagged"]:
+        print(f"{len(report['flagged'])} series drifted: {', '.join(report['flagged'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loop a scenario mix for hours and track latency/resource drift")
+    parser.add_argument("paths", nargs="*", default=[FEATURES_DIR], help="feature files or directories")
+    parser.add_argument("--tag", action="append", help=f"scenarios must carry this tag (repeatable; default @{SOAK_TAG})")
+    parser.add_argument("--weight", action="append", default=[], metavar="TAG=N",
+                        help="scenarios with TAG are N times as likely to run (repeatable)")
+    parser.add_argument("--duration", type=parse_duration, required=True, help="e.g. 90s, 30m, 4h")
+    parser.add_argument("--users", type=int, default=4, help="concurrent virtual users")
+    parser.add_argument("--sample-interval", type=parse_duration, default=30.0)
+    parser.add_argument("--drain-interval", type=parse_duration, default=300.0,
+                        help="delete everything created so far this often")
+    parser.add_argument("--warmup", type=float, default=0.1, help="share of the run left out of the drift checks")
+    parser.add_argument("--latency-drift", type=float, default=0.25,
+                        help="flag endpoints whose p50/p95 grew by more than this (0.25 = 25%%)")
+    parser.add_argument("--resource-growth", type=float, default=0.2,
+                        help="flag client/server resources that grew by more than this")
+    parser.add_argument("--server-metric", action="append", default=[], metavar="NAME=URL",
+                        help="numeric server metric to sample, e.g. heap=https://host/actuator/metrics/jvm.memory.used")
+    parser.add_argument("--output", default=REPORT_PATH, help="where to write the JSON report")
+    parser.add_argument("--timeseries", default=TIMESERIES_PATH, help="where to append the samples (CSV)")
+    parser.add_argument("--verbose", action="store_true", help="keep INFO logging from the steps")
+    args = parser.parse_args(argv)
+
+    try:
+        weights = {tag.lstrip("@"): float(factor) for tag, factor in (item.split("=", 1) for item in args.weight)}
+        server_metrics = dict(item.split("=", 1) for item in args.server_metric)
+    except ValueError:
+        parser.error("--weight takes TAG=N and --server-metric takes NAME=URL")
+    mix = collect_mix(args.paths, [tag.lstrip("@") for tag in args.tag or [SOAK_TAG]], weights)
+    if not mix:
+        parser.error("no scenario matches the given paths and tags")
+    run = SoakRun(mix, args.users, args.duration, args.sample_interval, args.drain_interval, args.warmup,
+                  args.latency_drift, args.resource_growth, server_metrics, args.output, args.timeseries)
+    report = run.run(args.verbose)
+    print_report(report)
+    print(f"Report written to {args.output}, samples to {args.timeseries}")
+    return 1 if report["flagged"] or not report["passed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
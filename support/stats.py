@@ -0,0 +1,25 @@
+"""Small statistics helpers shared by the reports."""
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values):
+    """Count, mean and p50/p95/p99/max of a list of latencies in seconds, in ms."""
+    ordered = sorted(values)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if count else 0.0,
+    }
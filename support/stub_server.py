@@ -0,0 +1,664 @@
+"""Local stand-in for the "Modular Monolith API", built from contracts.json.
+
+Every operation in the contract is routable. Revisions, revenues (labor,
+material, engineering, miscellaneous and rates) and the parameter/revision
+collections (customers, lines, holidays, heat-maps, ...) are kept in
+in-memory stores so create/search/delete/export behave like the backend;
+anything else answers with a response synthesised from its contract schema.
+
+Run the features against it without a backend::
+
+    API_STUB=1 behave
+
+or serve it on the default ``API_BASE_URL`` port for manual use::
+
+    python -m support.stub_server --port 8085
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import re
+import threading
+import uuid
+import zipfile
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from xml.sax.saxutils import escape
+
+from support.contract import PathMatcher, load_contract, operations, server_base_path
+
+REVENUE_TYPES = ("labor", "material", "engineering", "miscellaneous", "rates")
+RATE_REQUIRED = ("revisionId", "level", "year", "customerId", "comments")
+RATE_KEY = ("revisionId", "level", "year", "customerId", "fleetTypeId", "checkTypeId")
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Reference data matching prepolutaion_data.sql
+REFERENCE_ENTITIES = {
+    "opco": [{"id": "11111111-1111-1111-1111-111111111111", "name": "Test OpCo", "status": "ACTIVE"}],
+    "customer": [{"id": "22222222-2222-2222-2222-222222222222", "name": "Test Customer",
+                  "code": "TEST-CUSTOMER", "colorHex": "#FF5733", "status": "ACTIVE"}],
+    "aircraft": [{"id": "33333333-3333-3333-3333-333333333333", "tailNumber": "TEST-REG",
+                  "shipNumber": "SHIP001", "fleetTypeId": "77777777-7777-7777-7777-777777777777",
+                  "status": "ACTIVE"}],
+    "checktype": [{"id": "44444444-4444-4444-4444-444444444444", "name": "TEST-CHECK",
+                   "additionalInformation": "Test Check Type", "status": "ACTIVE"}],
+    "line": [{"id": "55555555-5555-5555-5555-555555555555", "code": "TEST-LINE", "name": "Test Line",
+              "hangarId": "88888888-8888-8888-8888-888888888888", "status": "ACTIVE"}],
+    "fleettype": [{"id": "77777777-7777-7777-7777-777777777777", "name": "Test Fleet Type",
+                   "familyFleetId": "AAAAAAAA-AAAA-AAAA-AAAA-AAAAAAAAAAAA", "status": "ACTIVE"}],
+    "familyfleet": [{"id": "AAAAAAAA-AAAA-AAAA-AAAA-AAAAAAAAAAAA", "name": "Test Family Fleet",
+                     "aircraftManufacturer": "Boeing", "bodyType": "NARROW BODY", "status": "ACTIVE"}],
+    "hangar": [{"id": "88888888-8888-8888-8888-888888888888", "code": "TEST-HANGAR",
+                "name": "Test Hangar", "status": "ACTIVE"}],
+}
+
+# Routes the step modules use that the contract does not (yet) document
+EXTRA_ROUTES = [
+    ("PUT", "/revisions/revenue_options/parameters/{type}/{id}"),
+    ("GET", "/revisions/{revisionId}/revenue_options/parameters/{type}/{id}"),
+    ("GET", "/parameters/{entity}/{id}"),
+]
+
+_COLLECTION = r"(?:/revisions(?:/\{revisionId\})?|/parameters)/(?P<family>[a-z-]+)"
+_ROUTE_KINDS = [
+    (re.compile(_COLLECTION + r"$"), {"GET": "list", "POST": "create"}),
+    (re.compile(_COLLECTION + r"/(?P<format>excel|csv)$"), {"GET": "export"}),
+    (re.compile(_COLLECTION + r"/delete$"), {"PUT": "delete", "POST": "delete"}),
+    (re.compile(_COLLECTION + r"/\{id\}$"), {"GET": "read", "PUT": "update"}),
+]
+_UNSEARCHABLE = re.compile(r"(?:[iI]d|At|By|Date|date|In|Out)$")
+
+
+def family_key(name):
+    """Normalise a path segment to a store key: ``check-types`` -> ``checktype``."""
+    return re.sub(r"[^a-z]", "", name.lower()).rstrip("s")
+
+
+def now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def error(status, message, code="VALIDATION_ERROR"):
+    return status, {"error": code, "message": message, "statusCode": status}
+
+
+class BadRequest(Exception):
+    """Raised by a handler for invalid input; ``handle`` turns it into a 400."""
+
+
+def int_param(query, name, default):
+    value = query.get(name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"Query parameter {name} must be an integer, got {value!r}") from None
+
+
+def matches_search(item, text):
+    needle = text.lower()
+    for key, value in item.items():
+        if _UNSEARCHABLE.search(key) or isinstance(value, (dict, list, bool)) or value is None:
+            continue
+        if isinstance(value, str):
+            if needle in value.lower():
+                return True
+        elif str(value) == text:
+            return True
+    return False
+
+
+def paginate(items, query):
+    page = max(int_param(query, "page", 0), 0)
+    page_size = max(int_param(query, "pageSize", 10), 1)
+    total = len(items)
+    total_pages = (total + page_size - 1) // page_size
+    chunk = items[page * page_size:(page + 1) * page_size]
+    pagination = {"returnedItems": len(chunk), "totalItems": total, "pageSize": page_size,
+                  "pageIndex": page, "totalPages": total_pages}
+    if page + 1 < total_pages:
+        pagination["nextPage"] = page + 1
+    if page > 0:
+        pagination["previousPage"] = page - 1
+    return {"items": chunk, "pagination": pagination}
+
+
+def export_columns(items):
+    columns = ["id"] if any("id" in item for item in items) else []
+    for item in items:
+        for key in item:
+            if key not in columns:
+                columns.append(key)
+    return columns
+
+
+def _cell_text(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return "" if value is None else str(value)
+
+
+def render_csv(items):
+    columns = export_columns(items)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for item in items:
+        writer.writerow([_cell_text(item.get(column)) for column in columns])
+    return out.getvalue().encode("utf-8")
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'),
+}
+
+
+def render_xlsx(items):
+    """Build a single-sheet workbook using inline strings."""
+    columns = export_columns(items)
+    rows = [columns] + [[_cell_text(item.get(column)) for column in columns] for item in items]
+    sheet = io.StringIO()
+    sheet.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    for number, row in enumerate(rows, start=1):
+        sheet.write(f'<row r="{number}">')
+        for value in row:
+            sheet.write(f'<c t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+        sheet.write("</row>")
+    sheet.write("</sheetData></worksheet>")
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr("xl/worksheets/sheet1.xml", sheet.getvalue())
+    return out.getvalue()
+
+
+class StubApi:
+    """Request dispatcher and in-memory state, independent of any socket."""
+
+    def __init__(self, contract=None):
+        self.contract = contract or load_contract()
+        self.schemas = self.contract.get("components", {}).get("schemas", {})
+        self.base_path = server_base_path(self.contract)
+        self.lock = threading.RLock()
+        self.revisions = {}
+        self.revenues = {revenue_type: {} for revenue_type in REVENUE_TYPES}
+        self.collections = {key: {item["id"]: dict(item) for item in items}
+                            for key, items in REFERENCE_ENTITIES.items()}
+        self.revision_required = self.schemas.get("CreateRevisionRequest", {}).get("required", [])
+        self.revenue_required = self.schemas.get("CreateAdHocRevenueRequest", {}).get("required", [])
+
+        self.routes = {}
+        for method, template, operation in operations(self.contract):
+            self.routes[(method, template)] = self._route(method, template, operation)
+        for method, template in EXTRA_ROUTES:
+            self.routes[(method, template)] = self._route(method, template, {})
+        # One matcher per method, so a GET is never shadowed by a PUT-only template
+        self.matchers = {}
+        for method, template in self.routes:
+            self.matchers.setdefault(method, []).append(template)
+        self.matchers = {method: PathMatcher(templates) for method, templates in self.matchers.items()}
+        self.any_matcher = PathMatcher(template for _, template in self.routes)
+
+    # -- routing -----------------------------------------------------------
+
+    def _route(self, method, template, operation):
+        revenue = "/revenue_options/parameters/{type}"
+        if revenue in template:
+            suffix = template.split(revenue, 1)[1]
+            scoped = template.startswith("/revisions/{revisionId}")
+            handlers = {
+                ("POST", False, ""): self.create_revenue,
+                ("PUT", False, "/delete"): self.delete_revenues,
+                ("PUT", False, "/{id}"): self.update_revenue,
+                ("GET", True, ""): self.list_revenues,
+                ("GET", True, "/{id}"): self.read_revenue,
+                ("GET", True, "/excel"): lambda p, q, b: self.export_revenues(p, q, "excel"),
+                ("GET", True, "/csv"): lambda p, q, b: self.export_revenues(p, q, "csv"),
+            }
+            handler = handlers.get((method, scoped, suffix))
+            if handler:
+                return handler
+        if template == "/revisions":
+            return self.create_revision if method == "POST" else self.list_revisions
+        if template == "/revisions/search":
+            return self.search_revisions
+        if template == "/revisions/{revisionId}":
+            return self.read_revision
+        if template == "/parameters/{entity}/{id}":
+            return lambda p, q, b: self.read_item(family_key(p["entity"]), p["id"])
+
+        for pattern, kinds in _ROUTE_KINDS:
+            found = pattern.match(template)
+            if found and method in kinds:
+                return self._collection_handler(kinds[method], family_key(found.group("family")),
+                                                found.groupdict().get("format"))
+        return lambda p, q, b: self.synthesise(operation)
+
+    def _collection_handler(self, kind, family, export_format):
+        if kind == "list":
+            return lambda p, q, b: self.list_items(family, p, q)
+        if kind == "create":
+            return lambda p, q, b: self.create_item(family, b)
+        if kind == "export":
+            return lambda p, q, b: self.export_items(family, p, export_format)
+        if kind == "delete":
+            return lambda p, q, b: self.delete_items(family, b)
+        if kind == "read":
+            return lambda p, q, b: self.read_item(family, p["id"])
+        return lambda p, q, b: self.update_item(family, p["id"], b)
+
+    def handle(self, method, raw_path, body=b""):
+        """Serve one request; returns ``(status, headers, payload_bytes)``."""
+        parts = urlsplit(raw_path)
+        path = parts.path
+        if not path.startswith(self.base_path):
+            return self._encode(*error(404, f"No route for {path}", "NOT_FOUND"))
+        relative = path[len(self.base_path):]
+        matcher = self.matchers.get(method)
+        template, params = matcher.match(relative) if matcher else (None, {})
+        if template is None:
+            status = 405 if self.any_matcher.match(relative)[0] else 404
+            return self._encode(*error(status, f"No route for {method} {path}", "NOT_FOUND"))
+        handler = self.routes[(method, template)]
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            return self._encode(*error(400, "Malformed JSON body"))
+        try:
+            return self._encode(*handler(params, dict(parse_qsl(parts.query)), payload))
+        except BadRequest as e:
+            return self._encode(*error(400, str(e)))
+
+    @staticmethod
+    def _encode(status, body, content_type="application/json", headers=None):
+        headers = dict(headers or {})
+        headers["Content-Type"] = content_type
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        return status, headers, body
+
+    # -- revisions ---------------------------------------------------------
+
+    def create_revision(self, params, query, body):
+        body = body or {}
+        missing = [field for field in self.revision_required if body.get(field) in (None, "")]
+        if missing:
+            return error(400, f"Missing required field: {missing[0]}")
+        with self.lock:
+            revision = {
+                "revisionId": str(uuid.uuid4()),
+                "revisionCode": len(self.revisions) + 1,
+                "opCoId": body.get("opCo"),
+                "revisionName": body.get("revisionName"),
+                "revisionType": body.get("revisionType"),
+                "year": body.get("year"),
+                "week": body.get("week"),
+                "comment": body.get("comment", ""),
+                "official": bool(body.get("isOfficial")),
+                "dateUploaded": now_iso(),
+                "lastUpdated": now_iso(),
+            }
+            for field in ("fromRevision", "baseline", "closure"):
+                if body.get(field):
+                    revision[field] = body[field]
+            self.revisions[revision["revisionId"]] = revision
+            if body.get("fromRevision") in self.revisions:
+                self._clone_revision_data(body["fromRevision"], revision["revisionId"])
+        return 201, revision
+
+    def _clone_revision_data(self, source_id, target_id):
+        """Copy every revenue and revision-scoped item of ``source_id`` under new IDs, like the backend's clone."""
+        stores = list(self.revenues.values()) + list(self.collections.values())
+        for store in stores:
+            copies = [item for item in store.values() if item.get("revisionId") == source_id]
+            for item in copies:
+                copy = json.loads(json.dumps(item))
+                copy.update(id=str(uuid.uuid4()), revisionId=target_id)
+                if isinstance(copy.get("rubrics"), dict):
+                    for rubric in copy["rubrics"].values():
+                        rubric["id"] = str(uuid.uuid4())
+                store[copy["id"]] = copy
+
+    def _snapshot(self, store):
+        """Copies of a store's items, taken under the lock: handlers filter and serialise them
+        while other requests create, update and delete."""
+        with self.lock:
+            return [dict(item) for item in store.values()]
+
+    def list_revisions(self, params, query, body):
+        items = self._snapshot(self.revisions)
+        if query.get("searchText"):
+            items = [item for item in items if matches_search(item, query["searchText"])]
+        return 200, paginate(items, query)
+
+    def search_revisions(self, params, query, body):
+        text = query.get("searchText", "")
+        if not text:
+            return error(400, "Search text cannot be empty")
+        limit = int_param(query, "limit", 5)
+        found = [item for item in self._snapshot(self.revisions) if matches_search(item, text)][:limit]
+        return 200, [{"revisionCode": str(item["revisionCode"]), "revisionName": item["revisionName"],
+                      "revisionType": item["revisionType"], "year": item["year"], "week": item["week"]}
+                     for item in found]
+
+    def read_revision(self, params, query, body):
+        with self.lock:
+            revision = self.revisions.get(params["revisionId"])
+            if revision is None:
+                return error(404, "Revision not found", "NOT_FOUND")
+            return 200, dict(revision)
+
+    # -- revenues ----------------------------------------------------------
+
+    def _revenue_store(self, revenue_type):
+        return self.revenues.get(revenue_type)
+
+    def _validate_revenue(self, revenue_type, body):
+        required = RATE_REQUIRED if revenue_type == "rates" else self.revenue_required
+        missing = [field for field in required if body.get(field) in (None, "")]
+        if missing:
+            return f"Missing required field: {missing[0]}"
+        if body.get("dateIn") and body.get("dateOut") and body["dateOut"] < body["dateIn"]:
+            return "Date Out cannot be before Date In"
+        if revenue_type == "rates":
+            key = tuple(body.get(field) for field in RATE_KEY)
+            for existing in self.revenues["rates"].values():
+                if tuple(existing.get(field) for field in RATE_KEY) == key:
+                    return "A rate for this level, year and customer already exists (duplicate)"
+        return None
+
+    def _join_references(self, item):
+        customer = self.collections["customer"].get(item.get("customerId"))
+        if customer:
+            item.setdefault("customerCode", customer.get("code"))
+            item.setdefault("customerName", customer.get("name"))
+        aircraft = self.collections["aircraft"].get(item.get("aircraftId"))
+        if aircraft:
+            item.setdefault("aircraftTailNumber", aircraft.get("tailNumber"))
+        check_type = self.collections["checktype"].get(item.get("checkTypeId"))
+        if check_type:
+            item.setdefault("checkTypeName", check_type.get("name"))
+            item.setdefault("checkTypeAdditionalInfo", check_type.get("additionalInformation"))
+        line = self.collections["line"].get(item.get("lineId"))
+        if line:
+            item.setdefault("lineCode", line.get("code"))
+            item.setdefault("lineName", line.get("name"))
+
+    def create_revenue(self, params, query, body):
+        store = self._revenue_store(params["type"])
+        if store is None:
+            return error(400, f"Unknown revenue type: {params['type']}")
+        body = body or {}
+        with self.lock:
+            problem = self._validate_revenue(params["type"], body)
+            if problem:
+                return error(400, problem)
+            timestamp = now_iso()
+            item = dict(body, id=str(uuid.uuid4()), createdAt=timestamp, updatedAt=timestamp)
+            if isinstance(body.get("rubrics"), dict):
+                item["rubrics"] = {key: dict(rubric, id=str(uuid.uuid4()), createdAt=timestamp,
+                                             updatedAt=timestamp)
+                                   for key, rubric in body["rubrics"].items()}
+            self._join_references(item)
+            store[item["id"]] = dict(item)
+        return 201, item
+
+    def update_revenue(self, params, query, body):
+        store = self._revenue_store(params["type"])
+        with self.lock:
+            item = store.get(params["id"]) if store is not None else None
+            if item is None:
+                return error(404, "Revenue not found", "NOT_FOUND")
+            item.update({key: value for key, value in (body or {}).items() if key != "id"})
+            item["updatedAt"] = now_iso()
+            return 200, dict(item)
+
+    def delete_revenues(self, params, query, body):
+        store = self._revenue_store(params["type"])
+        if store is None:
+            return error(400, f"Unknown revenue type: {params['type']}")
+        body = body or {}
+        ids = body.get("revenueIds") or body.get("rateIds") or []
+        deleted = []
+        with self.lock:
+            for revenue_id in ids:
+                item = store.pop(revenue_id, None)
+                if item is not None:
+                    deleted.append({"revenueId": revenue_id,
+                                    "rubricIds": [r["id"] for r in (item.get("rubrics") or {}).values()]})
+        deleted_ids = [info["revenueId"] for info in deleted]
+        result = {
+            "deletedItems": deleted,
+            "totalRevenues": len(deleted),
+            "totalRubrics": sum(len(info["rubricIds"]) for info in deleted),
+            "message": f"Deleted {len(deleted)} of {len(ids)} entries",
+            "deletedRevenues": deleted_ids,
+        }
+        if params["type"] == "rates":
+            result["deletedRates"] = deleted_ids
+        return 200, result
+
+    def _revision_revenues(self, params, query):
+        store = self._revenue_store(params["type"]) or {}
+        items = [item for item in self._snapshot(store) if item.get("revisionId") == params["revisionId"]]
+        if query.get("searchText"):
+            items = [item for item in items if matches_search(item, query["searchText"])]
+        if query.get("sortBy"):
+            items.sort(key=lambda item: str(item.get(query["sortBy"], "")),
+                       reverse=query.get("sortDirection", "").lower() == "desc")
+        return items
+
+    def list_revenues(self, params, query, body):
+        if params["type"] not in self.revenues:
+            return error(400, f"Unknown revenue type: {params['type']}")
+        return 200, paginate(self._revision_revenues(params, query), query)
+
+    def read_revenue(self, params, query, body):
+        with self.lock:
+            item = (self._revenue_store(params["type"]) or {}).get(params["id"])
+            if item is None or item.get("revisionId") != params["revisionId"]:
+                return error(404, "Revenue not found", "NOT_FOUND")
+            return 200, dict(item)
+
+    def export_revenues(self, params, query, export_format):
+        if params["type"] not in self.revenues:
+            return error(400, f"Unknown revenue type: {params['type']}")
+        return self._export(self._revision_revenues(params, query), f"{params['type']}_revenues",
+                            export_format)
+
+    # -- generic collections -------------------------------------------------
+
+    def _collection(self, family):
+        return self.collections.setdefault(family, {})
+
+    def _scoped_items(self, family, params):
+        items = self._snapshot(self._collection(family))
+        if "revisionId" in params:
+            items = [item for item in items if item.get("revisionId") == params["revisionId"]]
+        return items
+
+    def list_items(self, family, params, query):
+        items = self._scoped_items(family, params)
+        if query.get("searchText"):
+            items = [item for item in items if matches_search(item, query["searchText"])]
+        return 200, paginate(items, query)
+
+    def create_item(self, family, body):
+        item = dict(body or {}, id=str(uuid.uuid4()), createdAt=now_iso())
+        with self.lock:
+            self._collection(family)[item["id"]] = dict(item)
+        return 201, item
+
+    def read_item(self, family, item_id):
+        with self.lock:
+            item = self._collection(family).get(item_id)
+            if item is None:
+                return error(404, f"{family} {item_id} not found", "NOT_FOUND")
+            return 200, dict(item)
+
+    def update_item(self, family, item_id, body):
+        with self.lock:
+            item = self._collection(family).get(item_id)
+            if item is None:
+                return error(404, f"{family} {item_id} not found", "NOT_FOUND")
+            item.update({key: value for key, value in (body or {}).items() if key != "id"})
+            return 200, dict(item)
+
+    def delete_items(self, family, body):
+        ids = next((value for value in (body or {}).values() if isinstance(value, list)), [])
+        with self.lock:
+            store = self._collection(family)
+            deleted = [item_id for item_id in ids if store.pop(item_id, None) is not None]
+        return 200, {"deletedIds": deleted, "message": f"Deleted {len(deleted)} of {len(ids)} entries"}
+
+    def export_items(self, family, params, export_format):
+        return self._export(self._scoped_items(family, params), family, export_format)
+
+    def _export(self, items, name, export_format):
+        if export_format == "csv":
+            return 200, render_csv(items), "text/csv", {
+                "Content-Disposition": f'attachment; filename="{name}.csv"'}
+        return 200, render_xlsx(items), XLSX_MIME, {
+            "Content-Disposition": f'attachment; filename="{name}.xlsx"'}
+
+    # -- everything else -----------------------------------------------------
+
+    def synthesise(self, operation):
+        """Answer from the contract: the first 2xx response's example or schema."""
+        responses = operation.get("responses", {})
+        status = next((code for code in sorted(responses) if code.startswith("2")), "200")
+        content = responses.get(status, {}).get("content", {})
+        media = next(iter(content.values()), {})
+        if "example" in media:
+            return int(status), media["example"]
+        return int(status), self._sample(media.get("schema", {}), depth=0)
+
+    def _sample(self, schema, depth):
+        if "$ref" in schema:
+            schema = self.schemas.get(schema["$ref"].rsplit("/", 1)[-1], {})
+        kind = schema.get("type")
+        if kind == "array":
+            return []
+        if kind == "object" or "properties" in schema:
+            if depth > 2:
+                return {}
+            return {name: self._sample(prop, depth + 1)
+                    for name, prop in schema.get("properties", {}).items()}
+        if kind == "integer":
+            return 0
+        if kind == "number":
+            return 0.0
+        if kind == "boolean":
+            return False
+        if schema.get("format") == "uuid":
+            return str(uuid.UUID(int=0))
+        if schema.get("format") == "date-time":
+            return now_iso()
+        return ""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.server.api.handle(self.command, self.path, body)
+        if self.command == "GET" and status == 200:
+            # Conditional GETs, so the client's response cache can revalidate
+            headers["ETag"] = f'"{hashlib.sha1(payload).hexdigest()[:20]}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, payload = 304, b""
+                headers.pop("Content-Type", None)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StubServer:
+    """Serve a ``StubApi`` on a loopback port from a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, contract=None):
+        self.api = StubApi(contract)
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.api = self.api
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.api.base_path}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the contract stub of the Modular Monolith API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.host, args.port)
+    print(f"Stub API listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""Deterministic large-volume synthetic data for scale testing.
+
+``prepolutaion_data.sql`` holds one entity of each kind. That is too little
+to exercise search, export or heat-map endpoints at production size.
+``Dataset`` generates reference entities plus labor, material, engineering
+and miscellaneous revenues and rates at any scale. Values follow skewed,
+production-like distributions:
+
+* customers are Zipf-distributed, so a few large customers own most of
+  the aircraft and the revenue lines;
+* fleet types are also Zipf-distributed over a handful of aircraft families;
+* years lean towards the current one;
+* rubric values are log-normal.
+
+The same ``--rows``, ``--seed`` and ``--base-year`` always give the same
+data. Reference IDs are UUIDv5s of the seed, and each entity kind draws
+from its own seeded random stream::
+
+    python -m support.synthetic --rows 100000 --seed 7 --plan    # counts and a content digest
+    python -m support.synthetic --rows 100000 --seed 7 --sql     # set-based SQL for the reference entities
+    python -m support.synthetic --rows 100000 --seed 7           # load it all through the API
+
+Reference entities are loaded either with the generated SQL script, which
+inserts batches of 1000 rows per statement (``--references sql``: run the
+script first), or through the parameter endpoints (``--references api``,
+the default). The repo does not know the revenue table layout, so
+revenues and rates always go through the bulk API, into a fresh revision
+and in chunks. Every ID the API returns is written to a cleanup journal
+next to ``manifest.json``. ``python -m support.cleanup --journal <dir>/journal.jsonl``
+drains them, and ``delete_references.sql`` removes the reference entities
+by their ``SYN<seed>-`` prefix.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from support.bulk import create_many
+from support.cleanup import CleanupJournal, _client
+from support.exports import listing_key
+from support.factories import DEFAULT_USER_ID, RUBRIC_TYPES, RateFactory, created_by, revision_payload, rubric
+
+OUTPUT_DIR = os.path.join("test_output", "synthetic")
+NAMESPACE = uuid.UUID("6f1c7e2a-3b5d-4c8e-9a0f-5d2e8b7c4a19")
+TEST_OPCO_ID = "11111111-1111-1111-1111-111111111111"
+SQL_BATCH = 1000  # SQL Server's row limit for one INSERT ... VALUES
+CHUNK_SIZE = 2000
+
+# Share of --rows per kind
+MIX = (("labor", 0.40), ("material", 0.25), ("engineering", 0.15), ("miscellaneous", 0.10), ("rates", 0.10))
+
+# Median rubric value per revenue type (log-normal, sigma 0.9)
+MEDIAN_VALUE = {"labor": 4000.0, "material": 6000.0, "engineering": 2500.0, "miscellaneous": 800.0}
+
+FAMILY_FLEETS = (
+    ("Airbus", "A320 Family", "NARROW BODY"),
+    ("Boeing", "737 Family", "NARROW BODY"),
+    ("Boeing", "787 Family", "WIDE BODY"),
+    ("Airbus", "A330 Family", "WIDE BODY"),
+    ("Embraer", "E-Jet Family", "REGIONAL"),
+    ("ATR", "ATR 72 Family", "TURBOPROP"),
+)
+CHECK_TYPES = ("A-CHECK", "B-CHECK", "C-CHECK", "D-CHECK", "LINE-CHECK", "WEEKLY", "TRANSIT", "CABIN-MOD",
+               "REPAINT", "ENGINE-CHANGE", "LANDING-GEAR", "NDT-INSPECTION")
+HANGARS = 4
+LINES_PER_HANGAR = 3
+# Revenue share of base_year - 4 ... base_year + 1
+YEAR_WEIGHTS = (1, 2, 3, 5, 8, 3)
+
+# Reference entities in dependency order: API entity -> (SQL table, id column, [(column, field)])
+REFERENCE_TABLES = {
+    "family-fleet": ("master.parameter.family_fleets", "family_fleet_id",
+                     [("aircraft_manufacturer", "aircraftManufacturer"), ("family_fleet_name", "familyFleetName"),
+                      ("body_type", "bodyType")]),
+    "fleet-types": ("master.parameter.fleet_types", "fleet_type_id",
+                    [("fleet_type_name", "fleetTypeName"), ("family_fleet_id", "familyFleetId")]),
+    "hangars": ("master.parameter.hangars", "hangar_id",
+                [("op_co_id", "opCoId"), ("hangar_code", "hangarCode"), ("hangar_name", "hangarName"),
+                 ("hangar_order", "order"), ("active", "active"), ("overflow", "overflow")]),
+    "lines": ("master.parameter.lines", "line_id",
+              [("hangar_id", "hangarId"), ("op_co_id", "opCoId"), ("line_code", "lineCode"),
+               ("line_name", "lineName"), ("line_order", "lineOrder"), ("active", "active")]),
+    "customers": ("master.parameter.customers", "customer_id",
+                  [("customer_name", "name"), ("customer_code", "code"), ("color_hex", "colorHex")]),
+    "check-types": ("master.parameter.check_types", "check_type_id",
+                    [("check_type_name", "checkTypeName"), ("additional_information", "additionalInformation")]),
+    "aircraft": ("master.parameter.aircrafts", "aircraft_id",
+                 [("tail_number", "tailNumber"), ("ship_number", "shipNumber"), ("fleet_type_id", "fleetTypeId")]),
+}
+# Columns whose value identifies a synthetic row by its SYN<seed>- prefix
+PREFIX_COLUMNS = {
+    "family-fleet": "family_fleet_name", "fleet-types": "fleet_type_name", "hangars": "hangar_code",
+    "lines": "line_code", "customers": "customer_code", "check-types": "check_type_name", "aircraft": "tail_number",
+}
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _cumulative_zipf(n, s=1.1):
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+class Dataset:
+    """Reference entities and revenue/rate payloads for ``rows`` revenue and rate rows."""
+
+    def __init__(self, rows, seed=0, base_year=None):
+        self.rows = rows
+        self.seed = seed
+        self.base_year = base_year or datetime.now().year
+        self.prefix = f"SYN{seed}-"
+        self.counts = {kind: int(rows * share) for kind, share in MIX}
+        self.counts["labor"] += rows - sum(self.counts.values())
+        self.years = [self.base_year - 4 + offset for offset in range(len(YEAR_WEIGHTS))]
+        self.year_weights = list(itertools.accumulate(YEAR_WEIGHTS))
+        self.references = self._references()
+        self.customer_weights = _cumulative_zipf(len(self.references["customers"]))
+        self.aircraft_of_customer = self._fleets()
+
+    def _rng(self, stream):
+        return random.Random(f"{self.seed}:{stream}")
+
+    def _uuid(self, entity, index):
+        return str(uuid.uuid5(NAMESPACE, f"{self.seed}:{entity}:{index}"))
+
+    def _references(self):
+        rng = self._rng("references")
+        p = self.prefix
+        refs = {}
+        refs["family-fleet"] = [
+            {"aircraftManufacturer": maker, "familyFleetName": f"{p}{name}", "bodyType": body}
+            for maker, name, body in FAMILY_FLEETS]
+        fleet_types = _clamp(self.rows // 5000, 12, 60)
+        refs["fleet-types"] = [
+            {"fleetTypeName": f"{p}FT{i:03d}", "familyFleetId": i % len(FAMILY_FLEETS)}
+            for i in range(fleet_types)]
+        refs["hangars"] = [
+            {"opCoId": TEST_OPCO_ID, "hangarCode": f"{p}H{i + 1}", "hangarName": f"Synthetic Hangar {i + 1}",
+             "order": i + 1, "active": True, "overflow": i == HANGARS - 1}
+            for i in range(HANGARS)]
+        refs["lines"] = [
+            {"hangarId": i // LINES_PER_HANGAR, "opCoId": TEST_OPCO_ID, "lineCode": f"{p}L{i + 1:02d}",
+             "lineName": f"Synthetic Line {i + 1}", "lineOrder": i + 1, "active": True}
+            for i in range(HANGARS * LINES_PER_HANGAR)]
+        refs["customers"] = [
+            {"name": f"Synthetic Customer {i + 1}", "code": f"{p}C{i + 1:05d}",
+             "colorHex": f"#{rng.randrange(1 << 24):06X}"}
+            for i in range(_clamp(self.rows // 400, 20, 2500))]
+        refs["check-types"] = [
+            {"checkTypeName": f"{p}{name}", "additionalInformation": f"Synthetic {name.lower()}"}
+            for name in CHECK_TYPES]
+        fleet_weights = _cumulative_zipf(fleet_types, 0.8)
+        refs["aircraft"] = [
+            {"tailNumber": f"{p}{i + 1:05d}", "shipNumber": f"S{i + 1:05d}",
+             "fleetTypeId": rng.choices(range(fleet_types), cum_weights=fleet_weights)[0]}
+            for i in range(_clamp(self.rows // 40, 60, 25000))]
+        # Foreign keys above are indexes into the parent list until resolve() maps them to IDs
+        for entity, rows in refs.items():
+            for index, row in enumerate(rows):
+                row["id"] = self._uuid(entity, index)
+        return refs
+
+    def _fleets(self):
+        """Hand every aircraft to a customer, big customers first."""
+        rng = self._rng("fleets")
+        owned = [[] for _ in self.references["customers"]]
+        for index in range(len(self.references["aircraft"])):
+            customer = rng.choices(range(len(owned)), cum_weights=self.customer_weights)[0]
+            owned[customer].append(index)
+        # Customers that drew no aircraft lease one
+        for customer, aircraft in enumerate(owned):
+            if not aircraft:
+                aircraft.append(rng.randrange(len(self.references["aircraft"])))
+        return owned
+
+    def own_ids(self):
+        return {entity: [row["id"] for row in rows] for entity, rows in self.references.items()}
+
+    def resolve(self, entity, ids=None):
+        """API payloads for ``entity``, foreign keys resolved through ``ids`` (default: our UUIDs)."""
+        ids = ids or self.own_ids()
+        parents = {"familyFleetId": "family-fleet", "fleetTypeId": "fleet-types", "hangarId": "hangars"}
+        resolved = []
+        for row in self.references[entity]:
+            row = dict(row)
+            for field, parent in parents.items():
+                if isinstance(row.get(field), int):
+                    row[field] = ids[parent][row[field]]
+            resolved.append(row)
+        return resolved
+
+    def _year(self, rng):
+        return rng.choices(self.years, cum_weights=self.year_weights)[0]
+
+    def _customer(self, rng):
+        return rng.choices(range(len(self.aircraft_of_customer)), cum_weights=self.customer_weights)[0]
+
+    def revenues(self, kind, ids, revision_id):
+        """Yield ``self.counts[kind]`` revenue payloads; ``ids`` maps entity -> IDs by index."""
+        rng = self._rng(kind)
+        median = MEDIAN_VALUE[kind]
+        rubric_types = RUBRIC_TYPES[kind]
+        user = created_by()
+        for index in range(self.counts[kind]):
+            customer = self._customer(rng)
+            aircraft = rng.choice(self.aircraft_of_customer[customer])
+            registered = date(self._year(rng), 1, 1) + timedelta(days=rng.randrange(365))
+            rubrics = []
+            for rubric_type in rng.sample(rubric_types, rng.randint(1, min(3, len(rubric_types)))):
+                value = round(rng.lognormvariate(0, 0.9) * median, 2)
+                hours = round(value / rng.uniform(70, 130), 1) if rubric_type.endswith("_LABOR") else 0.0
+                rubrics.append((rubric_type, value, hours))
+            data = {
+                "type": kind.upper(),
+                "revisionId": revision_id,
+                "customerId": ids["customers"][customer],
+                "aircraftId": ids["aircraft"][aircraft],
+                "checkTypeId": ids["check-types"][rng.randrange(len(ids["check-types"]))],
+                "lineId": ids["lines"][rng.randrange(len(ids["lines"]))],
+                "registrationDate": registered.isoformat(),
+                "isAssociatedToEvent": rng.random() < 0.3,
+                "workOrder": f"{self.prefix}WO{index:07d}",
+                "rubrics": dict(rubric(*spec) for spec in rubrics),
+                "createdBy": user,
+            }
+            if data["isAssociatedToEvent"]:
+                data["dateIn"] = registered.isoformat()
+                data["dateOut"] = (registered + timedelta(days=rng.randint(1, 30))).isoformat()
+            yield data
+
+    def rates(self, ids, revision_id):
+        """Yield ``self.counts["rates"]`` rates, unique per (level, year, customer, fleet type, check type)."""
+        rng = self._rng("rates")
+        user = created_by()
+        scopes = {"fleetTypeId": "fleet-types", "checkTypeId": "check-types"}
+        seen = set()
+        capacity = len(ids["customers"]) * len(self.years) * (1 + len(ids["fleet-types"]) + len(ids["check-types"]))
+        for index in range(min(self.counts["rates"], capacity)):
+            while True:
+                level = rng.choices((1, 2, 3), weights=(2, 1, 1))[0]
+                customer = self._customer(rng) if rng.random() < 0.8 else rng.randrange(len(ids["customers"]))
+                year = self._year(rng)
+                fields, scope = RateFactory.LEVEL_FIELDS[level]
+                scope_index = rng.randrange(len(ids[scopes[scope[0]]])) if scope else None
+                key = (level, year, customer, scope_index)
+                if key not in seen:
+                    seen.add(key)
+                    break
+            data = {
+                "customerId": ids["customers"][customer],
+                "revisionId": revision_id,
+                "level": level,
+                "year": year,
+                "comments": f"{self.prefix}rate {index}",
+                "createdBy": user,
+            }
+            for field, value in fields.items():
+                data[field] = round(value * rng.uniform(0.7, 1.5), 2)
+            if scope:
+                data[scope[0]] = ids[scopes[scope[0]]][scope_index]
+            yield data
+
+    def payloads(self, kind, ids, revision_id):
+        return self.rates(ids, revision_id) if kind == "rates" else self.revenues(kind, ids, revision_id)
+
+    def digest(self):
+        """SHA-256 over everything the dataset generates; equal digests mean equal data."""
+        sha = hashlib.sha256()
+        ids = self.own_ids()
+        for entity in REFERENCE_TABLES:
+            for row in self.resolve(entity, ids):
+                sha.update(json.dumps(row, sort_keys=True).encode("utf-8"))
+        for kind, _ in MIX:
+            for payload in self.payloads(kind, ids, "REVISION"):
+                sha.update(json.dumps(payload, sort_keys=True).encode("utf-8"))
+        return sha.hexdigest()
+
+    def plan(self):
+        return {
+            "rows": self.rows,
+            "seed": self.seed,
+            "baseYear": self.base_year,
+            "revenues": self.counts,
+            "references": {entity: len(rows) for entity, rows in self.references.items()},
+        }
+
+
+def _sql_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def references_sql(dataset):
+    """INSERT script for the reference entities, ``SQL_BATCH`` rows per statement."""
+    lines = [
+        f"-- Synthetic reference entities: {dataset.rows} rows, seed {dataset.seed} (support/synthetic.py)",
+        "-- Needs the test OpCo from prepolutaion_data.sql",
+        "BEGIN TRANSACTION;",
+        "SET NOCOUNT ON;",
+        f"DECLARE @TestUserId UNIQUEIDENTIFIER = '{DEFAULT_USER_ID}';",
+        "",
+    ]
+    for entity in REFERENCE_TABLES:
+        rows = dataset.resolve(entity)
+        table, id_column, columns = REFERENCE_TABLES[entity]
+        names = [id_column] + [column for column, _ in columns] + ["status", "created_by", "last_modified_by"]
+        for start in range(0, len(rows), SQL_BATCH):
+            values = ",\n".join(
+                "(" + ", ".join([_sql_value(row["id"])] + [_sql_value(row[field]) for _, field in columns]
+                                + ["'ACTIVE'", "@TestUserId", "@TestUserId"]) + ")"
+                for row in rows[start:start + SQL_BATCH])
+            lines.append(f"INSERT INTO {table}\n({', '.join(names)})\nVALUES\n{values};\n")
+        lines.append(f"PRINT 'Inserted {len(rows)} synthetic {entity}';\n")
+    lines.append("COMMIT TRANSACTION;")
+    return "\n".join(lines) + "\n"
+
+
+def delete_sql(dataset):
+    """DELETE script for the reference entities of ``dataset``, children first, by their prefix."""
+    pattern = _sql_value(dataset.prefix.replace("_", "[_]") + "%")
+    lines = [f"-- Synthetic reference entities with the {dataset.prefix} prefix",
+             "BEGIN TRANSACTION;", "SET NOCOUNT ON;", ""]
+    for entity in reversed(list(REFERENCE_TABLES)):
+        table = REFERENCE_TABLES[entity][0]
+        lines.append(f"DELETE FROM {table} WHERE {PREFIX_COLUMNS[entity]} LIKE {pattern};")
+    lines += ["", "COMMIT TRANSACTION;"]
+    return "\n".join(lines) + "\n"
+
+
+def _create_references(api, dataset, workers, log):
+    """POST every reference entity, parents first; returns entity -> server IDs by index."""
+    ids = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entity in REFERENCE_TABLES:
+            def create(row):
+                payload = {key: value for key, value in row.items() if key != "id"}
+                response = api.post("parameter_list", entity=entity, json=payload)
+                assert response.status_code in (200, 201), \
+                    f"Creating {entity} failed: {response.status_code} {response.text[:200]}"
+                body = response.json()
+                return body[listing_key(body)]
+
+            ids[entity] = list(pool.map(create, dataset.resolve(entity, ids)))
+            log(f"{entity}: created {len(ids[entity])}")
+    return ids
+
+
+def load(api, dataset, out_dir=OUTPUT_DIR, references="api", chunk_size=CHUNK_SIZE, workers=None, log=print):
+    """Load ``dataset`` into a new revision and write ``manifest.json``; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    journal = CleanupJournal(os.path.join(out_dir, "journal.jsonl"), run_id=f"synthetic-{dataset.seed}")
+    api.add_listener(journal)
+    with open(os.path.join(out_dir, "delete_references.sql"), "w") as f:
+        f.write(delete_sql(dataset))
+
+    if references == "api":
+        ids = _create_references(api, dataset, workers or 8, log)
+    else:
+        ids = dataset.own_ids()
+
+    response = api.post("revisions", json=revision_payload(f"Synthetic {dataset.seed}"))
+    assert response.status_code in (200, 201), \
+        f"Creating the synthetic revision failed: {response.status_code} {response.text[:200]}"
+    revision_id = response.json()["revisionId"]
+    log(f"revision {revision_id}")
+
+    manifest = dict(dataset.plan(), revisionId=revision_id, journal=journal.path, runId=journal.run_id,
+                    deleteReferences=os.path.join(out_dir, "delete_references.sql"), created={}, failed={},
+                    referenceIds=ids if references == "api" else "sql")
+    for kind, _ in MIX:
+        payloads = dataset.payloads(kind, ids, revision_id)
+        created = failed = 0
+        start = time.monotonic()
+        while True:
+            chunk = list(itertools.islice(payloads, chunk_size))
+            if not chunk:
+                break
+            result = create_many(api, kind, chunk, workers=workers)
+            created += len(result.created_ids)
+            failed += len(result.failures)
+            if result.failures:
+                log(f"{kind}: {result.summary()}")
+            log(f"{kind}: {created}/{dataset.counts[kind]} ({created / (time.monotonic() - start):.0f}/s)")
+        manifest["created"][kind] = created
+        manifest["failed"][kind] = failed
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic data at scale")
+    parser.add_argument("--rows", type=int, required=True, help="revenue and rate rows in total")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--base-year", type=int, help="latest full year of data (default: this year)")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="directory for SQL scripts, journal and manifest")
+    parser.add_argument("--plan", action="store_true", help="print counts and the content digest only")
+    parser.add_argument("--sql", action="store_true", help="only write the reference entity SQL scripts")
+    parser.add_argument("--references", choices=("api", "sql"), default="api",
+                        help="create reference entities through the API, or use the already-run SQL script")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="payloads generated per bulk batch")
+    parser.add_argument("--workers", type=int, help="concurrent POSTs (default BDD_BULK_WORKERS)")
+    args = parser.parse_args(argv)
+
+    dataset = Dataset(args.rows, args.seed, args.base_year)
+    if args.plan:
+        print(json.dumps(dict(dataset.plan(), digest=dataset.digest()), indent=2))
+        return 0
+    if args.sql:
+        os.makedirs(args.out, exist_ok=True)
+        for name, script in (("references.sql", references_sql(dataset)),
+                             ("delete_references.sql", delete_sql(dataset))):
+            with open(os.path.join(args.out, name), "w") as f:
+                f.write(script)
+            print(f"Wrote {os.path.join(args.out, name)}")
+        return 0
+
+    api = _client()
+    try:
+        manifest = load(api, dataset, args.out, args.references, args.chunk_size, args.workers)
+    finally:
+        api.close()
+    print(f"Loaded into revision {manifest['revisionId']}: {manifest['created']}")
+    print(f"Clean up with: python -m support.cleanup --journal {manifest['journal']}")
+    print(f"          and: {manifest['deleteReferences']} (plus --sql for the revision)")
+    return 1 if any(manifest["failed"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
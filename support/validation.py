@@ -0,0 +1,152 @@
+"""Check API responses against the response schemas in contracts.json.
+
+The contract is parsed once per run. Every JSON response schema is
+resolved into a self-contained document (all ``$ref``s inlined) keyed by
+``"METHOD template status"``, and the resolved set is cached on disk under
+the contract's SHA-256, so later runs skip parsing and ref resolution
+entirely. A jsonschema validator is compiled per key the first time that
+key is seen and reused afterwards.
+
+Known defects of the contract are corrected in ``SCHEMA_OVERRIDES`` before
+resolution, so they do not drown real drift in warnings (or fail ``strict``).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from jsonschema.validators import validator_for
+
+from support.contract import CONTRACT_PATH, PathMatcher, operations
+
+CACHE_DIR = os.path.join("test_output", ".contract_cache")
+MODES = ("off", "warn", "strict")
+# Component schemas replaced before validation. RubricType is declared as {"type": "object"}, but it
+# is the rubric type enum (AIRFRAME_LABOR, ...) and the API sends and returns it as a string.
+SCHEMA_OVERRIDES = {
+    "RubricType": {"type": "string"},
+}
+
+
+def contract_hash(path):
+    """SHA-256 of the contract and the overrides applied to it (the schema cache key)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    digest.update(json.dumps(SCHEMA_OVERRIDES, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _resolve(schema, schemas, seen=()):
+    """Inline every ``#/components/schemas`` reference; cycles become ``{}``."""
+    if isinstance(schema, list):
+        return [_resolve(item, schemas, seen) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    if "$ref" in schema:
+        name = schema["$ref"].rsplit("/", 1)[-1]
+        if name in seen:
+            return {}
+        return _resolve(schemas.get(name, {}), schemas, seen + (name,))
+    return {key: _resolve(value, schemas, seen) for key, value in schema.items()}
+
+
+def build_schemas(contract):
+    """Return ``{"METHOD template status": resolved_schema}`` for JSON responses."""
+    schemas = dict(contract.get("components", {}).get("schemas", {}), **SCHEMA_OVERRIDES)
+    resolved = {}
+    for method, template, operation in operations(contract):
+        for status, response in operation.get("responses", {}).items():
+            for media_type, media in response.get("content", {}).items():
+                if "json" in media_type or media_type == "*/*":
+                    if "schema" in media:
+                        resolved[f"{method} {template} {status}"] = _resolve(media["schema"], schemas)
+                    break
+    return resolved
+
+
+class ResponseValidator:
+    def __init__(self, contract_path=CONTRACT_PATH, cache_dir=CACHE_DIR, mode="warn", logger=None):
+        self.mode = mode if mode in MODES else "warn"
+        self.logger = logger
+        self.checked = 0
+        self.seconds = 0.0
+        self.violations = []
+        self._validators = {}
+        # Responses arrive on bulk and async worker threads
+        self.lock = threading.Lock()
+
+        started = time.perf_counter()
+        self.schemas, self.cache_hit = self._load(contract_path, cache_dir)
+        templates = {key.split(" ")[1] for key in self.schemas}
+        self.matcher = PathMatcher(templates)
+        self.load_seconds = time.perf_counter() - started
+
+    @staticmethod
+    def _load(contract_path, cache_dir):
+        digest = contract_hash(contract_path)
+        cache_file = os.path.join(cache_dir, f"response-schemas-{digest[:16]}.json")
+        if os.path.exists(cache_file):
+            with open(cache_file) as f:
+                return json.load(f), True
+
+        with open(contract_path) as f:
+            schemas = build_schemas(json.load(f))
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(schemas, f)
+        os.replace(tmp, cache_file)
+        return schemas, False
+
+    def _validator(self, key):
+        with self.lock:
+            if key not in self._validators:
+                schema = self.schemas.get(key)
+                self._validators[key] = validator_for(schema)(schema) if schema is not None else None
+            return self._validators[key]
+
+    def validate(self, method, template, status, body):
+        """Return the list of schema errors for one response (empty when valid or unknown)."""
+        validator = self._validator(f"{method} {template} {status}")
+        if validator is None:
+            return []
+        return [f"{'/'.join(str(p) for p in error.absolute_path) or '<root>'}: {error.message}"
+                for error in validator.iter_errors(body)]
+
+    def __call__(self, method, template, response):
+        """ApiClient listener: validate ``response`` against the contract."""
+        if self.mode == "off" or "json" not in response.headers.get("Content-Type", ""):
+            return
+        started = time.perf_counter()
+        if f"{method} {template} {response.status_code}" not in self.schemas:
+            # Raw paths passed by callers still map onto their contract template
+            template = self.matcher.match(getattr(response, "api_path", ""))[0] or template
+        try:
+            errors = self.validate(method, template, response.status_code, response.json())
+        except ValueError:
+            errors = ["<root>: response body is not valid JSON"]
+        with self.lock:
+            self.seconds += time.perf_counter() - started
+            self.checked += 1
+            if errors:
+                self.violations.append({"method": method, "endpoint": template,
+                                        "status": response.status_code, "errors": errors})
+        if not errors:
+            return
+
+        message = f"Contract violation on {method} {template} ({response.status_code}): {errors[0]}"
+        if self.mode == "strict":
+            raise AssertionError(message)
+        if self.logger:
+            self.logger.warning(message)
+
+    def summary(self):
+        with self.lock:
+            checked, seconds, violations = self.checked, self.seconds, len(self.violations)
+        average = seconds / checked * 1000 if checked else 0.0
+        source = "cache" if self.cache_hit else "contract"
+        return (f"Contract validation: {checked} responses checked in {seconds * 1000:.1f} ms "
+                f"(avg {average:.3f} ms), {violations} violations; "
+                f"schemas loaded from {source} in {self.load_seconds * 1000:.1f} ms")